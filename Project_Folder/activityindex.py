@@ -0,0 +1,91 @@
+"""
+Index of the activities in a timesheet, for autocompletion.
+"""
+
+import bisect
+
+
+class ActivityIndex:
+
+    def __init__(self):
+        """ Activity names with the number of entries using each one.
+
+            Each name is given an integer id when it is first seen. Counts are
+            updated in constant time as entries are added or removed, and the
+            names are also kept in a case-insensitively sorted list, so that
+            prefix searches are a binary search.
+        """
+
+        # names and counts, indexed by id
+        self.names = []
+        self.counts = []
+        self._ids = {}
+
+        # (lower case name, name), sorted
+        self.sorted = []
+
+        # incremented whenever a name is added or a count changes
+        self.version = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def intern(self, name):
+        """ Return id of activity `name`, adding it if it is new. """
+        try:
+            return self._ids[name]
+        except KeyError:
+            idx = self._ids[name] = len(self.names)
+            self.names.append(name)
+            self.counts.append(0)
+            bisect.insort(self.sorted, (name.lower(), name))
+            self.version += 1
+            return idx
+
+    def increment(self, idx, n=1):
+        """ Add `n` to the count of activity id `idx`. """
+        self.counts[idx] += n
+        self.version += 1
+
+    def decrement(self, idx, n=1):
+        """ Subtract `n` from the count of activity id `idx`. """
+        self.counts[idx] -= n
+        self.version += 1
+
+    def count(self, name):
+        """ Return number of entries with activity `name`. """
+        try:
+            return self.counts[self._ids[name]]
+        except KeyError:
+            return 0
+
+    def complete(self, prefix, limit=None):
+        """ Return names beginning with `prefix` (ignoring case), most used
+            first. Names which no entry uses are left out.
+        """
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.sorted, (prefix,))
+        matches = []
+        for idx in range(start, len(self.sorted)):
+            lower, name = self.sorted[idx]
+            if not lower.startswith(prefix):
+                break
+            if self.count(name):
+                matches.append(name)
+        matches.sort(key=self.count, reverse=True)
+        return matches[:limit]
+
+    def ranked(self):
+        """ Return the names used by at least one entry, most used first. """
+        return sorted(self.used(), key=self.count, reverse=True)
+
+    def used(self):
+        """ Return the names used by at least one entry, sorted ignoring 
+            case.
+        """
+        # names are kept when their last entry is removed, so that their ids
+        # stay valid, but they are no longer offered as completions
+        return [name for _, name in self.sorted if self.count(name)]
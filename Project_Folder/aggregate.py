@@ -0,0 +1,252 @@
+"""
+Total time and pay for a timesheet, grouped by month, week or year.
+
+If NumPy is installed, the totals for large timesheets are computed with
+grouped reductions over arrays (see money.numpy); otherwise, the same totals
+are computed in pure Python. Both sum integers, so they give identical
+results. Pay is rounded to cents by money.py.
+"""
+
+import datetime
+from collections import namedtuple
+
+from format_dur import Duration, parse_duration
+import money
+
+
+# 'start' is the first day of the period (for weeks, the Monday)
+Total = namedtuple('Total', ['start', 'count', 'time', 'pay'])
+
+periods = ('month', 'week', 'year')
+
+# ordinal of the numpy datetime64 epoch
+_epoch = datetime.date(1970, 1, 1).toordinal()
+
+
+def load_columns(lines, time_base):
+    """ Return lists of dates, durations and rates from csv lines.
+
+        Parameters
+        ----------
+        lines : iterable of str
+            csv lines containing data
+        time_base : str
+            'hour' or 'day'
+
+        Returns
+        -------
+        dates : list of proleptic Gregorian ordinals
+        durations : list of int minutes if `time_base` is 'hour', otherwise
+            list of int thousandths of a day
+        rates : list of int cents
+    """
+
+    dates = []
+    durations = []
+    rates = []
+
+    # there are usually only a few different rates
+    cents = {}
+
+    for line in lines:
+        date, dur, _, rate = line.strip().split(',')
+
+        year, month, day = date.split('-')
+        dates.append(datetime.date(int(year), int(month), int(day))
+                     .toordinal())
+
+        if time_base == 'hour':
+            hrs, mns = dur.split(':')
+            durations.append(int(hrs) * 60 + int(mns))
+        else:
+            durations.append(parse_duration(dur, time_base))
+
+        try:
+            rates.append(cents[rate])
+        except KeyError:
+            cents[rate] = money.rate_to_cents(rate)
+            rates.append(cents[rate])
+
+    return dates, durations, rates
+
+
+def totals(dates, durations, rates, time_base, period='month', policy=None):
+    """ Return total time and pay for each period, most recent first.
+
+        Parameters
+        ----------
+        dates, durations, rates : sequences
+            columns, as returned by `load_columns`
+        time_base : str
+            'hour' or 'day'
+        period : str
+            'month', 'week' or 'year'. Default is 'month'.
+        policy : money.Policy, optional
+            how pay is rounded to cents. Default is `money.default_policy`.
+
+        Returns
+        -------
+        list of Total namedtuples. `time` is a Duration (see format_dur.py)
+        and `pay` is an int number of cents.
+
+        Durations and rates are multiplied and summed as integers, so the
+        only rounding is to whole cents, as set by `policy`.
+    """
+
+    if period not in periods:
+        raise ValueError("'period' must be one of {}".format(periods))
+
+    if not len(dates):
+        return []
+
+    if policy is None:
+        policy = money.default_policy
+
+    # if entries are rounded, that is done before they are summed
+    per = money.units_per(time_base)
+    entry_divisor = per if policy.round_entries else None
+
+    if money.numpy(len(dates)) is None:
+        result = _totals_python(dates, durations, rates, period,
+                                entry_divisor, policy.rounding)
+    else:
+        result = _totals_numpy(dates, durations, rates, period,
+                               entry_divisor, policy.rounding)
+
+    duration = Duration.type_for(time_base)
+
+    if not policy.round_entries:
+        result = [t._replace(pay=money.divide(t.pay, per, policy.rounding))
+                  for t in result]
+
+    result = [t._replace(time=duration(t.time)) for t in reversed(result)]
+
+    return result
+
+
+def store_totals(store, period='month', start=0, stop=None, policy=None):
+    """ Return total time and pay for each period, most recent first, from
+        entries `start` to `stop` of an EntryStore.
+
+        See `totals`.
+    """
+
+    dates = store.dates[start:stop]
+    durations = store.durations[start:stop]
+    rates = store.rates[start:stop]
+
+    np = money.numpy(len(dates))
+    if np is not None:
+        durations = np.frombuffer(durations, dtype='i')
+        rates = np.frombuffer(rates, dtype='i')
+
+    return totals(dates, durations, rates, store.time_base, period, policy)
+
+
+def period_range(date, period='month'):
+    """ Return the first day of the period containing `date` and the first
+        day of the next period.
+
+        >>> period_range(datetime.date(2024, 2, 14))
+        (datetime.date(2024, 2, 1), datetime.date(2024, 3, 1))
+        >>> period_range(datetime.date(2024, 2, 14), 'week')
+        (datetime.date(2024, 2, 12), datetime.date(2024, 2, 19))
+        >>> period_range(datetime.date(2024, 12, 31), 'year')
+        (datetime.date(2024, 1, 1), datetime.date(2025, 1, 1))
+    """
+
+    if period == 'month':
+        start = date.replace(day=1)
+        year, month = divmod(start.month, 12)
+        stop = start.replace(year=start.year+year, month=month+1)
+    elif period == 'year':
+        start = date.replace(month=1, day=1)
+        stop = start.replace(year=start.year+1)
+    elif period == 'week':
+        start = date - datetime.timedelta(days=date.weekday())
+        stop = start + datetime.timedelta(days=7)
+    else:
+        raise ValueError("'period' must be one of {}".format(periods))
+
+    return start, stop
+
+
+def format_time(time, time_base):
+    """ Format total time (a number of minutes or thousandths of a day) as it
+        is shown in the timesheet.
+    """
+
+    if time_base == 'hour':
+        sign = '-' if time < 0 else ''
+        return sign + '{}:{:02d}'.format(*divmod(abs(time), 60))
+    else:
+        return str(time / money.units_per(time_base))
+
+
+def _totals_numpy(dates, durations, rates, period, divisor, rounding):
+    np = money.numpy()
+
+    days = np.asarray(dates, dtype=np.int64) - _epoch
+
+    durations = np.asarray(durations, dtype=np.int64)
+    pay = np.asarray(rates, dtype=np.int64) * durations
+    if divisor is not None:
+        pay = money.divide(pay, divisor, rounding)
+
+    # integer code for each period, which increases with time
+    if period == 'week':
+        # 1970-01-01 was a Thursday, so weeks run Monday to Sunday
+        codes = (days + 3) // 7
+    else:
+        unit = 'datetime64[M]' if period == 'month' else 'datetime64[Y]'
+        codes = days.astype('datetime64[D]').astype(unit).astype(np.int64)
+
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+
+    # index of first entry in each period
+    starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+
+    counts = np.diff(np.append(starts, len(codes)))
+    time = np.add.reduceat(durations[order], starts)
+    pay = np.add.reduceat(pay[order], starts)
+
+    # first day of each period
+    codes = codes[starts]
+    if period == 'week':
+        first = codes * 7 - 3
+    else:
+        first = codes.astype(unit).astype('datetime64[D]').astype(np.int64)
+    first += _epoch
+
+    return [Total(datetime.date.fromordinal(f), c, t, p) for f, c, t, p in
+            zip(first.tolist(), counts.tolist(), time.tolist(), pay.tolist())]
+
+
+def _totals_python(dates, durations, rates, period, divisor, rounding):
+
+    groups = {}
+
+    for date, dur, rate in zip(dates, durations, rates):
+
+        date = datetime.date.fromordinal(date)
+        if period == 'month':
+            start = date.replace(day=1)
+        elif period == 'year':
+            start = date.replace(month=1, day=1)
+        else:
+            start = date - datetime.timedelta(days=date.weekday())
+
+        pay = rate * dur
+        if divisor is not None:
+            pay = money.divide(pay, divisor, rounding)
+
+        try:
+            group = groups[start]
+        except KeyError:
+            group = groups[start] = [0, 0, 0]
+        group[0] += 1
+        group[1] += dur
+        group[2] += pay
+
+    return [Total(start, *groups[start]) for start in sorted(groups)]
@@ -0,0 +1,310 @@
+"""
+Benchmarks for the timesheet functions.
+
+Generates synthetic timesheets in a temporary directory and times rendering
+(from scratch, from the cache and after an edit), csv processing, date and
+duration parsing, loading and saving, and removing and editing entries. No
+display is needed.
+
+Results are written as JSON, so that runs can be compared, e.g.
+
+    python benchmark.py -o before.json
+    ... make changes ...
+    python benchmark.py -o after.json --compare before.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from format_dur import format_duration
+from processcsv import RenderCache, get_unique, head_tail, store_to_html
+from str_to_date import str_to_date
+import data
+
+sizes = (1000, 100000, 1000000)
+time_bases = ('hour', 'day')
+
+# activities and how often they are used, roughly in proportion to a real
+# timesheet: a few activities make up most of the entries
+activities = [
+    ('Admin', 30), ('Meeting', 25), ('Coding', 25), ('Code review', 12),
+    ('Testing', 10), ('Documentation', 8), ('Training', 6),
+    ('Planning', 6), ('Support', 5), ('Email', 5), ('Travel', 3),
+    ('Client call', 3), ('Interviewing', 2), ('Reviewing project', 2),
+    ('Design', 2), ('Research', 2), ('Deployment', 1), ('Bug triage', 1),
+    ('Conference', 1), ('Mentoring', 1), ('Budget report', 1),
+    ('Site visit', 1), ('Onboarding', 1), ('Sick leave', 1),
+    ('Annual leave', 1)]
+
+rates = [('120', 6), ('95.5', 3), ('80', 2), ('150.25', 1)]
+
+hour_durations = [('{:02d}:{:02d}'.format(*divmod(mins, 60)),
+                   1 if mins > 240 else 3)
+                  for mins in range(15, 8*60+15, 15)]
+
+day_durations = [('1', 8), ('0.5', 4), ('0.25', 2), ('1.5', 1), ('2', 1)]
+
+
+def make_csv(rows, time_base='hour', seed=1):
+    """ Return csv text for a synthetic timesheet with `rows` entries.
+
+        There are up to four entries on each working day, starting on
+        1 January 2000.
+    """
+
+    rand = random.Random(seed)
+
+    def choices(weighted):
+        values, weights = zip(*weighted)
+        return rand.choices(values, weights, k=rows)
+
+    durations = hour_durations if time_base == 'hour' else day_durations
+
+    lines = ['Date,Duration,Activity,Rate']
+
+    date = datetime.date(2000, 1, 1)
+
+    for dur, act, rate in zip(choices(durations), choices(activities),
+                              choices(rates)):
+        if rand.random() < 0.35:
+            date += datetime.timedelta(days=1)
+            # skip weekends
+            while date.weekday() > 4:
+                date += datetime.timedelta(days=1)
+        lines.append(','.join([str(date), dur, act, rate]))
+
+    return '\n'.join(lines) + '\n'
+
+
+def make_timesheet(path, name, rows, time_base='hour', seed=1):
+    """ Make the directory, csv file and config file for a synthetic
+        timesheet called `name` in `path`, as in ~/.timesheetproject.
+    """
+
+    tspath = os.path.join(path, name)
+    os.makedirs(tspath, exist_ok=True)
+
+    base = os.path.join(tspath, 'ts_' + name.lower())
+
+    with open(base + '.csv', 'w') as fileobj:
+        fileobj.write(make_csv(rows, time_base, seed))
+
+    with open(base + '.conf', 'w') as fileobj:
+        fileobj.write('name={}\nrate=120\ncurrency=£\ntimebase={}\n'.format(
+            name, time_base))
+
+    return base + '.csv'
+
+
+def measure(func, repeat=3, setup=None):
+    """ Return list of times taken by `func`, called `repeat` times.
+
+        If given, `setup` is called before each call of `func` (without being
+        timed) and its return value is passed to `func`.
+    """
+    times = []
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(sizes=sizes, time_bases=time_bases, repeat=3, verbose=True):
+    """ Run all benchmarks and return list of result dicts. """
+
+    results = []
+
+    tmpdir = tempfile.mkdtemp(prefix='timesheet_benchmark_')
+
+    try:
+        for rows in sizes:
+            for time_base in time_bases:
+
+                name = 'Bench_{}_{}'.format(rows, time_base)
+                csvfile = make_timesheet(tmpdir, name, rows, time_base)
+                with open(csvfile) as fileobj:
+                    text = fileobj.read()
+
+                def record(benchmark, times):
+                    result = {'benchmark': benchmark, 'rows': rows,
+                              'time_base': time_base, 'repeat': len(times),
+                              'best': min(times),
+                              'mean': statistics.mean(times)}
+                    results.append(result)
+                    if verbose:
+                        print('{:>8} {:<5} {:<22} {:9.4f} s'.format(
+                            rows, time_base, benchmark, result['best']))
+
+                _run_timesheet(record, tmpdir, name, csvfile, text,
+                               time_base, repeat)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    return results
+
+
+def _run_timesheet(record, path, name, csvfile, text, time_base, repeat):
+    # time everything for one synthetic timesheet in directory `path`
+
+    _run_render(record, data.Data(name, path=path).store, repeat)
+
+    record('get_unique',
+           measure(lambda: get_unique(text, 'Activity'), repeat))
+
+    record('head_tail', measure(lambda: head_tail(text), repeat))
+
+    _, lines = head_tail(text)
+    fields = [line.split(',') for line in lines]
+
+    # str_to_date is given dates in the DD/MM/YYYY form a user would type
+    dates = ['/'.join(reversed(row[0].split('-'))) for row in fields]
+    record('str_to_date',
+           measure(lambda: [str_to_date(date) for date in dates], repeat))
+
+    durations = [row[1] for row in fields]
+    record('format_duration',
+           measure(lambda: [format_duration(dur) for dur in durations],
+                   repeat))
+
+    pristine = text
+
+    def fresh():
+        # restore the csv file and remove files left by previous saves,
+        # then load the timesheet
+        with open(csvfile, 'w') as fileobj:
+            fileobj.write(pristine)
+        timesheet = data.Data(name, path=path)
+        for file in timesheet.backend.files()[1:]:
+            if os.path.exists(file):
+                os.remove(file)
+        return data.Data(name, path=path)
+
+    record('Data.__init__', measure(lambda: data.Data(name, path=path),
+                                    repeat))
+
+    # one percent of the entries, spread through the timesheet
+    def some_ids(data):
+        return list(data.store.ids[::100])
+
+    def removed(data):
+        data.delete_rows(some_ids(data))
+        return data
+
+    def edited(data):
+        changes = data.store.get_rows(some_ids(data))
+        for fields in changes.values():
+            fields[2] = 'Edited'
+        data.update_rows(changes)
+        return data
+
+    record('Data.delete_rows',
+           measure(removed, repeat, setup=fresh))
+
+    record('Data.update_rows',
+           measure(edited, repeat, setup=fresh))
+
+    def added(data):
+        data.add_new('2000-01-03,{},Admin,120\n'.format(
+            '01:00' if time_base == 'hour' else '1'))
+        return data
+
+    record('Data.save (new entry)',
+           measure(lambda data: data.save(), repeat,
+                   setup=lambda: added(fresh())))
+
+    record('Data.save (removed)',
+           measure(lambda data: data.save(), repeat,
+                   setup=lambda: removed(fresh())))
+
+    record('Data.save (edited)',
+           measure(lambda data: data.save(), repeat,
+                   setup=lambda: edited(fresh())))
+
+
+def _run_render(record, store, repeat):
+    # time rendering the html of `store`, as the main display does
+
+    record('store_to_html',
+           measure(lambda: store_to_html(store, cache=RenderCache()),
+                   repeat))
+
+    cache = RenderCache()
+    store_to_html(store, cache=cache)
+
+    record('store_to_html (cached)',
+           measure(lambda: store_to_html(store, cache=cache), repeat))
+
+    # change the activity of an entry in the middle, so that its month is
+    # rendered again and the others are taken from the cache
+    row_id = store.ids[len(store) // 2]
+    names = iter(['Edited', 'Admin'] * repeat)
+
+    def edit():
+        fields = store.get_rows([row_id])[row_id]
+        fields[2] = next(names)
+        store.update_rows({row_id: fields})
+
+    record('store_to_html (edited)',
+           measure(lambda _: store_to_html(store, cache=cache), repeat,
+                   setup=edit))
+
+
+def compare(old, new):
+    """ Print the ratio of new to old best times for each benchmark in both
+        lists of results.
+    """
+
+    key = lambda result: (result['benchmark'], result['rows'],
+                          result['time_base'])
+    old = {key(result): result for result in old}
+
+    for result in new:
+        try:
+            before = old[key(result)]['best']
+        except KeyError:
+            continue
+        after = result['best']
+        ratio = after / before if before else float('inf')
+        print('{:>8} {:<5} {:<22} {:9.4f} s -> {:9.4f} s  x{:.2f}'.format(
+            result['rows'], result['time_base'], result['benchmark'],
+            before, after, ratio))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-o', '--output', default='benchmark.json',
+                        help='file to write the results to')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=sizes,
+                        help='numbers of rows (default: %(default)s)')
+    parser.add_argument('-t', '--time-bases', nargs='+', default=time_bases,
+                        choices=time_bases)
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('-c', '--compare',
+                        help='results of a previous run to compare with')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.time_bases, args.repeat)
+
+    info = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'results': results}
+
+    with open(args.output, 'w') as fileobj:
+        json.dump(info, fileobj, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fileobj:
+            compare(json.load(fileobj)['results'], results)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Command line interface to the timesheets, which doesn't need Qt or a display.
+
+Examples
+
+    python cli.py list
+    python cli.py add Alice '2 Jan 2024' 7:30 Admin
+    python cli.py totals Alice --period week
+    python cli.py html Alice -o alice.html
+    python cli.py csv Alice > alice.csv
+    python cli.py payroll --period month --date '1 Jan 2024'
+"""
+
+import argparse
+import datetime
+import sys
+
+from data import Data
+
+# the other modules are imported by the commands which need them, so that
+# each command only pays for its own imports
+
+
+def list_timesheets(args, out):
+    """ Print the name, number of entries, dates and pay of every timesheet.
+    """
+    from registry import Registry
+    from money import format_money
+
+    for record in Registry().list():
+        out.write('{:<20} {:>8} {:>10} {:>10} {:>14}\n'.format(
+            record.name, record.rows, record.first or '-',
+            record.last or '-', format_money(record.pay, record.currency)))
+
+
+def add(args, out):
+    """ Add an entry to a timesheet and save it. """
+    from format_dur import format_duration, parse_duration
+    from money import rate_to_cents
+
+    data = _open(args.name)
+
+    date = _date(args.date)
+
+    # check the values as AddLineDialog does
+    duration = args.duration
+    if data.timebase == 'hour':
+        duration = format_duration(duration, exact=True)
+    else:
+        parse_duration(duration, 'day', exact=True)
+    rate = args.rate if args.rate is not None else data.rate
+    rate_to_cents(rate, exact=True)
+
+    if ',' in args.activity:
+        raise ValueError('Activity cannot contain a comma.')
+
+    data.add_new(','.join([str(date), duration, args.activity, rate]))
+    data.save()
+
+
+def html(args, out):
+    """ Write the timesheet as html. """
+    from processcsv import write_store_html
+
+    data = _open(args.name)
+    write_store_html(out, data.store, data.currency, policy=data.policy)
+
+
+def csv(args, out):
+    """ Write the timesheet as csv. """
+    data = _open(args.name)
+    data.store.write_csv(out)
+
+
+def totals(args, out):
+    """ Print the total time and pay for each period, most recent first. """
+    from aggregate import store_totals, format_time
+    from money import Policy, format_money
+    from readconfig import ConfigParser
+    from summary import Summary, read_summary
+
+    csvfile, conffile = Data.getCsvConfFiles(args.name)
+    try:
+        conf_data = ConfigParser(conffile).read_conf()
+    except FileNotFoundError:
+        raise ValueError(
+            'There is no timesheet called "{}".'.format(args.name))
+    policy = Policy.from_conf(conf_data, args.rounding, args.round_entries)
+
+    if Summary.can_total(args.period, policy):
+        # from the monthly summary, so the entries needn't be read
+        time_base = conf_data.get('timebase', 'hour')
+        currency = conf_data.get('currency', '£')
+        summary = read_summary(csvfile, time_base)
+        totals = summary.totals(args.period, policy=policy)
+    else:
+        data = _open(args.name)
+        time_base, currency = data.timebase, data.currency
+        totals = store_totals(data.store, args.period, policy=policy)
+
+    for total in totals:
+        out.write('{} {:>6} {:>10} {:>14}\n'.format(
+            total.start, total.count, format_time(total.time, time_base),
+            format_money(total.pay, currency)))
+
+
+def payroll_report(args, out):
+    """ Print the total time and pay of every timesheet for one period, and
+        the grand totals.
+    """
+    from payroll import payroll, grand_totals
+    from aggregate import period_range, format_time
+    from money import format_money
+
+    date = _date(args.date)
+    start, stop = period_range(date, args.period)
+    out.write('Payroll from {} to {}\n'.format(
+        start, stop - datetime.timedelta(days=1)))
+
+    lines = []
+    for line in payroll(date, args.period, workers=args.jobs,
+                        rounding=args.rounding, 
+                        round_entries=args.round_entries):
+        if line.error is not None:
+            print('payroll: {}: {}'.format(line.name, line.error), 
+                  file=sys.stderr)
+        else:
+            lines.append(line)
+
+    lines.sort(key=lambda line: line.name.lower())
+    for line in lines:
+        out.write('{:<20} {:>8} {:>10} {:>14}\n'.format(
+            line.name, line.count, format_time(line.time, line.time_base),
+            format_money(line.pay, line.currency)))
+
+    for total in grand_totals(lines):
+        out.write('{:<20} {:>8} {:>10} {:>14}\n'.format(
+            'Total ({} employees)'.format(total.employees), total.count,
+            format_time(total.time, total.time_base),
+            format_money(total.pay, total.currency)))
+
+
+def _date(text):
+    # return datetime.date from date string, as entered in the timesheet
+    from str_to_date import str_to_dates
+
+    (date,), errors = str_to_dates([text])
+    if errors:
+        raise ValueError('Cannot read "{}" as a date.'.format(text))
+    return date
+
+
+def _open(name):
+    # return Data for timesheet `name`
+    try:
+        return Data(name)
+    except FileNotFoundError:
+        raise ValueError('There is no timesheet called "{}".'.format(name))
+
+
+def _add_policy_arguments(command):
+    # options overriding how pay is rounded (see money.Policy)
+    from money import roundings
+
+    command.add_argument('--rounding', choices=roundings,
+                         help="how pay is rounded to cents (default: the "
+                         "timesheet's setting, or half_up)")
+    group = command.add_mutually_exclusive_group()
+    group.add_argument('--round-entries', action='store_true', default=None,
+                       help='round the pay for each entry before adding up')
+    group.add_argument('--no-round-entries', action='store_false', 
+                       dest='round_entries',
+                       help='add up the exact pay and round the total')
+
+
+def make_parser():
+    """ Return ArgumentParser for the command line. """
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    command = commands.add_parser('list', help='list the timesheets')
+    command.set_defaults(func=list_timesheets)
+
+    command = commands.add_parser('add', help='add an entry to a timesheet')
+    command.add_argument('name', help='timesheet name')
+    command.add_argument('date', help="date, e.g. '2 Jan 2020' ('' for today)")
+    command.add_argument('duration',
+                         help='hours (e.g. 7:30 or 7.5) or days (e.g. 0.5)')
+    command.add_argument('activity')
+    command.add_argument('-r', '--rate',
+                         help="rate of pay (default: the timesheet's rate)")
+    command.set_defaults(func=add)
+
+    for name, func, help in [('html', html, 'write a timesheet as html'),
+                             ('csv', csv, 'write a timesheet as csv'),
+                             ('totals', totals, 
+                              'total time and pay for each period')]:
+        command = commands.add_parser(name, help=help)
+        command.add_argument('name', help='timesheet name')
+        command.add_argument('-o', '--output',
+                             help='file to write to (default: stdout)')
+        if name == 'totals':
+            command.add_argument('-p', '--period', default='month',
+                                 choices=('month', 'week', 'year'))
+            _add_policy_arguments(command)
+        command.set_defaults(func=func)
+
+    command = commands.add_parser(
+        'payroll', help='total time and pay of every timesheet for a period')
+    command.add_argument('-p', '--period', default='month',
+                         choices=('month', 'week', 'year'))
+    command.add_argument('-d', '--date', default='',
+                         help="any day in the period (default: today)")
+    command.add_argument('-j', '--jobs', type=int,
+                         help='number of processes (default: number of CPUs)')
+    command.add_argument('-o', '--output',
+                         help='file to write to (default: stdout)')
+    _add_policy_arguments(command)
+    command.set_defaults(func=payroll_report)
+
+    return parser
+
+
+def main(argv=None):
+
+    args = make_parser().parse_args(argv)
+
+    try:
+        if getattr(args, 'output', None):
+            with open(args.output, 'w') as out:
+                args.func(args, out)
+        else:
+            args.func(args, sys.stdout)
+    except (ValueError, OSError) as err:
+        print('{}: {}'.format(args.command, err), file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+
+    sys.exit(main())
@@ -5,15 +5,16 @@ Also provides QDialog_CTRL_Q base class.
 """
 
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import (QAction,  QDialog, QDialogButtonBox, QGridLayout, 
-                             QLabel, QLineEdit, QMessageBox, QRadioButton,  
+from PyQt5.QtWidgets import (QAction, QCheckBox, QComboBox, QDialog, 
+                             QDialogButtonBox, QGridLayout, QLabel, 
+                             QLineEdit, QMessageBox, QRadioButton,  
                              QVBoxLayout)
 from metaclass import QtABCMeta
+from money import Policy, default_policy
 import os
 import re
 from abc import abstractmethod
-
-datapath = os.path.join(os.path.expanduser('~'), '.timesheetproject')
+from paths import datapath
 
 
 class QDialog_CTRL_Q(QDialog):
@@ -77,6 +78,23 @@ class ConfigDataDialog(QDialog_CTRL_Q, metaclass=QtABCMeta):
         currencyLabel.setAlignment(Qt.AlignRight)
         self.currencyEdit = QLineEdit(self)
         
+        # how pay is rounded to cents (see money.Policy)
+        roundingLabel = QLabel('Round pay:')
+        roundingLabel.setAlignment(Qt.AlignRight)
+        self.roundingBox = QComboBox(self)
+        for rounding, text in [('half_up', 'half up'), 
+                               ('half_even', 'half to even'),
+                               ('down', 'down')]:
+            self.roundingBox.addItem(text, rounding)
+        self.roundEntriesBox = QCheckBox('each entry', self)
+        self.roundEntriesBox.setToolTip(
+            'Round the pay for each entry, rather than the monthly total')
+        
+        policy = self.data.policy if self.data else default_policy
+        self.roundingBox.setCurrentIndex(
+            self.roundingBox.findData(policy.rounding))
+        self.roundEntriesBox.setChecked(policy.round_entries)
+        
         # if we have a data object, set text
         if self.data:
             self.nameEdit.setText(self.data.name)
@@ -112,6 +130,11 @@ class ConfigDataDialog(QDialog_CTRL_Q, metaclass=QtABCMeta):
         editLayout.addWidget(currencyLabel, row, 0)
         editLayout.addWidget(self.currencyEdit, row, 1)
         
+        row += 1
+        editLayout.addWidget(roundingLabel, row, 0)
+        editLayout.addWidget(self.roundingBox, row, 1)
+        editLayout.addWidget(self.roundEntriesBox, row, 3)
+        
         layout = QVBoxLayout()
         layout.addLayout(editLayout)
         layout.addWidget(buttonBox)
@@ -124,6 +147,11 @@ class ConfigDataDialog(QDialog_CTRL_Q, metaclass=QtABCMeta):
     @abstractmethod     
     def okClicked(self): pass
 
+    def policy(self):
+        """ Return the money.Policy chosen in the dialog. """
+        return Policy(self.roundingBox.currentData(), 
+                      self.roundEntriesBox.isChecked())
+
     def check_name(self, name):
         # if name has been changed, check if it is valid
         if True:
@@ -138,6 +166,10 @@ class ConfigDataDialog(QDialog_CTRL_Q, metaclass=QtABCMeta):
         message = 'Please provide a {} for the new timesheet.'.format(which)
         QMessageBox.warning(self, title, message)
         
+    def rate_error(self, err):
+        title = 'Invalid rate of pay!'
+        QMessageBox.warning(self, title, str(err))
+        
     def name_error(self, name):
         title = 'Timesheet already exists!'
         message = '''There is already a timesheet called "{}". Please provide 
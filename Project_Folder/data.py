@@ -0,0 +1,280 @@
+"""
+Timesheet data, without any GUI.
+
+Supplies Data, which holds a timesheet's entries and settings and saves them.
+"""
+
+import os
+import re
+
+from entrystore import EntryStore
+from money import Policy, default_policy
+from storage import open_backend
+from readconfig import ConfigParser
+from registry import Registry
+from summary import Summary, summary_file
+from paths import datapath
+
+
+class Data:
+    # separate class to handle all the data
+    
+    def __init__(self, project_name, read_only=False, path=datapath):
+        """ Object that controls the csv (and config) data. 
+        
+            The entries are held in an EntryStore, `store`, and saved by a 
+            storage backend (see storage.py); csv text is only produced when 
+            the timesheet is saved or exported.
+            
+            Reading a timesheet also adds missing settings to its config 
+            file, saves its monthly summary, if that was out of date, and 
+            updates the registry (see `record`). If `read_only` is True, 
+            this is left until `record` is called, e.g. when the timesheet 
+            is read in a background thread.
+
+            Timesheets are directories in `path`, which is
+            ~/.timesheetproject by default.
+        """
+        
+        self.modified = False
+        self.path = path
+        
+        if project_name is None:
+            self.csvfile = self.conffile = None
+            self.backend = None
+            self.name = 'None'
+            self.rate = ''
+            self.currency = ''
+            self.timebase = ''
+            self.policy = default_policy
+            self.store = EntryStore()
+            self.summary = Summary()
+                       
+        else:            
+            files = self.getCsvConfFiles(project_name, path)
+            self.csvfile, self.conffile = files
+                
+            self.cfg = ConfigParser(self.conffile)
+                
+            conf_data = self.cfg.read_conf()
+            
+            # if conf_data is not empty...
+            self.name = conf_data['name']
+            self.rate = conf_data['rate']
+            # 'currency' and 'timebase' are a new features, so attempting to
+            # read them from the config will fail first time for old versions
+            # In that case, set it to defaults; user can change them, if 
+            # necessary. The defaults are added to the config file (in a 
+            # single write) by `record`
+            self._conf_defaults = {}
+            for key, default in [('currency', '£'), ('timebase', 'hour')]:
+                if key not in conf_data:
+                    self._conf_defaults[key] = default
+            self.currency = conf_data.get('currency', '£')
+            self.timebase = conf_data.get('timebase', 'hour')
+            # how pay is rounded to cents; the keys are only in the config
+            # if the policy has been changed from the default
+            self.policy = Policy.from_conf(conf_data)
+            
+            # durations are parsed according to the time base, so the config
+            # has to be read first
+            self.backend = open_backend(self.csvfile)
+            self.store = self.backend.load(self.timebase)
+            
+            # totals of each month, which are saved with the timesheet so 
+            # that they can be used without reading the entries
+            self.summary = Summary.load(summary_file(self.csvfile), 
+                                        self.backend.files(), self.timebase)
+            self._summary_saved = self.summary is not None
+            if self.summary is None:
+                self.summary = Summary.from_store(self.store)
+            else:
+                self.summary.adopt(self.store)
+            
+            self.registry = Registry(path)
+            if not read_only:
+                self.record()
+                
+    def record(self):
+        """ Add missing settings to the config file, save the monthly 
+            summary, if it was out of date, and make sure the registry's 
+            record of this timesheet is current.
+        """
+        if self._conf_defaults:
+            with self.cfg.batch():
+                for key, value in self._conf_defaults.items():
+                    self.cfg.update_conf(key, value)
+            self._conf_defaults = {}
+        if not self.modified:
+            if not self._summary_saved:
+                self.save_summary()
+            self.registry.validate(self.name, self.summary, self.currency,
+                                   self.policy, self.store)
+                
+    @property
+    def csv_data(self):
+        """ The timesheet as csv text. """
+        return self.store.to_csv()
+        
+    def is_open(self):
+        """ Return True if this object holds a timesheet. """
+        return self.csvfile is not None
+                
+    @staticmethod
+    def getCsvConfFiles(project_name, path=datapath):
+        path = os.path.join(path, project_name)
+        file = 'ts_' + project_name.lower()
+        exts = ('.csv', '.conf')
+        csvfile, conffile = (os.path.join(path, file+ext) for ext in exts)
+        return csvfile, conffile
+
+    def add_new(self, new_data):
+        """ Add new line(s) of csv text. 
+        
+            ValueError is raised for values which cannot be parsed or would
+            be rounded when they are stored (see EntryStore.parse_fields),
+            and none of the lines are added.
+        """
+        rows = [line.strip().split(',') for line in new_data.splitlines()
+                if line.strip()]
+        # parse every line before adding any of them
+        values = [self.store.parse_values(row, exact=True) for row in rows]
+        for row, (date, dur, act, rate) in zip(rows, values):
+            self.store.add(date, dur, self.store.activity_id(act), rate)
+            self.backend.add(row)
+        self.summary.sync(self.store)
+        self.modified = True
+        
+    def delete_rows(self, ids):
+        """ Remove the entries with the given row ids. """
+        rows = self.store.get_rows(ids)
+        if self.store.delete_rows(rows):
+            for row in rows.values():
+                self.backend.remove(row)
+            self.summary.sync(self.store)
+            self.modified = True
+        
+    def update_rows(self, changes):
+        """ Replace entries; `changes` is a dict of {row id: fields}. 
+        
+            See EntryStore.update_rows.
+        """
+        if changes:
+            old = self.store.get_rows(changes)
+            self.store.update_rows(changes)
+            new = self.store.get_rows(changes)
+            for row_id in old:
+                self.backend.remove(old[row_id])
+                self.backend.add(new[row_id])
+            self.summary.sync(self.store)
+            self.modified = True
+        
+    def save(self):
+        # save changes with the storage backend
+        if self.modified:
+            self.backend.save(self.store)
+            self.save_summary()
+            self.registry.update(self.name, self.summary, self.currency,
+                                 self.policy, self.store)
+            self.modified = False
+        return True
+    
+    def save_summary(self):
+        """ Write the monthly summary, for the saved entries. """
+        try:
+            self.summary.save(summary_file(self.csvfile), 
+                              self.backend.files())
+        except OSError:
+            # it is made from the entries again if it is missing
+            pass
+        else:
+            self._summary_saved = True
+    
+    
+    def new_name(self, value):
+        """ Set new timesheet name. """
+        
+        value = re.sub('\s', '_', str(value))
+        
+        # rename directory in .timesheetproject
+        current_path = os.path.join(self.path, self.name)
+        new_path = os.path.join(self.path, value)
+        os.rename(current_path, new_path)
+        
+        # store new name variable
+        self.name = value
+        
+        # store and update file names
+        current_files = [self.csvfile, self.conffile] + self.backend.files()
+        new_files = self.getCsvConfFiles(self.name, self.path)
+        
+        # rename the csv, conf and backend files
+        # the backend files have the same name as the csv file, with a 
+        # different extension
+        csvbase = os.path.splitext(os.path.basename(self.csvfile))[0]
+        newbase = os.path.splitext(os.path.basename(new_files[0]))[0]
+        for file in current_files:
+            _, current = os.path.split(file)
+            new = os.path.join(new_path, current.replace(csvbase, newbase, 1))
+            current = os.path.join(new_path, current)
+            if os.path.exists(current):
+                os.rename(current, new)
+            
+        # store new file names
+        self.csvfile, self.conffile = new_files
+        
+        # set new paths for cfg and backend
+        self.cfg.setFilename(self.conffile)
+        self.backend.setCsvFile(self.csvfile)
+        # update config data
+        self.cfg.update_conf('name', self.name)
+        self.registry.rename(os.path.basename(current_path), self.name)
+
+            
+    def new_rate(self, value):
+        """ Set new rate of pay. """
+        # set new rate and update config file
+        self.rate = str(value)
+        self.cfg.update_conf('rate', str(value))
+        
+    def new_currency(self, value):
+        """ Set new currency. """
+        # set new currency and update config file
+        self.currency = str(value)
+        self._conf_defaults.pop('currency', None)
+        self.cfg.update_conf('currency', str(value))
+        self.registry.update(self.name, self.summary, self.currency,
+                             self.policy, self.store)
+        
+    def new_policy(self, policy):
+        """ Set new money.Policy for rounding pay. """
+        self.policy = policy
+        with self.cfg.batch():
+            for key, value in policy.to_conf().items():
+                self.cfg.update_conf(key, value)
+        self.registry.update(self.name, self.summary, self.currency,
+                             self.policy, self.store)
+        
+    def new_timebase(self, value):
+        """ Set new timebase. 
+        
+            The time base can only be changed while the timesheet is empty,
+            as there is no fixed number of hours in a day to convert the 
+            durations with; otherwise ValueError is raised.
+        """
+        value = str(value)
+        if value == self.timebase:
+            return
+        if len(self.store):
+            raise ValueError('The time base of a timesheet with entries '
+                             'cannot be changed.')
+        # set new timebase and update config file
+        self.timebase = value
+        self.store.time_base = self.timebase
+        self._conf_defaults.pop('timebase', None)
+        self.cfg.update_conf('timebase', value)
+        self.summary.sync(self.store)
+        if not self.modified:
+            self.save_summary()
+        self.registry.update(self.name, self.summary, self.currency,
+                             self.policy, self.store)
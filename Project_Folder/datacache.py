@@ -0,0 +1,93 @@
+"""
+Cache of timesheets which have been read, so that they can be opened again
+without reading their files.
+
+Supplies DataCache, which holds Data objects, least recently used first, and
+`file_stamp`, which tells whether a timesheet's files have changed.
+"""
+
+from collections import OrderedDict
+import os
+
+from data import Data
+from storage import open_backend
+
+
+def file_stamp(name):
+    """ Return the modification times and sizes of the files of timesheet
+        `name`, which change whenever the timesheet is changed.
+    """
+    csvfile, conffile = Data.getCsvConfFiles(name)
+    stamp = []
+    for file in [conffile] + open_backend(csvfile).files():
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+class DataCache:
+
+    def __init__(self, max_items=8, max_bytes=256*1024*1024):
+        """ Data objects for up to `max_items` timesheets, using up to about
+            `max_bytes` of memory. When either limit is reached, the least
+            recently used timesheets are dropped.
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        # name: (Data, file stamp, size in bytes)
+        self._items = OrderedDict()
+        self.nbytes = 0
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, data, stamp=None):
+        """ Add Data object to the cache.
+
+            `stamp` is the `file_stamp` of the timesheet when it was read. If
+            it isn't given, it is taken now, so the timesheet must have been
+            saved.
+        """
+        if stamp is None:
+            stamp = file_stamp(data.name)
+        self.remove(data.name)
+        size = data.store.nbytes()
+        self._items[data.name] = (data, stamp, size)
+        self.nbytes += size
+        self._evict()
+
+    def take(self, name):
+        """ Remove and return Data for timesheet `name`, or None if it isn't
+            cached or its files have changed since it was read.
+        """
+        item = self._items.get(name)
+        if item is None:
+            return None
+        self.remove(name)
+        data, stamp, size = item
+        if stamp != file_stamp(name):
+            return None
+        return data
+
+    def remove(self, name):
+        """ Drop timesheet `name`, if it is cached. """
+        item = self._items.pop(name, None)
+        if item is not None:
+            self.nbytes -= item[2]
+
+    def drop_oldest(self):
+        """ Drop the least recently used timesheet. """
+        self.remove(next(iter(self._items)))
+
+    def _evict(self):
+        # drop the least recently used timesheets until within the limits
+        while self._items and (len(self._items) > self.max_items or
+                               self.nbytes > self.max_bytes):
+            self.drop_oldest()
@@ -0,0 +1,65 @@
+"""
+Delete timesheets in a background thread.
+
+Supplies DeleteWorker, a QRunnable for a QThreadPool, and DeleteSignals,
+through which it reports its progress.
+"""
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+import trash
+
+
+class DeleteSignals(QObject):
+    # message, number done and total number
+    progress = pyqtSignal(str, int, int)
+    # names of timesheets moved to the trash (only those which were moved, if
+    # there was an error)
+    moved = pyqtSignal(list)
+    # number of timesheets purged from the trash
+    finished = pyqtSignal(int)
+    # error message
+    error = pyqtSignal(str)
+
+
+class DeleteWorker(QRunnable):
+
+    def __init__(self, names, path, signals):
+        """ Move timesheets to the trash, then purge old timesheets from the
+            trash.
+
+            Parameters
+            ----------
+            names : list of str
+                names of the timesheets to delete
+            path : str
+                directory holding the timesheets
+            signals : DeleteSignals
+                object with the signals
+        """
+        super().__init__()
+        self.names = names
+        self.path = path
+        self.signals = signals
+
+    def run(self):
+
+        # the timesheets are moved in order, so if there is an error, those 
+        # before it have been moved
+        moved = []
+
+        def moving(done, total):
+            moved[:] = self.names[:done]
+            self.signals.progress.emit('Deleting timesheets', done, total)
+
+        def purging(done, total):
+            self.signals.progress.emit('Emptying trash', done, total)
+
+        try:
+            trash.move_to_trash(self.names, self.path, moving)
+        except OSError as err:
+            self.signals.error.emit(str(err))
+        finally:
+            self.signals.moved.emit(moved)
+
+        self.signals.finished.emit(trash.purge(self.path, progress=purging))
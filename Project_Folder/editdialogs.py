@@ -1,28 +1,87 @@
 """ 
 Dialogs required by Timesheet when adding or removing data.
-Supplies AddLineDialog, NewRateDialog, and RemoveLineDialog.
+Supplies AddLineDialog, NewRateDialog, and RemoveLineDialog, and the 
+EntryTableModel used to display entries in a table.
 
 Also supplies EditTimesheetSettingsDialog.
 """
 
 from PyQt5.QtGui import QIcon, QKeySequence
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import (QAbstractListModel, QAbstractTableModel, 
+                          QModelIndex, Qt)
 from PyQt5.QtWidgets import (QAbstractItemView, QCompleter, QDialogButtonBox, 
                              QGridLayout, QLabel, QLineEdit, QMessageBox,
-                             QPushButton, QTableWidget, QTableWidgetItem, 
-                             QVBoxLayout)
+                             QPushButton, QTableView, QVBoxLayout)
 from metaclass import QtABCMeta
 from configdialogs import QDialog_CTRL_Q, ConfigDataDialog
-from str_to_date import str_to_date
-from format_dur import format_duration
-from processcsv import get_unique, head_tail
-import os
-import re
+from str_to_date import str_to_date, str_to_dates
+from format_dur import format_duration, parse_duration
+from money import rate_to_cents
 from abc import abstractmethod
 
-datapath = os.path.join(os.path.expanduser('~'), '.timesheetproject')
 datefmt = '%d %b %Y'
 
+# ActivityModel shared by all completers
+_activity_model = None
+
+
+def activity_model(index):
+    """ Return the ActivityModel for ActivityIndex `index`, which is shared by
+        every activity QCompleter, with the names used by its entries.
+    """
+    global _activity_model
+    if _activity_model is None or _activity_model.index is not index:
+        _activity_model = ActivityModel(index)
+    _activity_model.refresh()
+    return _activity_model
+
+
+class ActivityModel(QAbstractListModel):
+    
+    def __init__(self, index):
+        """ List model of the activity names in an ActivityIndex which are 
+            used by at least one entry.
+        
+            The names are sorted case-insensitively, so QCompleter can use 
+            a binary search. The number of entries with each activity is 
+            given for Qt.UserRole.
+        """
+        super().__init__()
+        self.index = index
+        self.names = []
+        # index version and extra names when the names were last updated
+        self._state = None
+        
+    def refresh(self, extra=()):
+        """ Update the names if the index has changed.
+        
+            `extra` are names to be offered as well, e.g. activities typed 
+            in a dialog which haven't been added yet.
+        """
+        state = (self.index.version, frozenset(extra))
+        if state != self._state:
+            names = set(self.index.used())
+            names.update(extra)
+            self.beginResetModel()
+            self.names = sorted(names, key=lambda name: (name.lower(), name))
+            self.endResetModel()
+            self._state = state
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.names)
+    
+    def data(self, idx, role=Qt.DisplayRole):
+        if not idx.isValid():
+            return None
+        name = self.names[idx.row()]
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            return name
+        if role == Qt.UserRole:
+            return self.index.count(name)
+        return None
+
 
 class EditDialog(QDialog_CTRL_Q, metaclass=QtABCMeta):
     """ Subclass for AddLineDialog and TableLineDiaolg (which itself is the
@@ -32,7 +91,7 @@ class EditDialog(QDialog_CTRL_Q, metaclass=QtABCMeta):
     """
     def __init__(self, data):
         
-        if data.csv_data.strip():
+        if data.is_open():
             super().__init__()
             self.initUI(data)
         else:
@@ -64,13 +123,14 @@ class AddLineDialog(QDialog_CTRL_Q):
         self.initUI(data)
 #        else:
 #            title = "Cannot edit timesheet that doesn't exist!"
-#            msg = "Please open or create a timesheet before trying to edit it."
+#            msg = ("Please open or create a timesheet before trying to "
+#                   "edit it.")
 #            QMessageBox.warning(self, title, msg)
             
         
     def initUI(self, data):
         
-        if not data.csv_data.strip():
+        if not data.is_open():
             title = "Cannot edit timesheet that doesn't exist!"
             msg = "Please open or create a timesheet before trying to edit it."
             QMessageBox.warning(self, title, msg)
@@ -87,14 +147,18 @@ class AddLineDialog(QDialog_CTRL_Q):
             self.msg = ''
             
             # get words for QCompleter
-            self.uniqact = get_unique(self.data.csv_data, 'Activity', False)
+            self.activities = self.data.store.activity_index
+            self.activityModel = activity_model(self.activities)
+            # activities typed in this dialog which no entry uses yet
+            self.newActivities = set()
             
             self.newButton = QPushButton(QIcon.fromTheme('list-add'), '')
             self.newButton.setShortcut(QKeySequence(Qt.CTRL + Qt.Key_N))
             self.newButton.clicked.connect(self.addLine)
             
             self.dateLabel = QLabel('Date')
-            self.durLabel = QLabel('Duration ({})'.format(self.data.timebase+'s'))
+            self.durLabel = QLabel('Duration ({})'.format(
+                self.data.timebase+'s'))
             self.actLabel = QLabel('Activity')
             self.rateLabel = QLabel('Rate') 
     
@@ -147,11 +211,12 @@ class AddLineDialog(QDialog_CTRL_Q):
             # self.row is current row in QGridLayout
             # first entry in self.rows when self.row = 2
             prev_act = self.rows[self.row-2][2].text()
-            if prev_act not in self.uniqact:
-                self.uniqact.append(prev_act)
+            if prev_act and not self.activities.count(prev_act):
+                self.newActivities.add(prev_act)
+                self.activityModel.refresh(self.newActivities)
                 
-        # make completer with uniqact for actEdit
-        self.completer(self.uniqact, self.actEdit)
+        # make completer with the shared activity model for actEdit
+        self.completer(self.activityModel, self.actEdit)
 
         return (self.dateEdit, self.durEdit, self.actEdit, self.rateEdit)
             
@@ -173,17 +238,12 @@ class AddLineDialog(QDialog_CTRL_Q):
         self.layout.addWidget(a, self.row, 2)
         self.layout.addWidget(r, self.row, 3)
         
-    def completer(self, lst, edit):
-        comp = QCompleter(lst)
+    def completer(self, model, edit):
+        comp = QCompleter(model, edit)
         comp.setCaseSensitivity(Qt.CaseInsensitive)
+        comp.setModelSorting(QCompleter.CaseInsensitivelySortedModel)
         edit.setCompleter(comp)
         
-    def update_completer(self, new, lst, edit):
-        if new not in lst:
-            lst += new
-            print(lst)
-            self.completer(lst, edit)
-        
     def set_new_values(self):
         """ Put new csv data into Data object. """
         
@@ -193,33 +253,42 @@ class AddLineDialog(QDialog_CTRL_Q):
         valid = True
         
         # get text from every QLineEdit
-        for row in self.rows:
-            
-            line = [field.text() for field in row]
+        lines = [[field.text() for field in row] for row in self.rows]
+        
+        # parse all the dates in one go; dates which cannot be parsed are 
+        # in `errors`
+        dates, errors = str_to_dates(line[0] for line in lines)
+        
+        for idx, line in enumerate(lines):
             
             # format date and duration
-            # catch any exception thrown if the value entered cannot be parsed
-            try:
-                line[0] = str(str_to_date(line[0]))
-            except ValueError:
+            if idx in errors:
                 self.invalid_value_message(line[0])
                 valid = False
+            else:
+                line[0] = str(dates[idx])
                 
-            # if time base is hours, format the string accordingly
+            # if time base is hours, format the string accordingly; either 
+            # way, it must be a duration which can be stored without rounding
             if self.data.timebase == 'hour':
                 try:
-                    line[1] = format_duration(line[1])
+                    line[1] = format_duration(line[1], exact=True)
                 except ValueError:
                     self.invalid_value_message(line[1])
                     valid = False
-            # otherwise (time base is days), as long as it can be a float,
-            # everything's fine
+            # otherwise (time base is days), it is stored as it is
             else:
                 try:
-                    float(line[1])
+                    parse_duration(line[1], 'day', exact=True)
                 except ValueError:
                     self.invalid_value_message(line[1])
                     valid = False
+                    
+            try:
+                rate_to_cents(line[3], exact=True)
+            except ValueError:
+                self.invalid_value_message(line[3])
+                valid = False
             
             try:
                 line = ','.join(line)
@@ -242,6 +311,85 @@ class AddLineDialog(QDialog_CTRL_Q):
         QMessageBox.warning(self, title, message)
         
         
+class EntryTableModel(QAbstractTableModel):
+    
+    def __init__(self, store):
+        """ Table model of the entries in an EntryStore, most recent first.
+        
+            Cells are formatted when the view asks for them, so only the
+            visible rows are ever rendered. Edits are kept in `edits`, a dict
+            of {row id: fields} for the rows which have been changed, and are
+            not applied to the store.
+            
+            Parameters
+            ----------
+            store : EntryStore
+                timesheet entries
+        """
+        super().__init__()
+        self.store = store
+        # row ids of the entries, in display order
+        self.ids = store.ids[::-1]
+        self.edits = {}
+        
+    def position(self, row):
+        """ Return position in the store of table row `row`. """
+        return len(self.ids) - 1 - row
+    
+    def row_id(self, row):
+        """ Return row id of table row `row`. """
+        return self.ids[row]
+        
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.ids)
+    
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store.header)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.store.header[section]
+        return None
+    
+    def flags(self, index):
+        return super().flags(index) | Qt.ItemIsEditable
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            row, col = index.row(), index.column()
+            try:
+                return self.edits[self.ids[row]][col]
+            except KeyError:
+                return self.store.field(self.position(row), col)
+        return None
+    
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        
+        row, col = index.row(), index.column()
+        row_id = self.ids[row]
+        
+        original = self.store.row(self.position(row))
+        fields = list(self.edits.get(row_id, original))
+        fields[col] = str(value)
+        
+        # only keep rows which differ from the store
+        if fields == original:
+            self.edits.pop(row_id, None)
+        else:
+            self.edits[row_id] = fields
+            
+        self.dataChanged.emit(index, index)
+        return True
+    
+    
 class TableLineDiaolg(EditDialog, metaclass=QtABCMeta):
     
     def __init__(self, data):
@@ -259,9 +407,10 @@ class TableLineDiaolg(EditDialog, metaclass=QtABCMeta):
         """
         
         try:
+            # EditDialog calls initUI, if there is a timesheet to show
             super().__init__(data)
-            self.initUI(data)
-            self.customise()
+            if data.is_open():
+                self.customise()
         except RuntimeError as err:
             title = '{}'.format(err)
             msg = "Please open or create a timesheet before trying to edit it."
@@ -273,35 +422,18 @@ class TableLineDiaolg(EditDialog, metaclass=QtABCMeta):
         
         self.data = data
         
-        header, self.csv_data = head_tail(self.data.csv_data)
-        
-        # display most recent csv_data at top
-        self.csv_data.reverse()
+        # the model displays the most recent entries at the top, and keeps 
+        # the row id of each line so that changes can be applied to the 
+        # right entry
+        self.model = EntryTableModel(self.data.store)
         
-        self.num_rows = len(self.csv_data)
-        self.num_cols = len(header)
+        self.num_cols = self.model.columnCount()
 
         # make table
-        self.table = QTableWidget(self.num_rows, self.num_cols)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         # remove numbers from rows
         self.table.verticalHeader().setVisible(False)
-        # set headers
-        self.table.setHorizontalHeaderLabels(header)
-
-        # put data in table
-        for row, data in enumerate(self.csv_data):
-            
-            date, dur, act, rate = data.split(',')
-            
-            item0 = QTableWidgetItem(date)
-            item1 = QTableWidgetItem(dur)
-            item2 = QTableWidgetItem(act)
-            item3 = QTableWidgetItem(rate)
-            self.table.setItem(row, 0, item0)
-            self.table.setItem(row, 1, item1)
-            self.table.setItem(row, 2, item2)
-            self.table.setItem(row, 3, item3)
-            
         
         buttonBox = QDialogButtonBox(QDialogButtonBox.Ok | 
                                      QDialogButtonBox.Cancel)
@@ -309,12 +441,12 @@ class TableLineDiaolg(EditDialog, metaclass=QtABCMeta):
         buttonBox.accepted.connect(self.apply_changes)
         buttonBox.rejected.connect(self.reject)
         
-        for i in range(self.num_rows):
+        for i in range(self.num_cols):
            self.table.setColumnWidth(i, 110)
         
         # for some reason, self.table.width() returns a number larger than
         # it should be
-        width = (self.num_cols + 0.1) * self.table.columnWidth(0)
+        width = int((self.num_cols + 0.1) * self.table.columnWidth(0))
         
         # exaplin how this window works
         # self.explain.setText() should be applied in the derived classes
@@ -354,25 +486,23 @@ class RemoveLineDialog(TableLineDiaolg):
         super().__init__(data)
 
     def customise(self):
-        # only select rows
+        # only select rows, and don't allow editing
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         
-        self.explain.setText('Select rows and click "OK" to remove them from '
-                             'the timesheet.\nThis cannot be undone, so please '
-                             'be careful!')
+        self.explain.setText('Select rows and click "OK" to remove them '
+                             'from the timesheet.\nThis cannot be undone, so '
+                             'please be careful!')
         
         self.setWindowTitle('Remove entries')
         
     def apply_changes(self):
         """ Remove selected rows from the timesheet. """
-        self.selected = self.table.selectedItems()
+        self.selected = self.table.selectionModel().selectedIndexes()
         
-        rows = set(item.row() for item in self.selected)
+        rows = set(index.row() for index in self.selected)
         
-        for idx in rows:
-            row = self.csv_data[idx]
-            self.data.csv_data = re.sub(row, '', self.data.csv_data)
-            self.data.modified = True
+        self.data.delete_rows(self.model.row_id(row) for row in rows)
 
         self.accept()
         
@@ -395,19 +525,14 @@ class EditLineDialog(TableLineDiaolg):
         self.setWindowTitle('Edit entries')
 
     def apply_changes(self):
-        # check every row in the table against the csv data 
-        # if different, overwrite the csv row
-        
-        for row in range(self.num_rows):
-            
-            trow = ','.join([self.table.item(row, col).text() 
-                             for col in range(self.num_cols)])
-    
-            drow = self.csv_data[row]
-            
-            if trow != drow:
-                self.data.csv_data = re.sub(drow, trow, self.data.csv_data)
-                self.data.modified = True
+        # the model keeps track of which rows have been changed, so only
+        # those need to be written
+        try:
+            self.data.update_rows(self.model.edits)
+        except ValueError as err:
+            title = 'Could not edit entries!'
+            QMessageBox.warning(self, title, str(err))
+            return
             
         self.accept()
         
@@ -420,41 +545,60 @@ class EditTimesheetSettingsDialog(ConfigDataDialog):
         
         valid = True
         
-        # set name
-        name = self.nameEdit.text().strip()
-        # if name is valid
-        if name:
-            # if there is already a timesheet with this name, raise an error
-            if not self.check_name(name):
-                self.name_error(name)
-                valid = False
+        # the config file is written once, when all the changes are made
+        with self.data.cfg.batch():
+            # set name
+            name = self.nameEdit.text().strip()
+            # if name is valid
+            if name:
+                # if the name has been changed and there is already a 
+                # timesheet with the new name, raise an error
+                if name == self.data.name:
+                    pass
+                elif not self.check_name(name):
+                    self.name_error(name)
+                    valid = False
+                else:
+                    self.data.new_name(name)
             else:
-                self.data.new_name(name)
-        else:
-            self.error_message('name')
-            valid = False
+                self.error_message('name')
+                valid = False
         
-        # set rate
-        rate = self.rateEdit.text().strip()
-        if rate:
-            self.data.new_rate(rate)
-        else:
-            self.error_message('rate of pay')
-            valid = False
+            # set rate
+            rate = self.rateEdit.text().strip()
+            if rate:
+                try:
+                    rate_to_cents(rate, exact=True)
+                except ValueError as err:
+                    self.rate_error(err)
+                    valid = False
+                else:
+                    self.data.new_rate(rate)
+            else:
+                self.error_message('rate of pay')
+                valid = False
             
-        # set time base
-        if self.dayButton.isChecked():
-            self.data.new_timebase('day')
-        else:
-            self.data.new_timebase('hour')
+            # set time base
+            timebase = 'day' if self.dayButton.isChecked() else 'hour'
+            try:
+                self.data.new_timebase(timebase)
+            except ValueError as err:
+                title = 'Could not change time base!'
+                QMessageBox.warning(self, title, str(err))
+                valid = False
             
-        # set currency
-        curr = self.currencyEdit.text().strip()
-        if curr:
-            self.data.new_currency(curr)
-        else:
-            self.error_message('currency')
-            valid = False
+            # set currency
+            curr = self.currencyEdit.text().strip()
+            if curr:
+                self.data.new_currency(curr)
+            else:
+                self.error_message('currency')
+                valid = False
+                
+            # set how pay is rounded
+            policy = self.policy()
+            if policy != self.data.policy:
+                self.data.new_policy(policy)
             
         if valid:
             self.accept()
@@ -0,0 +1,455 @@
+"""
+Compact in-memory store for the entries in a timesheet.
+
+Supplies EntryStore, which holds each column of the timesheet in an array of
+integers, so that the csv text only needs to be produced when the timesheet
+is saved or exported.
+"""
+
+from array import array
+import bisect
+import calendar
+import copy
+import datetime
+import io
+import itertools
+import re
+import sys
+
+from activityindex import ActivityIndex
+from format_dur import parse_duration, duration_to_str, format_durations
+from money import rate_to_cents, cents_to_str
+
+# every change to a month gets a new version number, unique across all stores,
+# so that a RenderCache can tell if a month needs to be rendered again
+_versions = itertools.count(1)
+
+# names of the array attributes of an EntryStore, in the order of the values
+# in a row
+_columns = ('ids', 'dates', 'durations', 'activities', 'rates')
+
+
+class EntryStore:
+
+    def __init__(self, time_base='hour', header=None):
+        """ Columns of timesheet entries, sorted by date.
+
+            Parameters
+            ----------
+            time_base : str
+                'hour' or 'day'. Durations are stored in minutes if 'hour'
+                and in thousandths of a day if 'day'.
+            header : list of str, optional
+                column names
+        """
+
+        self.time_base = time_base
+        self.header = header
+
+        # row ids, which do not change when other rows are added or removed
+        self.ids = array('i')
+        self._next_id = 0
+        
+        # date ordinals, durations, activity ids and rates in cents
+        self.dates = array('i')
+        self.durations = array('i')
+        self.activities = array('i')
+        self.rates = array('i')
+
+        # activity names and counts, indexed by id
+        self.activity_index = ActivityIndex()
+        self.activity_names = self.activity_index.names
+
+        # parsed values of rate strings which have been seen before (there 
+        # are usually only a few different rates)
+        self._rate_cache = {}
+
+        self.month_versions = {}
+
+    @classmethod
+    def from_lines(cls, lines, time_base='hour'):
+        """ Make EntryStore from an iterable of csv lines (e.g. a file object).
+
+            The first line beginning with a word character is taken to contain
+            the column names; lines beginning with a number contain data.
+        """
+
+        store = cls(time_base)
+
+        for line in lines:
+            if line[:1].isdigit():
+                store._append(*store.parse_line(line))
+            elif store.header is None and re.match(r'\w', line):
+                store.header = line.strip().split(',')
+
+        store._finish_loading()
+
+        return store
+
+    @classmethod
+    def from_values(cls, rows, time_base='hour', header=None):
+        """ Make EntryStore from an iterable of (date ordinal, duration, 
+            activity name, rate in cents) tuples.
+        """
+
+        store = cls(time_base, header)
+
+        for date, duration, activity, rate in rows:
+            store._append(date, duration, store.activity_id(activity), rate)
+
+        store._finish_loading()
+
+        return store
+
+    @classmethod
+    def from_csv(cls, text, time_base='hour'):
+        """ Make EntryStore from a string of csv data. """
+        return cls.from_lines(io.StringIO(text), time_base)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def snapshot(self):
+        """ Return a read-only copy of the entries, e.g. for rendering in
+            another thread while this store is changed.
+        """
+        snap = copy.copy(self)
+        for name in _columns:
+            setattr(snap, name, getattr(self, name)[:])
+        snap.activity_names = list(self.activity_names)
+        snap.month_versions = dict(self.month_versions)
+        # the activity index isn't copied, so the snapshot can't be changed
+        snap.activity_index = None
+        return snap
+
+    def nbytes(self):
+        """ Return approximate number of bytes of memory used by the entries.
+        """
+        size = sum(len(getattr(self, name)) * getattr(self, name).itemsize
+                   for name in _columns)
+        # each activity name is held by the store and its index
+        size += 2 * sum(sys.getsizeof(name) for name in self.activity_names)
+        return size
+
+    def parse_line(self, line, exact=False):
+        """ Return tuple of date ordinal, duration, activity id and rate in
+            cents from csv line.
+        """
+        return self.parse_fields(line.strip().split(','), exact)
+    
+    def parse_fields(self, fields, exact=False):
+        """ Return tuple of date ordinal, duration, activity id and rate in
+            cents from list of csv strings.
+            
+            If `exact` is True, ValueError is raised for values which would
+            be rounded when they are stored (see format_dur.parse_duration
+            and money.rate_to_cents), as is wanted for new entries.
+        """
+        date, dur, act, rate = self.parse_values(fields, exact)
+        return date, dur, self.activity_id(act), rate
+
+    def parse_values(self, fields, exact=False):
+        """ Return tuple of date ordinal, duration, activity name and rate
+            in cents from list of csv strings, without adding the activity
+            to the index.
+
+            `exact` is as in `parse_fields`.
+        """
+
+        date, dur, act, rate = fields
+
+        year, month, day = date.split('-')
+        date = datetime.date(int(year), int(month), int(day)).toordinal()
+
+        try:
+            cents = self._rate_cache[rate]
+        except KeyError:
+            self._rate_cache[rate] = cents = rate_to_cents(rate)
+        if exact:
+            # the cache holds rounded rates
+            rate_to_cents(rate, exact)
+        rate = cents
+
+        dur = parse_duration(dur, self.time_base, exact)
+
+        return date, dur, act, rate
+
+    def activity_id(self, name):
+        """ Return id of activity `name`, adding it if it is new. """
+        return self.activity_index.intern(name)
+
+    def add_line(self, line, exact=False):
+        """ Parse csv line and insert it in date order. 
+        
+            `exact` is as in `parse_fields`.
+        """
+        self.add(*self.parse_line(line, exact))
+
+    def add(self, date, duration, activity, rate):
+        """ Insert entry in date order and return its row id.
+
+            `activity` is an activity id; see `activity_id`.
+        """
+
+        row_id = self._new_id()
+
+        idx = bisect.bisect_right(self.dates, date)
+
+        self.ids.insert(idx, row_id)
+        self.dates.insert(idx, date)
+        self.durations.insert(idx, duration)
+        self.activities.insert(idx, activity)
+        self.rates.insert(idx, rate)
+
+        self.activity_index.increment(activity)
+        self._touch(date)
+        
+        return row_id
+        
+    def delete_rows(self, ids):
+        """ Remove the entries with the given row ids, in a single pass. 
+        
+            Returns the number of entries removed.
+        """
+        
+        ids = set(ids)
+        
+        positions = [idx for idx, row_id in enumerate(self.ids) 
+                     if row_id in ids]
+        
+        if not positions:
+            return 0
+        
+        dates = set(map(self.dates.__getitem__, positions))
+        
+        for idx in positions:
+            self.activity_index.decrement(self.activities[idx])
+        
+        # copy the runs of entries between the ones being removed
+        starts = [idx+1 for idx in positions]
+        stops = positions[1:] + [len(self)]
+        
+        for name in _columns:
+            column = getattr(self, name)
+            new = column[:positions[0]]
+            for start, stop in zip(starts, stops):
+                new += column[start:stop]
+            setattr(self, name, new)
+        
+        for date in dates:
+            self._touch(date)
+            
+        return len(positions)
+    
+    def update_rows(self, changes):
+        """ Replace the entries with the given row ids.
+        
+            Parameters
+            ----------
+            changes : dict
+                {row id: fields}, where fields is a list of csv strings (date, 
+                duration, activity and rate) or a tuple as returned by 
+                `parse_fields`
+                
+            If any of the fields cannot be parsed, or would be rounded (see 
+            `parse_fields`), ValueError is raised and no entries are changed.
+        """
+        
+        # parse everything first, so that nothing is changed if there is an
+        # invalid value
+        values = {}
+        for row_id, fields in changes.items():
+            if isinstance(fields[0], str):
+                fields = self.parse_fields(fields, exact=True)
+            values[row_id] = fields
+            
+        moved = {}
+        
+        for idx, row_id in enumerate(self.ids):
+            if row_id not in values:
+                continue
+            date, duration, activity, rate = values[row_id]
+            self._touch(self.dates[idx])
+            if date == self.dates[idx]:
+                self.activity_index.decrement(self.activities[idx])
+                self.activity_index.increment(activity)
+                self.durations[idx] = duration
+                self.activities[idx] = activity
+                self.rates[idx] = rate
+            else:
+                # entries which change date have to move to keep the 
+                # columns in date order
+                moved[row_id] = values[row_id]
+        
+        if moved:
+            self.delete_rows(moved)
+            self._insert_many([(row_id,) + tuple(fields) 
+                               for row_id, fields in moved.items()])
+                
+    def get_rows(self, ids):
+        """ Return dict of {row id: list of csv strings} for the given ids, 
+            found in a single pass.
+        """
+        ids = set(ids)
+        return {row_id: self.row(idx) for idx, row_id in enumerate(self.ids)
+                if row_id in ids}
+    
+    def find(self, values):
+        """ Return the row id of an entry equal to `values` (a tuple as 
+            returned by `parse_fields`), or None if there isn't one.
+        """
+        date = values[0]
+        start = bisect.bisect_left(self.dates, date)
+        stop = bisect.bisect_right(self.dates, date, start)
+        for idx in range(start, stop):
+            if (self.durations[idx], self.activities[idx], 
+                    self.rates[idx]) == tuple(values[1:]):
+                return self.ids[idx]
+        return None
+                
+    def index(self, row_id):
+        """ Return the current position of the entry with id `row_id`. """
+        return self.ids.index(row_id)
+
+    def row(self, idx):
+        """ Return entry `idx` as list of csv strings. """
+        return [str(datetime.date.fromordinal(self.dates[idx])),
+                duration_to_str(self.durations[idx], self.time_base),
+                self.activity_names[self.activities[idx]],
+                cents_to_str(self.rates[idx])]
+
+    def field(self, idx, column):
+        """ Return column `column` (0 to 3) of entry `idx` as csv string. """
+        if column == 0:
+            return str(datetime.date.fromordinal(self.dates[idx]))
+        elif column == 1:
+            return duration_to_str(self.durations[idx], self.time_base)
+        elif column == 2:
+            return self.activity_names[self.activities[idx]]
+        else:
+            return cents_to_str(self.rates[idx])
+
+    def iter_rows(self, reverse=False):
+        """ Generator yielding every entry as list of csv strings. """
+        
+        # durations are formatted a block at a time, with format_durations
+        block = 4096
+        starts = range(0, len(self), block)
+        if reverse:
+            starts = reversed(starts)
+            
+        names = self.activity_names
+        
+        for start in starts:
+            stop = start + block
+            durations = format_durations(self.durations[start:stop], 
+                                         self.time_base)
+            rows = zip(self.dates[start:stop], durations, 
+                       self.activities[start:stop], self.rates[start:stop])
+            if reverse:
+                rows = reversed(list(rows))
+            for date, dur, act, rate in rows:
+                yield [str(datetime.date.fromordinal(date)), dur, names[act],
+                       cents_to_str(rate)]
+
+    def iter_lines(self):
+        """ Generator yielding the csv text, one line at a time. """
+        if self.header is not None:
+            yield ','.join(self.header) + '\n'
+        for row in self.iter_rows():
+            yield ','.join(row) + '\n'
+
+    def to_csv(self):
+        """ Return the csv text. """
+        return ''.join(self.iter_lines())
+
+    def write_csv(self, fileobj):
+        """ Write the csv text to an open file object. """
+        fileobj.writelines(self.iter_lines())
+
+    def iter_months(self):
+        """ Generator yielding (month code, start, stop) for every month,
+            most recent first, where entries `start` to `stop` fall in that
+            month.
+
+            The month code is 12*year + month - 1.
+        """
+
+        stop = len(self)
+
+        while stop > 0:
+            date = datetime.date.fromordinal(self.dates[stop-1])
+            first = date.replace(day=1).toordinal()
+            start = bisect.bisect_left(self.dates, first, 0, stop)
+            yield 12*date.year + date.month - 1, start, stop
+            stop = start
+
+    def display_order(self, start, stop):
+        """ Return indices of entries `start` to `stop`, most recent first. """
+        names = self.activity_names
+        key = lambda idx: (self.dates[idx], self.durations[idx],
+                           names[self.activities[idx]], self.rates[idx])
+        return sorted(range(start, stop), key=key, reverse=True)
+
+    def _new_id(self):
+        row_id = self._next_id
+        self._next_id += 1
+        return row_id
+
+    def _append(self, date, duration, activity, rate):
+        self.ids.append(self._new_id())
+        self.dates.append(date)
+        self.durations.append(duration)
+        self.activities.append(activity)
+        self.rates.append(rate)
+        self.activity_index.increment(activity)
+
+    def _insert_many(self, rows):
+        # insert rows of (row id, date, duration, activity, rate) in date 
+        # order, copying each column once
+        rows.sort(key=lambda row: row[1])
+        positions = [bisect.bisect_right(self.dates, row[1]) for row in rows]
+        
+        for n, name in enumerate(_columns):
+            column = getattr(self, name)
+            new = array('i')
+            start = 0
+            for stop, row in zip(positions, rows):
+                new += column[start:stop]
+                new.append(row[n])
+                start = stop
+            new += column[start:]
+            setattr(self, name, new)
+            
+        for row in rows:
+            self.activity_index.increment(row[3])
+            self._touch(row[1])
+
+    def _finish_loading(self):
+        self._sort()
+        for code, _, _ in self.iter_months():
+            self.month_versions[code] = next(_versions)
+
+    def _sort(self):
+        # put the columns in date order, if they aren't already
+        dates = self.dates
+        if all(dates[n] <= dates[n+1] for n in range(len(dates)-1)):
+            return
+        self._select(sorted(range(len(dates)), key=dates.__getitem__))
+        
+    def _select(self, indices):
+        # keep only the entries at `indices`, in that order
+        for name in _columns:
+            column = getattr(self, name)
+            setattr(self, name, array('i', map(column.__getitem__, indices)))
+
+    def _touch(self, date):
+        # give the month containing `date` a new version
+        date = datetime.date.fromordinal(date)
+        self.month_versions[12*date.year + date.month - 1] = next(_versions)
+
+
+def month_name(code):
+    """ Return 'Month Year' string for month code. """
+    year, month = divmod(code, 12)
+    return calendar.month_name[month+1] + ' ' + str(year)
@@ -3,17 +3,20 @@ Supplies NewTimesheetDialog and TimesheetsFileDialog (the base class for
 OpenTimesheetDialog and DeleteTimesheetDialog).
 """
 
+from PyQt5.QtCore import (QAbstractTableModel, QModelIndex, 
+                          QSortFilterProxyModel, Qt)
 from PyQt5.QtWidgets import (QAbstractItemView, QDialog, QDialogButtonBox, 
-                             QListWidget, QListWidgetItem, QMessageBox, 
+                             QLineEdit, QMessageBox, QTableView, 
                              QVBoxLayout)
 from metaclass import QtABCMeta
 from configdialogs import ConfigDataDialog
+from registry import Registry
+from money import default_policy, format_money, rate_to_cents
+import datetime
 import os
 import re
 from abc import abstractmethod
-import subprocess
-
-datapath = os.path.join(os.path.expanduser('~'), '.timesheetproject')
+from paths import datapath
 
 
 class NewTimesheetDialog(ConfigDataDialog):
@@ -45,6 +48,12 @@ class NewTimesheetDialog(ConfigDataDialog):
         if not rate:
             self.error_message('rate of pay')
             valid = False
+        else:
+            try:
+                rate_to_cents(rate, exact=True)
+            except ValueError as err:
+                self.rate_error(err)
+                valid = False
             
         # check currency...
         curr = self.currencyEdit.text().strip()
@@ -76,7 +85,14 @@ class NewTimesheetDialog(ConfigDataDialog):
                 with open(self.new_conf, 'w') as fileobj:
                     text = ('name={}\nrate={}\ncurrency={}\ntimebase={}\n'
                             .format(name, rate, curr, timebase))
+                    # the policy is only written if it isn't the default
+                    policy = self.policy()
+                    if policy != default_policy:
+                        for item in policy.to_conf().items():
+                            text += '{}={}\n'.format(*item)
                     fileobj.write(text)
+                    
+                Registry(datapath).scan(name)
             
                 self.accept()
                 
@@ -87,6 +103,63 @@ class NewTimesheetDialog(ConfigDataDialog):
                 self.initUI()
         
     
+class RegistryModel(QAbstractTableModel):
+    
+    columns = ('Name', 'Entries', 'From', 'To', 'Pay', 'Modified')
+    
+    def __init__(self, records, parent=None):
+        """ Table of timesheets, from a list of registry.Record. 
+        
+            The display text of each cell is given for Qt.DisplayRole and a
+            value to sort by for Qt.UserRole.
+        """
+        super().__init__(parent)
+        self.records = records
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section]
+        return None
+        
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        
+        record = self.records[index.row()]
+        column = index.column()
+        
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return record.name
+            elif column == 1:
+                return str(record.rows)
+            elif column == 2:
+                return record.first or ''
+            elif column == 3:
+                return record.last or ''
+            elif column == 4:
+                return format_money(record.pay, record.currency)
+            else:
+                modified = datetime.datetime.fromtimestamp(
+                    record.modified / 1e9)
+                return modified.strftime('%Y-%m-%d %H:%M')
+            
+        elif role == Qt.UserRole:
+            return (record.name.lower(), record.rows, record.first or '', 
+                    record.last or '', record.pay, record.modified)[column]
+        
+        elif role == Qt.TextAlignmentRole and column in (1, 4):
+            return Qt.AlignRight | Qt.AlignVCenter
+        
+        return None
+    
+    
 class TimesheetsFileDialog(QDialog, metaclass=QtABCMeta):
     
     def __init__(self):
@@ -97,29 +170,44 @@ class TimesheetsFileDialog(QDialog, metaclass=QtABCMeta):
         
     def initUI(self):
         
-        # get list of timesheets from names of directories
-        timesheets = list(file for file in os.listdir(datapath) 
-                     if os.path.isdir(os.path.join(datapath, file)))
+        # get the timesheets from the registry, rather than reading each one
+        records = Registry(datapath).list()
         
-        if len(timesheets) == 0:
+        if len(records) == 0:
             self.none_message()
             self.reject()
             self.close()
             
         else:
-            # make list where only one thing can be selected
-            self.timesheetList = QListWidget()
-#            self.timesheetList.setSelectionMode(QAbstractItemView.SingleSelection)
-            # double click or 'OK' button select that timesheet
-            self.timesheetList.itemDoubleClicked.connect(self.get_selected)
+            self.model = RegistryModel(records, self)
+            
+            # sort by the values for Qt.UserRole and filter by name
+            self.proxy = QSortFilterProxyModel(self)
+            self.proxy.setSourceModel(self.model)
+            self.proxy.setSortRole(Qt.UserRole)
+            self.proxy.setFilterKeyColumn(0)
+            self.proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
             
-            listWidgetItems = []
+            self.filterEdit = QLineEdit(self)
+            self.filterEdit.setPlaceholderText('Filter by name')
+            self.filterEdit.textChanged.connect(
+                self.proxy.setFilterFixedString)
             
-            # set the text in the list
-            for timesheet in timesheets:
-                item = QListWidgetItem(self.timesheetList)
-                item.setText(timesheet)
-                listWidgetItems.append(item)
+            self.timesheetTable = QTableView(self)
+            self.timesheetTable.setModel(self.proxy)
+            self.timesheetTable.setSortingEnabled(True)
+            self.timesheetTable.sortByColumn(0, Qt.AscendingOrder)
+            self.timesheetTable.setSelectionBehavior(
+                QAbstractItemView.SelectRows)
+            self.timesheetTable.setEditTriggers(
+                QAbstractItemView.NoEditTriggers)
+            self.timesheetTable.verticalHeader().hide()
+            # only look at the first rows when sizing the columns
+            self.timesheetTable.horizontalHeader().setResizeContentsPrecision(
+                100)
+            self.timesheetTable.resizeColumnsToContents()
+            # double click or 'OK' button select that timesheet
+            self.timesheetTable.doubleClicked.connect(self.get_selected)
                 
             buttonBox = QDialogButtonBox(QDialogButtonBox.Ok | 
                                          QDialogButtonBox.Cancel)
@@ -128,10 +216,17 @@ class TimesheetsFileDialog(QDialog, metaclass=QtABCMeta):
             buttonBox.rejected.connect(self.reject)
                 
             layout = QVBoxLayout()
-            layout.addWidget(self.timesheetList)
+            layout.addWidget(self.filterEdit)
+            layout.addWidget(self.timesheetTable)
             layout.addWidget(buttonBox)
             
             self.setLayout(layout)
+            self.resize(600, 400)
+            
+    def selected_names(self):
+        """ Return names of the selected timesheets. """
+        rows = self.timesheetTable.selectionModel().selectedRows(0)
+        return [self.proxy.data(index) for index in rows]
             
     @abstractmethod
     def get_selected(self): pass
@@ -149,11 +244,14 @@ class OpenTimesheetDialog(TimesheetsFileDialog):
         super().__init__()
         self.setWindowTitle('Open a timesheet')
         
-        self.timesheetList.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.timesheetTable.setSelectionMode(
+            QAbstractItemView.SingleSelection)
     
     def get_selected(self):
-        self.selected = self.timesheetList.selectedItems()[0].text()
-        self.accept()
+        names = self.selected_names()
+        if names:
+            self.selected = names[0]
+            self.accept()
         
     
 class DeleteTimesheetDialog(TimesheetsFileDialog):
@@ -162,17 +260,18 @@ class DeleteTimesheetDialog(TimesheetsFileDialog):
         """ Dialog to delete timesheet(s). """
         super().__init__()
         self.setWindowTitle('Delete timesheet(s)')
-        self.timesheetList.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.timesheetTable.setSelectionMode(
+            QAbstractItemView.ExtendedSelection)
     
     def get_selected(self):
-        self.selected = self.timesheetList.selectedItems()
-        self.selected = list(item.text() for item in self.selected)
-        self.confirm_message()
+        self.selected = self.selected_names()
+        if self.selected:
+            self.confirm_message()
             
     def confirm_message(self):
         
         title = 'Confirm delete'
-        message = 'This action will irreversibly delete:\n'
+        message = 'This action will delete:\n'
         for item in self.selected:
             message += '    - ' + item + '\n'
         message += 'Confirm deletion?'
@@ -180,13 +279,9 @@ class DeleteTimesheetDialog(TimesheetsFileDialog):
         ret = QMessageBox.question(self, title, message)
         
         if ret == QMessageBox.Yes:
-            # delete the directory for each
-            for item in self.selected:
-                # escape any spaces in name
-                item = re.sub(' ', '\ ', item)
-                path = os.path.join(datapath, item)
-                subprocess.run(["rm", "-r", path])
-                self.accept()
+            # the main window moves the timesheets to the trash in the
+            # background (see deleteworker.py)
+            self.accept()
 
         if ret == QMessageBox.No:
             self.reject()
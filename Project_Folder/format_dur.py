@@ -1,9 +1,14 @@
+import decimal
+import functools
 import re
-import sys
 
-def format_duration(dur):
+def format_duration(dur, exact=False):
     """ Take any reasonable input string and convert to HH:MM
     
+        Decimal hours are rounded to the nearest minute, unless `exact` is 
+        True (see `parse_duration`). ValueError is raised if `dur` is not a
+        duration.
+    
         Examples
         --------
         >>> format_duration('1')
@@ -12,6 +17,8 @@ def format_duration(dur):
         '00:30'
         >>> format_duration('3.25')
         '03:15'
+        >>> format_duration('1.15')
+        '01:09'
         >>> format_duration('1:0')
         '01:00'
         >>> format_duration('2:')
@@ -22,38 +29,201 @@ def format_duration(dur):
         '25:10'
     """
     
-    try:
-        return '{:02d}:00'.format(int(dur))
+    return duration_to_str(parse_duration(dur, 'hour', exact), 'hour')
+        
+
+# durations are stored in arrays of C ints (see entrystore.py)
+_max_units = 2**31 - 1
+
+_hours_mins = re.compile(r'(-?)(\d*):(\d*)')
+
+
+# the same few durations are used over and over in a timesheet
+@functools.lru_cache(maxsize=4096)
+def parse_duration(dur, time_base, exact=False):
+    """ Return duration string as an integer number of units. 
     
-    except ValueError:
+        If `time_base` is 'hour', the unit is minutes and `dur` can be HH:MM
+        or a decimal number of hours. If `time_base` is 'day', the unit is 
+        thousandths of a day and `dur` should be a decimal number of days.
         
+        Decimal hours which are not a whole number of minutes, and days with
+        more than three decimal places, are rounded, unless `exact` is True,
+        in which case ValueError is raised, so that new entries are never 
+        changed when they are stored. ValueError is also raised for values
+        which are not finite or are too large to be stored.
+        
+        Examples
+        --------
+        >>> parse_duration('01:30', 'hour')
+        90
+        >>> parse_duration('1.15', 'hour')
+        69
+        >>> parse_duration('1.5', 'day')
+        1500
+        >>> parse_duration('0.125', 'day')
+        125
+        >>> parse_duration('0.1255', 'day', exact=True)
+        Traceback (most recent call last):
+        ...
+        ValueError: Duration "0.1255" has more than three decimal places.
+        >>> parse_duration('1.001', 'hour', exact=True)
+        Traceback (most recent call last):
+        ...
+        ValueError: Duration "1.001" is not a whole number of minutes.
+        >>> parse_duration('inf', 'day')
+        Traceback (most recent call last):
+        ...
+        ValueError: Cannot format "inf" as duration.
+    """
+    
+    text = dur.strip()
+    
+    match = _hours_mins.fullmatch(text) if time_base == 'hour' else None
+    if match:
+        sign, hours, mins = match.groups()
+        units = decimal.Decimal(int(hours or 0) * 60 + int(mins or 0))
+        if sign:
+            units = -units
+    else:
         try:
-            f = float(dur)
-            hours, _ = re.split('\.', dur)
-            if not hours:
-                hours = 0
-            else:
-                hours = int(hours)
-            mins = int((f - hours) * 60)
-            return '{:02d}:{:02d}'.format(hours, mins)
+            units = decimal.Decimal(text)
+        except decimal.InvalidOperation:
+            units = None
+        if units is None or not units.is_finite():
+            raise ValueError('Cannot format "{}" as duration.'.format(dur))
+        units *= 60 if time_base == 'hour' else 1000
+        
+    rounded = units.to_integral_value(decimal.ROUND_HALF_EVEN)
+    if exact and rounded != units:
+        if time_base == 'hour':
+            message = 'Duration "{}" is not a whole number of minutes.'
+        else:
+            message = 'Duration "{}" has more than three decimal places.'
+        raise ValueError(message.format(dur))
+    if abs(rounded) > _max_units:
+        raise ValueError('Duration "{}" is too long.'.format(dur))
+    return int(rounded)
+    
+    
+def duration_to_str(units, time_base):
+    """ Return number of units (see `parse_duration`) as a string. 
+    
+        Examples
+        --------
+        >>> duration_to_str(90, 'hour')
+        '01:30'
+        >>> duration_to_str(-90, 'hour')
+        '-01:30'
+        >>> duration_to_str(1500, 'day')
+        '1.5'
+        >>> duration_to_str(1000, 'day')
+        '1'
+        >>> duration_to_str(-125, 'day')
+        '-0.125'
+    """
+    
+    sign = '-' if units < 0 else ''
+    if time_base == 'hour':
+        return sign + '{:02d}:{:02d}'.format(*divmod(abs(units), 60))
+    else:
+        days, thousandths = divmod(abs(units), 1000)
+        if not thousandths:
+            return sign + str(days)
+        return sign + '{}.{:03d}'.format(days, thousandths).rstrip('0')
+    
+    
+def format_durations(units, time_base):
+    """ Return list of strings for a sequence of numbers of units, as 
+        `duration_to_str`.
+        
+        Each different number is only formatted once, so this is much faster 
+        than formatting every duration, as a timesheet uses only a few.
         
-        except ValueError:
+        Examples
+        --------
+        >>> format_durations([90, 30, 90], 'hour')
+        ['01:30', '00:30', '01:30']
+    """
+    strings = {n: duration_to_str(n, time_base) for n in set(units)}
+    return [strings[n] for n in units]
+
+
+class Duration(int):
+    """ Duration as an integer number of units: minutes for the 'hour' time
+        base and thousandths of a day for the 'day' time base.
+        
+        Use the subclasses HourDuration and DayDuration, or `Duration.parse`. 
+        Durations can be added and subtracted as integers, so totals have no 
+        rounding error, and are only formatted when converted to str.
         
-            if re.search(':', dur):
-                hours_mins = re.split(':',dur)
-                
-                for idx, s in enumerate(hours_mins):
-                    if not s:
-                        hours_mins[idx] = 0
-                    else:
-                        try:
-                            hours_mins[idx] = int(s)
-                        except ValueError:
-                            raise ValueError('Unrecognised input format')
-                            sys.exit(1)
-                        
-                return '{:02d}:{:02d}'.format(*hours_mins)
+        Examples
+        --------
+        >>> Duration.parse('01:30', 'hour') + Duration.parse('.25', 'hour')
+        HourDuration(105)
+        >>> str(sum([DayDuration(500), DayDuration(750)]))
+        '1.25'
+    """
+    
+    __slots__ = ()
+    
+    time_base = None
+    
+    @staticmethod
+    def type_for(time_base):
+        """ Return the Duration subclass for `time_base`. """
+        if time_base == 'hour':
+            return HourDuration
+        elif time_base == 'day':
+            return DayDuration
+        raise ValueError("'time_base' must be 'hour' or 'day'")
         
+    @classmethod
+    def parse(cls, dur, time_base=None):
+        """ Return Duration from string, as `parse_duration`. 
+        
+            `time_base` is only needed when called on Duration itself, 
+            rather than a subclass.
+        """
+        if time_base is None:
+            time_base = cls.time_base
+        return cls.type_for(time_base)(parse_duration(dur, time_base))
+    
+    def __str__(self):
+        return duration_to_str(int(self), self.time_base)
+    
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, int(self))
+    
+    def __add__(self, other):
+        if isinstance(other, Duration) and other.time_base != self.time_base:
+            raise TypeError('Cannot add durations with different time bases')
+        if isinstance(other, int):
+            return type(self)(int(self) + int(other))
+        return NotImplemented
+    
+    __radd__ = __add__
+    
+    def __sub__(self, other):
+        if isinstance(other, Duration) and other.time_base != self.time_base:
+            raise TypeError('Cannot subtract durations with different time '
+                            'bases')
+        if isinstance(other, int):
+            return type(self)(int(self) - int(other))
+        return NotImplemented
+    
+    
+class HourDuration(Duration):
+    """ Duration in minutes. """
+    __slots__ = ()
+    time_base = 'hour'
+    
+    
+class DayDuration(Duration):
+    """ Duration in thousandths of a day. """
+    __slots__ = ()
+    time_base = 'day'
+    
             
 if __name__ == '__main__':
     
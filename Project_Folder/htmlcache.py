@@ -0,0 +1,264 @@
+"""
+Rendered html of the timesheets, kept on disk between sessions.
+
+Supplies HtmlCache, which saves the html of the months of a timesheet which
+have been rendered in `.cache` in the timesheet's directory, so that when the
+timesheet is opened again they can be shown before it has been read, and
+don't need to be rendered again.
+
+The html is valid while the timesheet's files have the same content and the
+time base, currency and money policy are unchanged. This is checked with the
+files' modification times and sizes first; only if those have changed are the
+files hashed and compared with the content the html was rendered from.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from entrystore import month_name
+from paths import datapath
+from processcsv import RenderCache
+from readconfig import ConfigParser
+from storage import open_backend
+import money
+
+
+class HtmlCache:
+
+    version = 2
+
+    def __init__(self, path=datapath, max_bytes=128*1024*1024):
+        """ Cache of rendered html for the timesheets in `path`, using up to
+            about `max_bytes` of disk in all. When that is exceeded, the
+            html of the timesheets used longest ago is removed.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def load(self, name):
+        """ Return list of (month name, html) for the most recent months of
+            timesheet `name`, most recent first, or None if there is no
+            valid cached html.
+        """
+        index = self._index(name)
+        if index is None:
+            return None
+
+        index_file, html_file = self._cache_files(name)
+        try:
+            with open(html_file, 'rb') as fileobj:
+                html = fileobj.read()
+        except OSError:
+            return None
+
+        months = []
+        offset = 0
+        for month, length in index['months']:
+            months.append((month, html[offset:offset+length].decode()))
+            offset += length
+        if offset != len(html):
+            # html file doesn't belong to this index
+            return None
+
+        # record that the html has been used, for `evict`; the html can 
+        # still be used if that fails, e.g. if the file has just been evicted
+        try:
+            os.utime(index_file)
+        except OSError:
+            pass
+        return months
+
+    def render_cache(self, name, store, currency, months=None, policy=None):
+        """ Return RenderCache for timesheet `name`'s EntryStore `store`,
+            holding its cached months.
+
+            `months` is the list returned by `load`; if it isn't given, it is
+            loaded. `store` must have been read from the same files, and
+            `policy` is the timesheet's money.Policy.
+        """
+        render_cache = RenderCache()
+        render_cache.check_settings(store.time_base, currency, policy)
+        if months is None:
+            months = self.load(name)
+        elif self._index(name, rehash=False) is None:
+            # the files have changed since `months` was loaded, so they may
+            # not be what `store` was read from
+            months = None
+        if months:
+            for (code, _, _), (month, html) in zip(store.iter_months(),
+                                                   months):
+                if month_name(code) != month:
+                    break
+                render_cache.store(month, store.month_versions[code], html)
+        return render_cache
+
+    def save(self, name, store, currency, render_cache, policy=None):
+        """ Save the html in RenderCache `render_cache` of the most recent
+            months of timesheet `name`, which have been rendered from its
+            current EntryStore `store` with money.Policy `policy`.
+
+            `store` must not have unsaved changes.
+        """
+        if policy is None:
+            policy = money.default_policy
+        months = []
+        if render_cache.settings == (store.time_base, currency, policy):
+            for code, _, _ in store.iter_months():
+                month = month_name(code)
+                try:
+                    version, html = render_cache.months[month]
+                except KeyError:
+                    break
+                if version != store.month_versions[code]:
+                    break
+                months.append((month, html.encode()))
+        if not months:
+            return
+
+        index_file, html_file = self._cache_files(name)
+        files, settings = self._source(name)
+        stamp = _stamp(files)
+
+        # don't write the same html again
+        try:
+            with open(index_file) as fileobj:
+                index = json.load(fileobj)
+            if (index.get('version') == self.version and
+                    index['stamp'] == stamp and
+                    index['settings'] == settings and
+                    len(index['months']) >= len(months)):
+                return
+        except (OSError, KeyError, ValueError):
+            pass
+
+        index = {'version': self.version,
+                 'digest': _digest(files, settings),
+                 'stamp': stamp,
+                 'settings': settings,
+                 'months': [(month, len(html)) for month, html in months]}
+
+        os.makedirs(os.path.dirname(index_file), exist_ok=True)
+        # the html is replaced before the index, so the index never
+        # describes html it doesn't belong to for long; `load` checks the
+        # lengths anyway
+        _write(html_file, b''.join(html for _, html in months))
+        _write(index_file, json.dumps(index).encode())
+
+        self.evict(keep=name)
+
+    def remove(self, name):
+        """ Remove the cached html of timesheet `name`. """
+        for file in self._cache_files(name):
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+
+    def evict(self, keep=None):
+        """ Remove the html of the timesheets used longest ago, other than
+            `keep`, until the cache is within `max_bytes`.
+        """
+        caches = []
+        total = 0
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if not entry.is_dir() or entry.name.startswith('.'):
+                    continue
+                index_file, html_file = self._cache_files(entry.name)
+                try:
+                    used = os.stat(index_file).st_mtime_ns
+                    size = os.stat(html_file).st_size
+                except FileNotFoundError:
+                    continue
+                caches.append((used, entry.name, size))
+                total += size
+
+        for used, name, size in sorted(caches):
+            if total <= self.max_bytes:
+                break
+            if name != keep:
+                self.remove(name)
+                total -= size
+
+    def _index(self, name, rehash=True):
+        # return the index of timesheet `name`'s cached html, or None if it 
+        # isn't valid; if `rehash` is False, the files' contents aren't
+        # checked when their modification times or sizes have changed
+        index_file, _ = self._cache_files(name)
+        try:
+            with open(index_file) as fileobj:
+                index = json.load(fileobj)
+            if index.get('version') != self.version:
+                return None
+
+            files, settings = self._source(name)
+            if index['settings'] != settings:
+                return None
+            stamp = _stamp(files)
+            if index['stamp'] != stamp:
+                # the files may have been written without being changed
+                if not rehash or index['digest'] != _digest(files, settings):
+                    return None
+                index['stamp'] = stamp
+                _write(index_file, json.dumps(index).encode())
+        except (OSError, KeyError, ValueError):
+            return None
+        return index
+
+    def _cache_files(self, name):
+        # index and html files of timesheet `name`
+        cache = os.path.join(self.path, name, '.cache')
+        return (os.path.join(cache, 'render.json'),
+                os.path.join(cache, 'render.html'))
+
+    def _source(self, name):
+        # files holding the entries of timesheet `name`, and the settings
+        # which change how they are rendered
+        base = os.path.join(self.path, name, 'ts_' + name.lower())
+        conf_data = ConfigParser(base + '.conf').read_conf()
+        settings = [conf_data.get('timebase', 'hour'),
+                    conf_data.get('currency', '£'),
+                    list(money.Policy.from_conf(conf_data))]
+        return open_backend(base + '.csv').files(), settings
+
+
+def _stamp(files):
+    # modification times and sizes of `files`
+    stamp = []
+    for file in files:
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append([stat.st_mtime_ns, stat.st_size])
+    return stamp
+
+
+def _digest(files, settings):
+    # hash of the contents of `files` and the render settings
+    digest = hashlib.sha1(json.dumps(settings).encode())
+    for file in files:
+        # only the extension, so that renaming the timesheet keeps the digest
+        digest.update(os.path.splitext(file)[1].encode() + b'\0')
+        try:
+            with open(file, 'rb') as fileobj:
+                for block in iter(lambda: fileobj.read(1 << 20), b''):
+                    digest.update(block)
+        except FileNotFoundError:
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _write(filename, content):
+    # replace `filename` with `content`, so that it is never half-written
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(filename))
+    try:
+        with os.fdopen(fd, 'wb') as fileobj:
+            fileobj.write(content)
+        os.replace(tmp, filename)
+    except BaseException:
+        os.remove(tmp)
+        raise
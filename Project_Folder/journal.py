@@ -0,0 +1,171 @@
+"""
+Append-only journal of changes to a timesheet's csv file.
+
+Supplies Journal. New, removed and edited entries are appended to the journal
+when the timesheet is saved, rather than rewriting the whole csv file, and
+the journal is folded back into the csv file by `Journal.compact`.
+"""
+
+import hashlib
+import os
+
+
+class Journal:
+
+    def __init__(self, filename):
+        """ Journal of changes to a csv file.
+
+            Each record is a line of the form '+,<csv line>' for an added
+            entry or '-,<csv line>' for a removed entry; an edit is recorded
+            as a removal followed by an addition.
+
+            The first line of the journal records a hash of the contents of 
+            the csv file it applies to. Before the csv file is replaced by 
+            `compact`, a line recording the hash of the new csv file is 
+            appended, so a journal left behind by an interrupted compaction
+            is recognised and not applied twice.
+
+            Parameters
+            ----------
+            filename : str
+                path to the journal file
+        """
+        self.setFilename(filename)
+        # records which have not been written yet
+        self.pending = []
+        # number of records in the file
+        self.count = 0
+
+    def setFilename(self, filename):
+        self.filename = filename
+
+    def __len__(self):
+        return self.count + len(self.pending)
+
+    def add(self, row):
+        """ Record new entry, given as list of csv strings. """
+        self.pending.append('+,' + ','.join(row) + '\n')
+
+    def remove(self, row):
+        """ Record removed entry, given as list of csv strings. """
+        self.pending.append('-,' + ','.join(row) + '\n')
+
+    def replay(self, store, csvfile):
+        """ Apply the records in the journal file to an EntryStore which has
+            just been read from `csvfile`.
+            
+            If the journal belongs to a different version of the csv file 
+            (e.g. the csv file has been replaced by a backup), ValueError is 
+            raised rather than losing the saved changes in the journal.
+        """
+
+        self.count = 0
+
+        try:
+            fileobj = open(self.filename)
+        except FileNotFoundError:
+            return
+
+        with fileobj:
+            base = fileobj.readline()
+            records = [record for record in fileobj 
+                       # last line may be incomplete if writing was 
+                       # interrupted
+                       if record.endswith('\n')]
+                       
+        if base != _base_line(csvfile):
+            if _compacted_line(csvfile) in records:
+                # the journal has already been written into the csv file,
+                # but compaction was interrupted before it was removed
+                try:
+                    os.remove(self.filename)
+                except OSError:
+                    # it is overwritten when changes are next saved
+                    pass
+                return
+            raise ValueError(
+                'The journal "{}" was not written for the current version of '
+                '"{}", so the changes saved in it cannot be applied. Restore '
+                'the csv file the journal belongs to, or move the journal '
+                'aside to discard those changes.'.format(self.filename, 
+                                                         csvfile))
+
+        for record in records:
+            op, line = record[0], record[2:]
+            if op == '+':
+                store.add_line(line)
+            elif op == '-':
+                row_id = store.find(store.parse_line(line))
+                if row_id is not None:
+                    store.delete_rows([row_id])
+            else:
+                continue
+            self.count += 1
+
+    def write(self, csvfile):
+        """ Append pending records to the journal file, with a single fsync.
+        """
+
+        if not self.pending:
+            return
+
+        new = not self.count or not os.path.exists(self.filename)
+
+        with open(self.filename, 'w' if new else 'a') as fileobj:
+            if new:
+                fileobj.write(_base_line(csvfile))
+            fileobj.writelines(self.pending)
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
+
+        self.count += len(self.pending)
+        self.pending = []
+
+    def compact(self, store, csvfile):
+        """ Write the whole of `store` to `csvfile` and empty the journal.
+        """
+
+        # write to a temporary file and rename, so that the csv file is
+        # never left half-written
+        tmpfile = csvfile + '.tmp'
+        with open(tmpfile, 'w') as fileobj:
+            store.write_csv(fileobj)
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
+            
+        # record that the journal is in the new csv file, in case the 
+        # journal isn't removed
+        if os.path.exists(self.filename):
+            with open(self.filename, 'a') as fileobj:
+                fileobj.write(_compacted_line(tmpfile))
+                fileobj.flush()
+                os.fsync(fileobj.fileno())
+                
+        os.replace(tmpfile, csvfile)
+
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+
+        self.count = 0
+        self.pending = []
+
+
+def _base_line(csvfile):
+    # first line of a journal, identifying the csv file it applies to
+    return '#base,{}\n'.format(_digest(csvfile))
+
+
+def _compacted_line(csvfile):
+    # line appended to a journal when it has been written into `csvfile`
+    return '#compacted,{}\n'.format(_digest(csvfile))
+
+
+def _digest(csvfile):
+    # hash of the contents of `csvfile`
+    digest = hashlib.sha1()
+    with open(csvfile, 'rb') as fileobj:
+        for block in iter(lambda: fileobj.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
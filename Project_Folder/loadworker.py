@@ -0,0 +1,108 @@
+"""
+Read a timesheet in a background thread.
+
+Supplies LoadWorker and PrefetchWorker, QRunnables for a QThreadPool, and 
+LoadSignals, through which they return the Data objects. LoadWorker also sends
+the html saved by HtmlCache, if any, before it reads the timesheet.
+"""
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from data import Data
+from datacache import file_stamp
+
+
+class LoadSignals(QObject):
+    # load number and list of (month name, html) from HtmlCache
+    cached = pyqtSignal(int, list)
+    # load number, Data and RenderCache (or None)
+    loaded = pyqtSignal(int, object, object)
+    # load number, timesheet name and error message
+    failed = pyqtSignal(int, str, str)
+    # Data and file stamp, from PrefetchWorker
+    prefetched = pyqtSignal(object, object)
+    # name of timesheet PrefetchWorker couldn't read
+    missing = pyqtSignal(str)
+
+
+class LoadWorker(QRunnable):
+
+    def __init__(self, number, name, signals, html_cache=None):
+        """ Make Data for timesheet `name`.
+
+            Parameters
+            ----------
+            number : int
+                load number, sent back with the Data, so that out of date
+                loads can be ignored
+            name : str
+                timesheet name
+            signals : LoadSignals
+                object with the signals
+            html_cache : HtmlCache, optional
+                if given, the timesheet's saved html is sent with the
+                `cached` signal, so that it can be shown while the timesheet 
+                is read, and the Data is sent with a RenderCache holding it
+        """
+        super().__init__()
+        self.number = number
+        self.name = name
+        self.signals = signals
+        self.html_cache = html_cache
+
+    def run(self):
+        months = None
+        if self.html_cache is not None:
+            months = self.html_cache.load(self.name)
+            if months:
+                self.signals.cached.emit(self.number, months)
+        try:
+            # nothing is written from this thread; the timesheet is recorded
+            # when it is shown
+            data = Data(self.name, read_only=True)
+        except (OSError, KeyError, ValueError) as err:
+            self.signals.failed.emit(self.number, self.name, str(err))
+            return
+        render_cache = None
+        if months:
+            render_cache = self.html_cache.render_cache(
+                self.name, data.store, data.currency, months, data.policy)
+        self.signals.loaded.emit(self.number, data, render_cache)
+
+
+class PrefetchWorker(QRunnable):
+
+    def __init__(self, names, signals):
+        """ Read timesheets in advance, so that they can be opened quickly.
+
+            Parameters
+            ----------
+            names : list of str
+                timesheet names, most wanted first
+            signals : LoadSignals
+                object with the signals
+        """
+        super().__init__()
+        self.names = names
+        self.signals = signals
+        self.cancelled = False
+
+    def cancel(self):
+        """ Stop before reading the next timesheet. """
+        self.cancelled = True
+
+    def run(self):
+        for name in self.names:
+            if self.cancelled:
+                return
+            try:
+                # take the stamp first, so a change made while the files are
+                # read isn't missed
+                stamp = file_stamp(name)
+                # nothing is written from this thread; the timesheet is
+                # recorded when it is opened
+                data = Data(name, read_only=True)
+            except (OSError, KeyError, ValueError):
+                self.signals.missing.emit(name)
+            else:
+                self.signals.prefetched.emit(data, stamp)
@@ -0,0 +1,230 @@
+"""
+Fixed-point money arithmetic for pay.
+
+Amounts of money are integer numbers of cents (or pence, etc.) and durations
+are integer numbers of units (minutes or thousandths of a day; see
+format_dur.py), so pay is calculated exactly. The only rounding is when a pay
+amount is converted to whole cents, which follows a Policy.
+"""
+
+from collections import namedtuple
+import decimal
+
+# NumPy takes longer to import than it takes to add up a few thousand entries
+# in Python, so it is only imported when there are at least this many entries
+numpy_min_size = 10000
+
+# False until there has been an attempt to import NumPy
+_np = False
+
+# rates are stored in arrays of C ints (see entrystore.py)
+_max_cents = 2**31 - 1
+
+
+# ways of rounding to whole cents
+roundings = ('half_up', 'half_even', 'down')
+
+_Policy = namedtuple('Policy', ['rounding', 'round_entries'])
+
+
+class Policy(_Policy):
+
+    __slots__ = ()
+
+    def __new__(cls, rounding='half_up', round_entries=False):
+        """ How pay is rounded to whole cents.
+
+            Parameters
+            ----------
+            rounding : str
+                'half_up' to round halves away from zero, 'half_even' to round
+                halves to the nearest even number of cents (banker's
+                rounding) or 'down' to round towards zero. Default is
+                'half_up'.
+            round_entries : bool
+                if True, the pay for each entry is rounded and the rounded
+                amounts are added up. If False (the default), the total for
+                a period is calculated exactly and rounded once.
+        """
+        if rounding not in roundings:
+            raise ValueError("'rounding' must be one of {}".format(roundings))
+        return super().__new__(cls, rounding, bool(round_entries))
+
+    @classmethod
+    def from_conf(cls, conf_data, rounding=None, round_entries=None):
+        """ Return the Policy set by the 'rounding' and 'round_entries' keys
+            of a timesheet's config data, which are 'half_up', 'half_even' 
+            or 'down', and 'yes' or 'no'. Keys which are missing are taken 
+            from `default_policy`.
+
+            `rounding` and `round_entries`, if given, are used instead of 
+            the config. ValueError is raised for invalid values.
+
+            Examples
+            --------
+            >>> Policy.from_conf({'rounding': 'down'})
+            Policy(rounding='down', round_entries=False)
+            >>> Policy.from_conf({'round_entries': 'yes'}, 'half_even')
+            Policy(rounding='half_even', round_entries=True)
+        """
+        if rounding is None:
+            rounding = conf_data.get('rounding', default_policy.rounding)
+        if round_entries is None:
+            value = conf_data.get('round_entries')
+            if value is None:
+                round_entries = default_policy.round_entries
+            elif value in ('yes', 'no'):
+                round_entries = value == 'yes'
+            else:
+                raise ValueError("'round_entries' must be 'yes' or 'no'")
+        return cls(rounding, round_entries)
+
+    def to_conf(self):
+        """ Return dict of the config keys and values for this Policy. """
+        return {'rounding': self.rounding,
+                'round_entries': 'yes' if self.round_entries else 'no'}
+
+    def entry_pay(self, duration, rate, time_base):
+        """ Return the pay in cents for one entry.
+
+            `duration` is in minutes or thousandths of a day and `rate` is in
+            cents per hour or day.
+        """
+        return divide(duration * rate, units_per(time_base), self.rounding)
+
+    def total_pay(self, durations, rates, time_base):
+        """ Return the total pay in cents for sequences (or numpy arrays) of
+            durations and rates, as in `entry_pay`.
+        """
+        np = numpy(len(durations))
+        if np is not None:
+            durations = np.asarray(durations, dtype=np.int64)
+            amounts = durations * np.asarray(rates, dtype=np.int64)
+            return self.round_total(amounts, time_base)
+        amounts = [dur * rate for dur, rate in zip(durations, rates)]
+        return self.round_total(amounts, time_base)
+
+    def round_total(self, amounts, time_base):
+        """ Return the total pay in cents for a sequence of amounts, which are
+            durations multiplied by rates.
+        """
+        per = units_per(time_base)
+        np = numpy(len(amounts))
+        if np is not None and isinstance(amounts, np.ndarray):
+            if self.round_entries:
+                return int(divide(amounts, per, self.rounding).sum())
+            return divide(int(amounts.sum()), per, self.rounding)
+        if self.round_entries:
+            return sum(divide(amount, per, self.rounding) 
+                       for amount in amounts)
+        return divide(sum(amounts), per, self.rounding)
+
+
+# policy used when none is given
+default_policy = Policy()
+
+
+def numpy(size=None):
+    """ Return the numpy module, or None if it isn't installed.
+    
+        If it hasn't been imported yet and `size`, the number of entries to 
+        be added up, is less than `numpy_min_size`, None is returned instead
+        of importing it.
+    """
+    global _np
+    if _np is False:
+        if size is not None and size < numpy_min_size:
+            return None
+        try:
+            import numpy as _np
+        except ImportError:
+            _np = None
+    return _np
+
+
+def units_per(time_base):
+    """ Return number of duration units in an hour or a day. """
+    return 60 if time_base == 'hour' else 1000
+
+
+def divide(numerator, denominator, rounding='half_up'):
+    """ Return `numerator` divided by positive `denominator`, rounded to an
+        integer according to `rounding` (see Policy).
+
+        `numerator` can be an int or a numpy integer array.
+
+        Examples
+        --------
+        >>> divide(25, 10), divide(-25, 10), divide(25, 10, 'half_even')
+        (3, -3, 2)
+        >>> divide(29, 10, 'down')
+        2
+    """
+
+    negative = numerator < 0
+    quotient, remainder = divmod(abs(numerator), denominator)
+
+    if rounding == 'half_up':
+        quotient += 2 * remainder >= denominator
+    elif rounding == 'half_even':
+        quotient += (2 * remainder > denominator) | (
+            (2 * remainder == denominator) & (quotient % 2 == 1))
+
+    # flip the sign of negative numerators, without branching on arrays
+    return quotient * (1 - 2 * negative)
+
+
+def rate_to_cents(rate, exact=False):
+    """ Return rate string as integer number of cents.
+
+        Rates with more than two decimal places are rounded half up, unless
+        `exact` is True, in which case ValueError is raised, as is wanted
+        for rates which are entered.
+
+        Examples
+        --------
+        >>> rate_to_cents('95.5')
+        9550
+        >>> rate_to_cents('95.555')
+        9556
+        >>> rate_to_cents('95.555', exact=True)
+        Traceback (most recent call last):
+        ...
+        ValueError: Rate "95.555" has more than two decimal places.
+    """
+    try:
+        value = decimal.Decimal(rate.strip()) * 100
+        cents = value.quantize(1, rounding=decimal.ROUND_HALF_UP)
+    except decimal.InvalidOperation:
+        raise ValueError('Cannot format "{}" as rate.'.format(rate))
+    if exact and cents != value:
+        raise ValueError(
+            'Rate "{}" has more than two decimal places.'.format(rate))
+    if abs(cents) > _max_cents:
+        raise ValueError('Rate "{}" is too large.'.format(rate))
+    return int(cents)
+
+
+def cents_to_str(cents):
+    """ Return number of cents as a string with two decimal places.
+
+        Examples
+        --------
+        >>> cents_to_str(9550)
+        '95.50'
+        >>> cents_to_str(-5)
+        '-0.05'
+    """
+    sign = '-' if cents < 0 else ''
+    return sign + '{}.{:02d}'.format(*divmod(abs(cents), 100))
+
+
+def format_money(cents, currency=''):
+    """ Return number of cents as a string with a currency symbol.
+
+        Examples
+        --------
+        >>> format_money(123456, '£')
+        '£1234.56'
+    """
+    return currency + cents_to_str(cents)
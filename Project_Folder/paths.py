@@ -0,0 +1,16 @@
+"""
+Locations of the timesheets and the global config file.
+"""
+
+import os
+
+# each timesheet is a directory in datapath
+datapath = os.path.join(os.path.expanduser('~'), '.timesheetproject')
+conffile = os.path.join(datapath, 'timesheetproject.conf')
+
+# make sure the .timesheetproject directory and config file exist
+def check_path():
+    if not os.path.exists(datapath):
+        os.mkdir(datapath)
+        with open(conffile, 'w') as fileobj:
+            fileobj.write('last=None\n')
@@ -0,0 +1,152 @@
+"""
+Payroll report: the total time and pay of every timesheet for one period.
+
+Supplies `payroll`, which reads the timesheets in a pool of processes and
+yields each one's totals as soon as they are ready, and `grand_totals`.
+
+Monthly and yearly totals come from each timesheet's summary.Summary, so
+only the timesheets whose summary files are out of date are read. Otherwise
+each timesheet is read by its storage backend, as Data reads it, and summed
+by aggregate.store_totals. Either way the totals are the same as those shown
+in the timesheet.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import bisect
+import os
+
+import aggregate
+from format_dur import Duration
+from money import Policy
+from paths import datapath
+from readconfig import ConfigParser
+from storage import open_backend
+from summary import Summary, read_summary
+
+# totals of one timesheet for the period; `time` is a format_dur.Duration and
+# `pay` is in cents. If the timesheet couldn't be read, `error` is the reason
+# and the totals are zero.
+Line = namedtuple('Line', ['name', 'currency', 'time_base', 'count', 'time',
+                           'pay', 'error'])
+
+# totals of all the timesheets with the same currency and time base
+GrandTotal = namedtuple('GrandTotal', ['currency', 'time_base', 'employees',
+                                       'count', 'time', 'pay'])
+
+# number of timesheets read by each task given to the pool; tasks of a few
+# timesheets keep the processes busy without sending a message per timesheet
+chunk_size = 16
+
+
+def timesheet_names(path=datapath):
+    """ Return sorted list of the names of the timesheets in `path`. """
+    with os.scandir(path) as entries:
+        # hidden directories, like .trash, are not timesheets
+        return sorted(entry.name for entry in entries
+                      if entry.is_dir() and not entry.name.startswith('.'))
+
+
+def payroll(date, period='month', names=None, path=datapath, workers=None,
+            mp_context=None, rounding=None, round_entries=None):
+    """ Yield Line for each timesheet, in the order they are finished.
+
+        Parameters
+        ----------
+        date : datetime.date
+            any day in the period
+        period : str
+            'month', 'week' or 'year'. Default is 'month'.
+        names : list of str, optional
+            timesheets to include. Default is all of them.
+        path : str
+            directory holding the timesheets
+        workers : int, optional
+            number of processes. Default is the number of CPUs.
+        mp_context : multiprocessing context, optional
+            how the processes are started (see concurrent.futures)
+        rounding, round_entries : optional
+            if given, pay is rounded this way for every timesheet, instead 
+            of as set in each timesheet's config (see money.Policy)
+    """
+
+    start, stop = aggregate.period_range(date, period)
+    if names is None:
+        names = timesheet_names(path)
+
+    executor = ProcessPoolExecutor(workers, mp_context)
+    try:
+        futures = [executor.submit(_read_totals, path, names[i:i+chunk_size],
+                                   start, stop, period, 
+                                   (rounding, round_entries))
+                   for i in range(0, len(names), chunk_size)]
+        for future in as_completed(futures):
+            yield from future.result()
+    finally:
+        # if the caller stops early, the timesheets not yet started are
+        # skipped
+        executor.shutdown(cancel_futures=True)
+
+
+def grand_totals(lines):
+    """ Return list of GrandTotal from Lines, one for each currency and time
+        base, as pay in different currencies and times in different units
+        can't be added.
+    """
+
+    groups = {}
+    for line in lines:
+        if line.error is not None:
+            continue
+        key = (line.currency, line.time_base)
+        try:
+            group = groups[key]
+        except KeyError:
+            group = groups[key] = [0, 0, 0, 0]
+        group[0] += 1
+        group[1] += line.count
+        group[2] += line.time
+        group[3] += line.pay
+
+    return [GrandTotal(currency, time_base, employees, count,
+                       Duration.type_for(time_base)(time), pay)
+            for (currency, time_base), (employees, count, time, pay)
+            in sorted(groups.items())]
+
+
+def _read_totals(path, names, start, stop, period, policy):
+    # run in the pool: Lines for a chunk of timesheets
+    return [_totals(path, name, start, stop, period, policy) 
+            for name in names]
+
+
+def _totals(path, name, start, stop, period, policy=(None, None)):
+    # Line for timesheet `name`, read as Registry._scan reads it; Data isn't
+    # used because it updates the registry, which the processes would race
+    # to write. `policy` is (rounding, round_entries) to use instead of the
+    # timesheet's config
+    base = os.path.join(path, name, 'ts_' + name.lower())
+    try:
+        conf_data = ConfigParser(base + '.conf').read_conf()
+        currency = conf_data.get('currency', '£')
+        time_base = conf_data.get('timebase', 'hour')
+        policy = Policy.from_conf(conf_data, *policy)
+        if Summary.can_total(period, policy):
+            summary = read_summary(base + '.csv', time_base)
+            totals = summary.totals(period, start, stop, policy)
+        else:
+            store = open_backend(base + '.csv').load(time_base)
+            # entries are sorted by date
+            first = bisect.bisect_left(store.dates, start.toordinal())
+            last = bisect.bisect_left(store.dates, stop.toordinal(), first)
+            totals = aggregate.store_totals(store, period, first, last, 
+                                            policy)
+    except (OSError, KeyError, ValueError) as err:
+        return Line(name, '', '', 0, 0, 0, str(err))
+
+    if totals:
+        total, = totals
+        return Line(name, currency, time_base, total.count, total.time,
+                    total.pay, None)
+    return Line(name, currency, time_base, 0,
+                Duration.type_for(time_base)(0), 0, None)
@@ -0,0 +1,86 @@
+"""
+Make the payroll report in a background thread.
+
+Supplies PayrollWorker, a QRunnable for a QThreadPool, and PayrollSignals,
+through which it sends the totals as they are ready.
+"""
+
+from concurrent.futures import BrokenExecutor
+import multiprocessing
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from payroll import payroll, timesheet_names
+
+
+class PayrollSignals(QObject):
+    # report number and number of timesheets in the report
+    started = pyqtSignal(int, int)
+    # report number and list of payroll.Line
+    lines = pyqtSignal(int, list)
+    # report number and True if the report was cancelled
+    finished = pyqtSignal(int, bool)
+    # report number and error message
+    error = pyqtSignal(int, str)
+
+
+class PayrollWorker(QRunnable):
+
+    # seconds between sending lines, so that the view isn't updated for
+    # every timesheet
+    interval = 0.1
+
+    def __init__(self, number, date, period, path, signals):
+        """ Total the time and pay of every timesheet for one period.
+
+            Parameters
+            ----------
+            number : int
+                report number, sent back with the lines, so that the lines of
+                a cancelled report can be ignored
+            date : datetime.date
+                any day in the period
+            period : str
+                'month', 'week' or 'year'
+            path : str
+                directory holding the timesheets
+            signals : PayrollSignals
+                object with the signals
+        """
+        super().__init__()
+        self.number = number
+        self.date = date
+        self.period = period
+        self.path = path
+        self.signals = signals
+        self.cancelled = False
+
+    def cancel(self):
+        """ Stop, without reading the timesheets which haven't been started.
+        """
+        self.cancelled = True
+
+    def run(self):
+        try:
+            names = timesheet_names(self.path)
+            self.signals.started.emit(self.number, len(names))
+            # the GUI's process has threads, which shouldn't be forked
+            lines = payroll(self.date, self.period, names, self.path,
+                            mp_context=multiprocessing.get_context('spawn'))
+            batch = []
+            sent = time.monotonic()
+            for line in lines:
+                if self.cancelled:
+                    lines.close()
+                    break
+                batch.append(line)
+                if time.monotonic() - sent > self.interval:
+                    self.signals.lines.emit(self.number, batch)
+                    batch = []
+                    sent = time.monotonic()
+            if batch:
+                self.signals.lines.emit(self.number, batch)
+        except (OSError, BrokenExecutor) as err:
+            self.signals.error.emit(self.number, str(err))
+        self.signals.finished.emit(self.number, self.cancelled)
@@ -2,87 +2,329 @@ import calendar
 import re
 import itertools
 import sys
+import threading
 
+import aggregate
+import money
+from entrystore import month_name
+from format_dur import parse_duration
 
-def csv_to_html(text, time_base, currency='£'):
-    """ Read given csv file and write html string."""
+
+def csv_to_html(text, time_base, currency='£', cache=None):
+    """ Read given csv file and write html string.
     
-    # make time base plural (e.g. days or hours)
-    time_base += 's'
+        Parameters
+        ----------
+        text : str
+            string of csv data
+        time_base : str
+            'hour' or 'day'
+        currency : str
+            currency symbol to display. Default is '£'.
+        cache : RenderCache, optional
+            if given, months whose rows have not changed since the last call
+            are taken from the cache rather than being rendered again
+    """
+    return ''.join(iter_html(text, time_base, currency, cache))
+
+
+def write_html(fileobj, text, time_base, currency='£', cache=None):
+    """ Write html for given csv text to an open file object, one fragment at
+        a time. 
+        
+        Parameters are as for `csv_to_html`.
+    """
+    fileobj.writelines(iter_html(text, time_base, currency, cache))
+
+
+def iter_html(text, time_base, currency='£', cache=None):
+    """ Generator yielding the html for given csv text in fragments.
     
-    html = ''
+        Lines are parsed and rendered one month at a time, so only the
+        current month is held in memory as parsed data.
+        
+        Parameters are as for `csv_to_html`.
+    """
     
-    html += get_preamble()
+    yield get_preamble()
     
-    if not text.strip():
-        html += get_empty()
+    if not text or text.isspace():
+        yield get_empty()
     
     else:
-        keys, groups = _read_csv(text)
+        if cache is not None:
+            cache.check_settings(time_base, currency)
         
-        for idx, key in enumerate(keys):
+        for key, lines in _group_lines(text):
             
-            total_pay = sum(groups[idx][n][1] for n in range(len(groups[idx])))
-            total_pay = '{}{:.2f}'.format(currency, total_pay)
+            if cache is None:
+                yield from _iter_month(key, lines, time_base, currency)
+                continue
             
-            if time_base == 'hours': # added an 's' by this point
-                hrs = 0
-                mns = 0
-                for n in range(len(groups[idx])):
-                    dur = groups[idx][n][4]
-                    d = [int(t) for t in dur.split(':')]
-                    hrs += d[0] 
-                    mns += d[1]
-                    
-                hrs += mns // 60
-                mns %= 60
+            month_html = cache.get(key, lines)
                 
-                total_time = '{}:{:02d}'.format(hrs, mns)
+            if month_html is None:
+                month_html = ''.join(_iter_month(key, lines, time_base, 
+                                                 currency))
                 
-            else:
-                total_time = 0
-                for n in range(len(groups[idx])):
-                    dur = groups[idx][n][4]
-                    total_time += float(dur)
-                total_time = str(total_time)
-            
-            month = key
+            cache.store(key, lines, month_html)
+                
+            yield month_html
             
-            data = [g[3:] for g in groups[idx]]
+        if cache is not None:
+            cache.prune()
+                
+    yield get_close()
+
+
+def _iter_month(month, lines, time_base, currency):
+    """ Yield header and table html for one month of csv lines. """
+    
+    columns = aggregate.load_columns(lines, time_base)
+    total, = aggregate.totals(*columns, time_base)
+    
+    total_pay = money.format_money(total.pay, currency)
+    total_time = aggregate.format_time(total.time, time_base)
+    
+    data = (_display_line(line) for line in lines)
+    
+    yield get_header(month, total_pay, total_time, time_base + 's')
+    yield from iter_table(data, currency=currency)
+
+
+def store_to_html(store, currency='£', cache=None, policy=None):
+    """ Write html string for the entries in an EntryStore.
+    
+        Parameters
+        ----------
+        store : EntryStore
+            timesheet entries. If the store has no header, the message for 
+            an empty timesheet is shown.
+        currency : str
+            currency symbol to display. Default is '£'.
+        cache : RenderCache, optional
+            if given, months which have not changed since the last call
+            are taken from the cache rather than being rendered again
+        policy : money.Policy, optional
+            how the monthly pay is rounded. Default is 
+            `money.default_policy`.
+    """
+    return ''.join(iter_store_html(store, currency, cache, policy))
+
+
+def write_store_html(fileobj, store, currency='£', cache=None, policy=None):
+    """ Write html for an EntryStore to an open file object, one fragment at
+        a time. 
+        
+        Parameters are as for `store_to_html`.
+    """
+    fileobj.writelines(iter_store_html(store, currency, cache, policy))
+
+
+def iter_store_html(store, currency='£', cache=None, policy=None):
+    """ Generator yielding the html for an EntryStore in fragments.
+        
+        Parameters are as for `store_to_html`.
+    """
+    
+    yield get_preamble()
+    
+    if store.header is None:
+        yield get_empty()
+    
+    else:
+        if cache is not None:
+            cache.check_settings(store.time_base, currency, policy)
+        
+        yield from iter_store_months(store, currency, cache, policy=policy)
             
-            html += get_header(month, total_pay, total_time, time_base)
-            html += get_table(data, currency=currency)
+        if cache is not None:
+            cache.prune()
                 
-    html += get_close()
+    yield get_close()
+    
+    
+def iter_store_months(store, currency='£', cache=None, start=0, stop=None,
+                      policy=None):
+    """ Generator yielding the header and table html for each month of an 
+        EntryStore, most recent first.
+        
+        Parameters
+        ----------
+        store : EntryStore
+            timesheet entries
+        currency : str
+            currency symbol to display. Default is '£'.
+        cache : RenderCache, optional
+            if given, months which have not changed since they were last 
+            rendered are taken from the cache
+        start, stop : int, optional
+            if given, only months `start` to `stop` are rendered, counting 
+            from the most recent, as in a slice
+        policy : money.Policy, optional
+            how the monthly pay is rounded. Default is 
+            `money.default_policy`.
+    """
+    
+    months = itertools.islice(store.iter_months(), start, stop)
+    
+    for code, first, last in months:
+        
+        key = month_name(code)
+        
+        if cache is None:
+            yield ''.join(_iter_store_month(key, store, first, last, 
+                                            currency, policy))
+            continue
+        
+        version = store.month_versions[code]
+        month_html = cache.get(key, version)
+            
+        if month_html is None:
+            month_html = ''.join(_iter_store_month(key, store, first, last, 
+                                                   currency, policy))
+            
+        cache.store(key, version, month_html)
+            
+        yield month_html
+    
+
+def _iter_store_month(month, store, start, stop, currency, policy):
+    """ Yield header and table html for entries `start` to `stop`. """
+    
+    total, = aggregate.store_totals(store, 'month', start, stop, policy)
+    
+    total_pay = money.format_money(total.pay, currency)
+    total_time = aggregate.format_time(total.time, store.time_base)
+    
+    data = (_display_row(store.row(idx)) 
+            for idx in store.display_order(start, stop))
+    
+    yield get_header(month, total_pay, total_time, store.time_base + 's')
+    yield from iter_table(data, currency=currency)
+    
+    
+def _display_line(line):
+    """ Return csv line as a row, with date in DD Mon YY format and rate with
+        two decimal places. 
+    """
+    
+    row = line.strip().split(',')
+    row[3] = '{:.2f}'.format(float(row[3]))
+    
+    return _display_row(row)
+    
+
+def _display_row(row):
+    """ Return csv row with date in DD Mon YY format. """
     
-    return html
+    year, month, day = row[0].split('-')
+    row[0] = ' '.join([day, calendar.month_abbr[int(month)], year[-2:]])
+    
+    return row
+
+
+class RenderCache:
+    
+    def __init__(self):
+        """ Rendered html for each month of a timesheet.
+        
+            Each month is stored with a signature of what it was rendered 
+            from (the csv lines for `csv_to_html` or the month version for 
+            `store_to_html`), so only months whose signature has changed need
+            to be parsed and rendered again. Months which are no longer in
+            the timesheet are dropped by `prune()`.
+        """
+        # months are stored and pruned by a render in a worker thread, while
+        # the GUI thread measures the memory used, so the size is kept as
+        # they are changed, rather than summed over `months`
+        self._lock = threading.Lock()
+        self.clear()
+        
+    def clear(self):
+        with self._lock:
+            self.settings = None
+            self.months = {}
+            self.seen = set()
+            self._nbytes = 0
+        
+    def check_settings(self, time_base, currency, policy=None):
+        """ Empty the cache if the time base, currency or money policy have 
+            changed. `policy` defaults to `money.default_policy`.
+        """
+        if policy is None:
+            policy = money.default_policy
+        settings = (time_base, currency, policy)
+        if self.settings != settings:
+            self.clear()
+            self.settings = settings
+        
+    def get(self, key, signature):
+        """ Return cached html for month `key`, or None if `signature` 
+            differs from the one it was rendered from.
+        """
+        self.seen.add(key)
+        try:
+            cached_signature, html = self.months[key]
+        except KeyError:
+            return None
+        if cached_signature != signature:
+            return None
+        return html
+    
+    def store(self, key, signature, html):
+        with self._lock:
+            old = self.months.get(key)
+            if old is not None:
+                self._nbytes -= len(old[1])
+            self.months[key] = (signature, html)
+            self._nbytes += len(html)
+        
+    def nbytes(self):
+        """ Return approximate number of bytes of memory used by the html. 
+        
+            This can be called while another thread is rendering.
+        """
+        return self._nbytes
+        
+    def prune(self, keys=None):
+        """ Remove months that were not requested since the last prune or, 
+            if `keys` is given, months that are not in `keys`.
+        """
+        if keys is None:
+            keys = self.seen
+        with self._lock:
+            for key in set(self.months) - set(keys):
+                self._nbytes -= len(self.months.pop(key)[1])
+            self.seen = set()
 
 
 def head_tail(text):
     """ Return list of column headers and list of rows of data. """
     
-    # split into individual lines
-    lines = text.split('\n')
+    # NB in the generic case, a different function should be supplied to
+    # select the data lines
+    return get_names(text), list(iter_lines(text))
+
+
+def get_names(text):
+    """ Return list of column names. 
     
-    # first non-empty line is taken to contain names
-    match = None
-    n = 0
-    while True:
-        match = re.match('\w', lines[n])
-        if match is not None:
-            break
-        else:
-            n += 1
-            
-    # split line containing column names into names
-    names = lines[n].split(',')
+        The first non-empty line is taken to contain the names.
+    """
     
-    # remove empty lines
-    # NB in the generic case, a different function should be supplied
-    # _filter_csv returns True for lines which begin with a number
-    lines = list(filter(_filter_csv, lines))
+    match = re.search(r'^\w.*', text, re.M)
     
-    return names, lines
+    return match.group().split(',')
+
+
+def iter_lines(text):
+    """ Generator yielding the lines of csv text which contain data, i.e. 
+        lines which begin with a number.
+    """
+    
+    for match in re.finditer(r'^\d.*', text, re.M):
+        yield match.group()
     
     
 def get_unique(text, which, case=True):
@@ -103,7 +345,7 @@ def get_unique(text, which, case=True):
         list of unique strings
     """
     
-    names, lines = head_tail(text)
+    names = get_names(text)
     
     # if column name was given...
     if isinstance(which, str):
@@ -126,11 +368,8 @@ def get_unique(text, which, case=True):
         raise TypeError("'which' must be string or int")
         sys.exit(1)
     
-    # get all values from column
-    all_values = [line.split(',')[idx] for line in lines]
-    
-    # reduce to unique values
-    unique = list(set(all_values))
+    # get unique values from column
+    unique = list({line.split(',')[idx] for line in iter_lines(text)})
     
     return unique
     
@@ -140,7 +379,8 @@ def _parse_line(line):
     
     date, dur, act, rate = re.split(',', line.strip())
     
-    # date is in YYYY-MM-DD order, want DD Month YY, where Month is abbreviation
+    # date is in YYYY-MM-DD order, want DD Month YY, where Month is
+    # abbreviation
     date_list = re.split('-', date)
     date_list.reverse()
     
@@ -155,56 +395,60 @@ def _parse_line(line):
     date_list[2] = date_list[2][-2:]  # remove century from year
     date = ' '.join(date_list)
     
-    # work out pay for this entry
-    r = float(rate)
+    # work out pay for this entry, in cents
+    cents = money.rate_to_cents(rate)
     # try formating duration as hours...
     try:
         d = [int(t) for t in dur.split(':')]
         dur_dec = d[0] + d[1]/60 # duration in decimal
+        pay = money.default_policy.entry_pay(d[0]*60 + d[1], cents, 'hour')
     # otherwise, duration is in days
     except:
         dur_dec = float(dur)
-    pay = r * dur_dec
+        pay = money.default_policy.entry_pay(parse_duration(dur, 'day'), 
+                                             cents, 'day')
     
     # two decimal places in rate
-    rate = '{:.2f}'.format(r)
+    rate = money.cents_to_str(cents)
     
     return [month, pay, dur_dec, date, dur, act, rate]
 
         
 def _read_csv(text):
-
-    _, lines = head_tail(text)
-    
-    lines.sort(reverse=True)
     
-    # reformat date and get Month Year and pay
-    for idx, line in enumerate(lines):
-        lines[idx] = _parse_line(line)
-        
-    # group by month
+    # group by month, reformatting date and getting Month Year and pay
     groups = []
     keys = []
     
-    for k, g in itertools.groupby(lines, lambda l : l[0]):
-        groups.append(list(g))
+    for k, lines in _group_lines(text):
+        groups.append([_parse_line(line) for line in lines])
         keys.append(k)
-        
-    # put in reverse order
-#    keys.reverse(), groups.reverse()
     
     return keys, groups
 
+
+def _group_lines(text):
+    """ Generator yielding (Month Year, lines) pairs, most recent first. 
+    
+        The lines are left unparsed, so that a RenderCache can compare them 
+        with the lines it last rendered.
+    """
+    
+    lines = sorted(iter_lines(text), reverse=True)
+    
+    # date is in YYYY-MM-DD order, so the first seven characters give the
+    # month
+    for _, g in itertools.groupby(lines, lambda l : l[:7]):
+        g = tuple(g)
+        yield _month_key(g[0]), g
+
+
+def _month_key(line):
+    """ Return 'Month Year' string for csv line, as in `_parse_line`. """
+    year, month, _ = line.split(',', 1)[0].split('-')
+    return calendar.month_name[int(month)] + ' ' + year
+
     
-def _filter_csv(lst):
-    """ Return True of element in list begins with string of numbers."""
-    for l in lst:
-        if re.match('\d+', l):
-            return True
-        else:
-            return False
-        
-        
 def get_preamble():
     
     preamble = '''
@@ -252,7 +496,13 @@ def get_header(monthyear, total_pay, total_time, time_base):
 
 def get_table(data, currency):
     
-    table_head = '''
+    return ''.join(iter_table(data, currency))
+
+
+def iter_table(data, currency):
+    """ Generator yielding html table for `data`, one row at a time. """
+    
+    yield '''
 <table>
     <tr>
         <th>Date</th>
@@ -261,9 +511,8 @@ def get_table(data, currency):
         <th>Rate ({})</th>
     </tr>'''.format(currency)
     
-    table_body = ''
     for row in data:
-        table_body += '''
+        yield '''
         <tr>
             <td>{}</td>
             <td>{}</td>
@@ -271,11 +520,7 @@ def get_table(data, currency):
             <td>{}</td>
         </tr>'''.format(*row)
     
-    table_end = '''</table>'''
-    
-    table = table_head + table_body + table_end
-
-    return table
+    yield '''</table>'''
 
 
 def get_empty():
@@ -2,39 +2,38 @@
 Read config file and return dictionary
 """
 
+from contextlib import contextmanager
 import os
 import re
+import shutil
+import tempfile
 
 class ConfigParser:
     
+    # lines which hold a key=value pair
+    _line = re.compile(r'\w+ *= *\S+')
+    
+    # compiled patterns for the lines of each key, shared by all parsers
+    _patterns = {}
+    
     def __init__(self, filename):
         self.setFilename(filename)
+        # updates waiting to be written at the end of a batch
+        self._pending = None
         
     def setFilename(self, filename):
         self.filename = filename
+        # the data is read again from the new file when it is next needed
+        self._mtime = None
 
     def read_conf(self):
-        """ Get dictionary of key:value pairs from conf file. """
-        
-        # read text from file
-        try:
-            with open(self.filename) as fileobj:
-                self.text = fileobj.read()
-        except FileNotFoundError:
-            raise FileNotFoundError
-            
-        # split text into non-empty, non-commented lines
-        self._get_lines()
-
-        
-        confdata = {}
+        """ Get dictionary of key:value pairs from conf file. 
         
-        for line in self.lines:
-            if re.match('\w+ *= *\S+', line):
-                field, data = line.split('=')
-                confdata[field] = data
-    
-        return confdata
+            The file is only read again if its modification time (or size)
+            has changed since it was last read or written.
+        """
+        self._load()
+        return dict(self._data)
     
     
     def update_conf(self, key, value):
@@ -42,29 +41,122 @@ class ConfigParser:
             write to file. 
             
             If `key` does not currently exist in the file, add it.
+            
+            Inside a `batch`, the file is written once at the end of the 
+            batch.
+        """
+        if self._pending is not None:
+            self._pending[key] = value
+        else:
+            self._commit({key:value})
+            
+    @contextmanager
+    def batch(self):
+        """ Context manager which collects the updates made with `update_conf`
+            and writes them to the file together, when the block ends.
+            
+            If the block raises an exception, the updates are discarded.
+            
+            Example
+            -------
+            >>> with cfg.batch():
+            ...     cfg.update_conf('rate', '10')
+            ...     cfg.update_conf('currency', '$')
         """
+        if self._pending is not None:
+            # already in a batch; the outer batch writes the file
+            yield
+            return
         
-        # replace key=old_value with key=value
-        pattern = key + ' *= *.+'
-        repl = key + '=' + value
+        self._pending = {}
+        try:
+            yield
+            pending = self._pending
+        finally:
+            self._pending = None
+        if pending:
+            self._commit(pending)
         
-        # if 'key' already exists in the text, replace old with new
-        if re.search(pattern, self.text):
-            self.text = re.sub(pattern, repl, self.text)
-        # otherwise, insert new key
-        else:
-            self.text += repl + '\n'
         
-        # get updated lines
-        self._get_lines()
+    def _commit(self, updates):
+        # apply dict of `updates` to the text and write the file
+        self._load()
+        
+        for key, value in updates.items():
+            repl = key + '=' + value
+            # if 'key' already exists in the text, replace old with new
+            self.text, n = self._pattern(key).subn(lambda m: repl, self.text)
+            # otherwise, insert new key
+            if n == 0:
+                if self.text and not self.text.endswith('\n'):
+                    self.text += '\n'
+                self.text += repl + '\n'
+        
         # write updated file
         self._write_conf()
+        self._parse()
+        
+        
+    @classmethod
+    def _pattern(cls, key):
+        # compiled pattern matching the line(s) for `key`
+        try:
+            return cls._patterns[key]
+        except KeyError:
+            pattern = re.compile('^' + re.escape(key) + ' *= *.*$', re.M)
+            cls._patterns[key] = pattern
+            return pattern
+        
+        
+    def _load(self):
+        # read the file if it has changed since it was last read or written
+        mtime = self._stat()
+        if mtime != self._mtime:
+            with open(self.filename) as fileobj:
+                self.text = fileobj.read()
+            self._parse()
+            self._mtime = mtime
+            
+            
+    def _parse(self):
+        # make dict of data from the text
+        # split text into non-empty, non-commented lines
+        self._get_lines()
+        
+        self._data = {}
+        
+        for line in self.lines:
+            if self._line.match(line):
+                field, data = line.split('=')
+                self._data[field] = data
         
         
     def _write_conf(self):
-        """ Write config file with data currently held. """
-        with open(self.filename, 'w') as fileobj:
-            fileobj.write(self.text)
+        """ Write config file with data currently held. 
+        
+            The text is written to a temporary file, which then replaces the
+            config file, so the file is never left half-written.
+        """
+        path, name = os.path.split(self.filename)
+        fd, tmp = tempfile.mkstemp(prefix=name, dir=path or None)
+        try:
+            with os.fdopen(fd, 'w') as fileobj:
+                fileobj.write(self.text)
+            # mkstemp makes the file readable only by its owner
+            try:
+                shutil.copymode(self.filename, tmp)
+            except FileNotFoundError:
+                os.chmod(tmp, 0o644)
+            os.replace(tmp, self.filename)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._mtime = self._stat()
+        
+    def _stat(self):
+        # modification time and size of the file
+        stat = os.stat(self.filename)
+        return stat.st_mtime_ns, stat.st_size
         
         
     def _get_lines(self):
@@ -73,7 +165,7 @@ class ConfigParser:
     
     def _filter_lines(self, s):
         # return True if line is not empty or not a comment
-        if re.match('#', s) or not s.strip():
+        if s.startswith('#') or not s.strip():
             return False
         else:
             return True
@@ -82,9 +174,9 @@ class ConfigParser:
     def make_conf(self):
         
         self.text = 'last=None\n'
-
-        with open(self.filename, 'w') as fileobj:
-            fileobj.write(self.text)
+        
+        self._write_conf()
+        self._parse()
                 
             
 if __name__ == '__main__':
@@ -0,0 +1,227 @@
+"""
+Index of the timesheets in ~/.timesheetproject.
+
+Supplies Registry, which records the name, number of entries, date range,
+total pay and modification time of every timesheet in a single index file, so
+that they can be listed without reading each one.
+
+Timesheets are read in background threads as well as the GUI thread, so every
+Registry shares a lock, and the index file is replaced rather than rewritten,
+so it is never seen half-written.
+"""
+
+from collections import namedtuple
+import json
+import os
+import tempfile
+import threading
+
+from money import Policy
+from readconfig import ConfigParser
+from storage import open_backend
+from summary import read_summary
+from paths import datapath
+
+# `first` and `last` are the dates of the first and last entries (None if
+# there are no entries), `pay` is in cents and `modified` is the latest
+# modification time of the timesheet's files
+Record = namedtuple('Record', ['name', 'rows', 'first', 'last', 'pay',
+                               'currency', 'time_base', 'modified'])
+
+
+class Registry:
+
+    version = 2
+
+    # held while the records are read or changed, by every Registry
+    _lock = threading.RLock()
+
+    def __init__(self, path=datapath):
+        """ Index of the timesheets in directory `path`, kept in
+            `path`/.registry/registry.json.
+
+            The index is read when it is first needed, and read again if
+            the file has been changed by another process. The list of
+            timesheets is checked against the directories in `path` only when
+            the modification time of `path` changes, i.e. when a directory
+            has been added or removed.
+        """
+        self.path = path
+        # the file is kept in a directory of its own, as replacing it 
+        # changes the modification time of the directory it is in
+        self.filename = os.path.join(path, '.registry', 'registry.json')
+        self.records = {}
+        # modification times of the index file and the directory when the
+        # records were read or written
+        self._file_mtime = None
+        self._dir_mtime = None
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._load()
+
+    def get(self, name):
+        """ Return Record for timesheet `name`, or None if there isn't one. """
+        with self._lock:
+            return self._load().get(name)
+
+    def list(self):
+        """ Return list of Records for every timesheet, sorted by name. """
+        with self._lock:
+            records = self._load()
+
+            mtime = _mtime(self.path)
+            if mtime != self._dir_mtime:
+                self._sync(mtime)
+
+            return [records[name] for name in sorted(records)]
+
+    def update(self, name, summary, currency, policy=None, store=None):
+        """ Record timesheet `name` from its summary.Summary. 
+        
+            If the timesheet's money.Policy `policy` rounds the pay for each
+            entry, the pay is summed from its EntryStore `store`, which is 
+            read if it isn't given.
+        """
+        with self._lock:
+            self._load()
+            self.records[name] = self._record(name, summary, currency, 
+                                              policy, store)
+            self._save()
+
+    def validate(self, name, summary, currency, policy=None, store=None):
+        """ Update the record for timesheet `name`, as `update`, if the 
+            timesheet's files have changed since it was recorded.
+        """
+        with self._lock:
+            record = self.get(name)
+            if record is None or record.modified != self._modified(name):
+                self.update(name, summary, currency, policy, store)
+
+    def rename(self, old, new):
+        """ Record that timesheet `old` is now called `new`. """
+        with self._lock:
+            records = self._load()
+            record = records.pop(old, None)
+            if record is not None:
+                records[new] = record._replace(name=new,
+                                               modified=self._modified(new))
+            self._save()
+
+    def remove(self, names):
+        """ Remove the records of the given timesheets. """
+        with self._lock:
+            records = self._load()
+            for name in names:
+                records.pop(name, None)
+            self._save()
+
+    def scan(self, name):
+        """ Read timesheet `name` and update its record. """
+        with self._lock:
+            self._load()
+            self.records[name] = self._scan(name)
+            self._save()
+
+    def _scan(self, name):
+        # make Record from the summary of timesheet `name`, which is only
+        # made from the entries if it is out of date
+        csvfile, conffile = self._files(name)
+        conf_data = ConfigParser(conffile).read_conf()
+        summary = read_summary(csvfile, conf_data.get('timebase', 'hour'))
+        return self._record(name, summary, conf_data.get('currency', '£'),
+                            Policy.from_conf(conf_data))
+
+    def _record(self, name, summary, currency, policy=None, store=None):
+        # make Record from summary.Summary, in O(months) unless the pay for
+        # each entry is rounded
+        if summary.months:
+            first, last = str(summary.first), str(summary.last)
+        else:
+            first = last = None
+        if summary.can_total('month', policy):
+            pay = summary.pay(policy)
+        else:
+            if store is None:
+                csvfile, _ = self._files(name)
+                store = open_backend(csvfile).load(summary.time_base)
+            pay = policy.total_pay(store.durations, store.rates, 
+                                   summary.time_base)
+        return Record(name, summary.rows, first, last, pay, currency, 
+                      summary.time_base, self._modified(name))
+
+    def _sync(self, mtime):
+        # add timesheets which have appeared since the index was written and
+        # remove those which have disappeared
+        # scandir can usually tell directories from files without a stat
+        with os.scandir(self.path) as entries:
+            # hidden directories, like .trash, are not timesheets
+            names = {entry.name for entry in entries 
+                     if entry.is_dir() and not entry.name.startswith('.')}
+        for name in set(self.records) - names:
+            del self.records[name]
+        for name in names - set(self.records):
+            try:
+                self.records[name] = self._scan(name)
+            except (OSError, KeyError, ValueError):
+                # not a readable timesheet
+                pass
+        self._dir_mtime = mtime
+        self._save()
+
+    def _files(self, name):
+        base = os.path.join(self.path, name, 'ts_' + name.lower())
+        return base + '.csv', base + '.conf'
+
+    def _modified(self, name):
+        # latest modification time of the files of timesheet `name`
+        csvfile, conffile = self._files(name)
+        files = [conffile] + open_backend(csvfile).files()
+        return max(_mtime(file) or 0 for file in files)
+
+    def _load(self):
+        # read the index file if it has changed since it was last read
+        mtime = _mtime(self.filename)
+        if mtime is not None and mtime != self._file_mtime:
+            try:
+                with open(self.filename) as fileobj:
+                    index = json.load(fileobj)
+            except ValueError:
+                # damaged index: start again from the directories
+                index = {}
+            if index.get('version') == self.version:
+                self.records = {name: Record(**record) for name, record
+                                in index['timesheets'].items()}
+                self._dir_mtime = index['directory_mtime']
+            else:
+                self.records = {}
+                self._dir_mtime = None
+            self._file_mtime = mtime
+        return self.records
+
+    def _save(self):
+        # write the file to a temporary file, which then replaces it, so the
+        # file is never left half-written
+        index = {'version': self.version,
+                 'directory_mtime': self._dir_mtime,
+                 'timesheets': {name: record._asdict() for name, record
+                                in self.records.items()}}
+        path = os.path.dirname(self.filename)
+        os.makedirs(path, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path)
+        try:
+            with os.fdopen(fd, 'w') as fileobj:
+                json.dump(index, fileobj, indent=1)
+            os.replace(tmp, self.filename)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._file_mtime = _mtime(self.filename)
+
+
+def _mtime(path):
+    # modification time of `path`, or None if it doesn't exist
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,117 @@
+"""
+Render the timesheet html in a background thread.
+
+Supplies RenderWorker, a QRunnable for a QThreadPool, and RenderSignals, 
+through which it returns the html. The html is rendered a few months at a 
+time; `append_html` adds later months to the displayed document.
+"""
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+from PyQt5.QtGui import QTextCursor, QTextDocument, QTextDocumentFragment
+
+from entrystore import month_name
+from processcsv import (iter_store_months, get_preamble, get_close, 
+                        get_empty)
+
+
+class RenderSignals(QObject):
+    # render number, index of first month, html and whether there are 
+    # more months to render
+    finished = pyqtSignal(int, int, str, bool)
+    
+
+class RenderWorker(QRunnable):
+    
+    def __init__(self, number, store, currency, cache, signals, start=0, 
+                 stop=None, policy=None):
+        """ Render html for some of the months in an EntryStore and emit it
+            with `signals.finished`.
+        
+            Parameters
+            ----------
+            number : int
+                number identifying this render, emitted with the html so that
+                results from superseded renders can be ignored
+            store : EntryStore
+                entries to render. This should be a snapshot, which will not
+                be changed while rendering.
+            currency : str
+                currency symbol
+            cache : RenderCache
+                cache of rendered months. Only one worker should use a cache
+                at a time.
+            signals : RenderSignals
+                object with the `finished` signal
+            start, stop : int, optional
+                months to render, counting from the most recent, as in a 
+                slice. If `start` is 0, the cache is also pruned of months 
+                which are no longer in the store.
+            policy : money.Policy, optional
+                how the monthly pay is rounded
+        """
+        super().__init__()
+        self.number = number
+        self.store = store
+        self.currency = currency
+        self.cache = cache
+        self.signals = signals
+        self.start = start
+        self.stop = stop
+        self.policy = policy
+        self.cancelled = False
+        
+    def cancel(self):
+        """ Stop rendering as soon as possible, without emitting the html. """
+        self.cancelled = True
+        
+    def run(self):
+        
+        fragments = [get_preamble()]
+        more = False
+        
+        if self.store.header is None:
+            fragments.append(get_empty())
+            
+        else:
+            self.cache.check_settings(self.store.time_base, self.currency,
+                                      self.policy)
+            
+            if self.start == 0:
+                self.cache.prune([month_name(code) for code, _, _ 
+                                  in self.store.iter_months()])
+            
+            # ask for one extra month, to find out if there are any more
+            stop = None if self.stop is None else self.stop + 1
+            months = iter_store_months(self.store, self.currency, self.cache,
+                                       self.start, stop, self.policy)
+            for n, month_html in enumerate(months, start=self.start):
+                if self.cancelled:
+                    return
+                if n == self.stop:
+                    more = True
+                    break
+                fragments.append(month_html)
+                
+        fragments.append(get_close())
+                
+        if not self.cancelled:
+            self.signals.finished.emit(self.number, self.start, 
+                                       ''.join(fragments), more)
+            
+            
+def append_html(document, html):
+    """ Add `html` to the end of a QTextDocument. """
+    
+    new = QTextDocument()
+    new.setHtml(html)
+    
+    cursor = QTextCursor(document)
+    cursor.movePosition(QTextCursor.End)
+    position = cursor.position()
+    
+    cursor.insertFragment(QTextDocumentFragment(new))
+    
+    # the first inserted block is merged into the last block of the 
+    # document, which loses its format (e.g. a heading becomes a paragraph)
+    cursor.setPosition(position)
+    cursor.setBlockFormat(new.firstBlock().blockFormat())
@@ -0,0 +1,233 @@
+"""
+Supplies PayrollDialog, which shows the total time and pay of every timesheet
+for one period, filling in each timesheet as it is totalled.
+"""
+
+import datetime
+
+from PyQt5.QtCore import (QAbstractTableModel, QDate, QModelIndex,
+                          QSortFilterProxyModel, QThreadPool, Qt)
+from PyQt5.QtWidgets import (QAbstractItemView, QComboBox, QDateEdit,
+                             QDialog, QDialogButtonBox, QHBoxLayout, QLabel,
+                             QProgressBar, QPushButton, QTableView,
+                             QVBoxLayout)
+from aggregate import format_time, period_range, periods
+from money import format_money
+from payroll import grand_totals
+from payrollworker import PayrollSignals, PayrollWorker
+from paths import datapath
+
+
+class PayrollModel(QAbstractTableModel):
+
+    columns = ('Name', 'Entries', 'Time', 'Pay')
+
+    def __init__(self, parent=None):
+        """ Table of payroll.Line, which grows as lines are added.
+
+            As in RegistryModel, the display text of each cell is given for
+            Qt.DisplayRole and a value to sort by for Qt.UserRole.
+        """
+        super().__init__(parent)
+        self.lines = []
+
+    def add_lines(self, lines):
+        """ Append list of payroll.Line. """
+        if lines:
+            first = len(self.lines)
+            self.beginInsertRows(QModelIndex(), first, first+len(lines)-1)
+            self.lines.extend(lines)
+            self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.lines = []
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        line = self.lines[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return line.name
+            elif line.error is not None:
+                # say why the timesheet is missing, in the 'Entries' column
+                return line.error if column == 1 else ''
+            elif column == 1:
+                return str(line.count)
+            elif column == 2:
+                return format_time(line.time, line.time_base)
+            else:
+                return format_money(line.pay, line.currency)
+
+        elif role == Qt.UserRole:
+            return (line.name.lower(), line.count, line.time, line.pay)[column]
+
+        elif role == Qt.TextAlignmentRole and column > 0:
+            return Qt.AlignRight | Qt.AlignVCenter
+
+        return None
+
+
+class PayrollDialog(QDialog):
+
+    def __init__(self, path=datapath):
+        """ Dialog to make the payroll report for the timesheets in `path`.
+        """
+        super().__init__()
+
+        self.path = path
+        self.worker = None
+        # number of the latest report; signals from earlier ones are ignored
+        self.reportNumber = 0
+
+        # one report at a time, read by a pool of processes
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.signals = PayrollSignals(self)
+        self.signals.started.connect(self.report_started)
+        self.signals.lines.connect(self.add_lines)
+        self.signals.finished.connect(self.report_finished)
+        self.signals.error.connect(self.report_error)
+
+        self.initUI()
+
+    def initUI(self):
+
+        self.periodBox = QComboBox(self)
+        self.periodBox.addItems(periods)
+
+        self.dateEdit = QDateEdit(QDate.currentDate(), self,
+                                  calendarPopup=True)
+        self.dateEdit.setDisplayFormat('d MMM yyyy')
+
+        self.runButton = QPushButton('Run', self)
+        self.runButton.clicked.connect(self.run)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel('Period'))
+        controls.addWidget(self.periodBox)
+        controls.addWidget(QLabel('including'))
+        controls.addWidget(self.dateEdit)
+        controls.addStretch()
+        controls.addWidget(self.runButton)
+
+        self.model = PayrollModel(self)
+
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(Qt.UserRole)
+
+        self.payrollTable = QTableView(self)
+        self.payrollTable.setModel(self.proxy)
+        self.payrollTable.setSortingEnabled(True)
+        self.payrollTable.sortByColumn(0, Qt.AscendingOrder)
+        self.payrollTable.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.payrollTable.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.payrollTable.verticalHeader().hide()
+        self.payrollTable.horizontalHeader().setStretchLastSection(True)
+
+        self.progress = QProgressBar(self)
+        self.progress.hide()
+
+        # grand totals
+        self.totalLabel = QLabel(self)
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.Close)
+        buttonBox.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.payrollTable)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.totalLabel)
+        layout.addWidget(buttonBox)
+
+        self.setLayout(layout)
+        self.setWindowTitle('Payroll')
+        self.resize(600, 500)
+
+    def run(self):
+        """ Start making the report for the chosen period. """
+
+        self.cancel()
+
+        date = self.dateEdit.date()
+        date = datetime.date(date.year(), date.month(), date.day())
+        period = self.periodBox.currentText()
+
+        start, stop = period_range(date, period)
+        self.setWindowTitle('Payroll from {:%d %b %Y} to {:%d %b %Y}'.format(
+            start, stop - datetime.timedelta(days=1)))
+
+        self.model.clear()
+        self.totalLabel.clear()
+        self.runButton.setEnabled(False)
+
+        self.reportNumber += 1
+        self.worker = PayrollWorker(self.reportNumber, date, period, 
+                                    self.path, self.signals)
+        self.pool.start(self.worker)
+
+    def cancel(self):
+        """ Stop the report being made, if there is one. """
+        if self.worker is not None:
+            self.worker.cancel()
+            self.pool.waitForDone()
+            self.worker = None
+
+    def report_started(self, number, total):
+        if number != self.reportNumber:
+            return
+        self.progress.setRange(0, total)
+        self.progress.setValue(0)
+        self.progress.show()
+
+    def add_lines(self, number, lines):
+        # lines arrive in the order the timesheets are finished; the proxy
+        # keeps the table sorted
+        if number != self.reportNumber:
+            return
+        self.model.add_lines(lines)
+        self.progress.setValue(len(self.model.lines))
+        self.show_totals()
+
+    def show_totals(self):
+        totals = grand_totals(self.model.lines)
+        text = ['Total: {} employees, {} entries, {}, {}'.format(
+                    total.employees, total.count,
+                    format_time(total.time, total.time_base),
+                    format_money(total.pay, total.currency))
+                for total in totals]
+        self.totalLabel.setText('\n'.join(text))
+
+    def report_finished(self, number, cancelled):
+        if number != self.reportNumber:
+            return
+        self.progress.hide()
+        self.runButton.setEnabled(True)
+
+    def report_error(self, number, message):
+        if number != self.reportNumber:
+            return
+        self.totalLabel.setText(message)
+
+    def done(self, result):
+        # stop reading timesheets when the dialog is closed
+        self.cancel()
+        super().done(result)
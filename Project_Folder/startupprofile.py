@@ -0,0 +1,36 @@
+"""
+Timing of the stages of starting the GUI, for `timesheet.py --profile-startup`.
+"""
+
+import sys
+import time
+
+
+class StartupProfile:
+
+    def __init__(self, start=None):
+        """ Record the time taken by each stage of startup.
+
+            Parameters
+            ----------
+            start : float, optional
+                time.perf_counter() value when startup began. Default is now.
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.stages = []
+
+    def mark(self, stage, when=None):
+        """ Record that `stage` finished now (or at perf_counter time `when`).
+        """
+        if when is None:
+            when = time.perf_counter()
+        self.stages.append((stage, when))
+
+    def report(self, file=sys.stderr):
+        """ Write the time taken by each stage and the total so far. """
+        file.write('{:<24} {:>9} {:>9}\n'.format('stage', 'ms', 'total'))
+        previous = self.start
+        for stage, when in self.stages:
+            file.write('{:<24} {:9.1f} {:9.1f}\n'.format(
+                stage, (when - previous) * 1000, (when - self.start) * 1000))
+            previous = when
@@ -0,0 +1,297 @@
+"""
+Storage backends for timesheet entries.
+
+Supplies CsvBackend, which keeps the entries in ts_<name>.csv with a journal
+of changes, and SqliteBackend, which keeps them in an indexed ts_<name>.sqlite
+database. Both have the same interface, and `open_backend` returns whichever
+one a timesheet uses.
+
+Run this file with timesheet names as arguments to migrate them from csv to
+sqlite (or with no arguments to migrate all of them).
+"""
+
+import datetime
+import itertools
+import os
+import sqlite3
+import sys
+
+from entrystore import EntryStore
+from journal import Journal
+from paths import datapath
+from summary import Month, Summary
+
+
+def open_backend(csvfile):
+    """ Return the backend for the timesheet whose csv file is `csvfile`.
+
+        If there is a sqlite database alongside the csv file, the timesheet
+        has been migrated and SqliteBackend is returned.
+    """
+    dbfile = SqliteBackend.getDbFile(csvfile)
+    if os.path.exists(dbfile):
+        return SqliteBackend(dbfile)
+    return CsvBackend(csvfile)
+
+
+class CsvBackend:
+
+    # if True, save appends changes to a journal rather than rewriting the
+    # csv file; the journal is folded into the csv file when it has more
+    # than `compact_after` records
+    journaled = True
+    compact_after = 1000
+
+    def __init__(self, csvfile):
+        """ Timesheet entries held in a csv file and journal.
+
+            Parameters
+            ----------
+            csvfile : str
+                path to the csv file
+        """
+        self.journal = Journal(None)
+        self.setFilename(csvfile)
+
+    def setFilename(self, csvfile):
+        self.csvfile = csvfile
+        self.journal.setFilename(self.getJournalFile(csvfile))
+
+    def setCsvFile(self, csvfile):
+        """ Use the files for the timesheet whose csv file is `csvfile`. """
+        self.setFilename(csvfile)
+
+    @staticmethod
+    def getJournalFile(csvfile):
+        return os.path.splitext(csvfile)[0] + '.journal'
+
+    def files(self):
+        """ Return paths of all files belonging to this backend. """
+        return [self.csvfile, self.journal.filename]
+
+    def load(self, time_base):
+        """ Return EntryStore of the saved entries. """
+
+        with open(self.csvfile) as fileobj:
+            store = EntryStore.from_lines(fileobj, time_base)
+
+        # apply any changes saved since the csv file was last written
+        self.journal.replay(store, self.csvfile)
+
+        return store
+
+    def add(self, row):
+        """ Record new entry, given as list of csv strings, to be saved. """
+        self.journal.add(row)
+
+    def remove(self, row):
+        """ Record removed entry, given as list of csv strings. """
+        self.journal.remove(row)
+
+    def save(self, store):
+        """ Save recorded changes, or rewrite the csv file if the journal
+            has grown too long.
+        """
+        if self.journaled and len(self.journal) <= self.compact_after:
+            self.journal.write(self.csvfile)
+        else:
+            self.journal.compact(store, self.csvfile)
+
+    def summary(self, time_base):
+        """ Return summary.Summary of the saved entries. """
+        return Summary.from_store(self.load(time_base))
+
+
+class SqliteBackend:
+
+    schema = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    date INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    activity TEXT NOT NULL,
+    rate INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_date ON entries (date);
+CREATE INDEX IF NOT EXISTS entries_month ON entries (month);
+CREATE INDEX IF NOT EXISTS entries_activity ON entries (activity);
+'''
+
+    def __init__(self, dbfile):
+        """ Timesheet entries held in a sqlite database.
+
+            Dates are stored as ordinals, months as 12*year + month - 1,
+            durations in the units of the EntryStore and rates in cents.
+
+            Parameters
+            ----------
+            dbfile : str
+                path to the database
+        """
+        self.setFilename(dbfile)
+        # changes which have not been saved, as ('+' or '-', row)
+        self.pending = []
+
+    def setFilename(self, dbfile):
+        self.dbfile = dbfile
+
+    def setCsvFile(self, csvfile):
+        """ Use the files for the timesheet whose csv file is `csvfile`. """
+        self.setFilename(self.getDbFile(csvfile))
+
+    @staticmethod
+    def getDbFile(csvfile):
+        return os.path.splitext(csvfile)[0] + '.sqlite'
+
+    def files(self):
+        """ Return paths of all files belonging to this backend. """
+        return [self.dbfile, self.dbfile + '-wal', self.dbfile + '-shm']
+
+    def connect(self):
+        """ Return connection to the database, creating the tables if
+            necessary.
+        """
+        con = sqlite3.connect(self.dbfile)
+        con.execute('PRAGMA journal_mode=WAL')
+        con.executescript(self.schema)
+        return con
+
+    @classmethod
+    def create(cls, dbfile, store):
+        """ Make a new database holding every entry in `store`. """
+
+        backend = cls(dbfile)
+
+        con = backend.connect()
+        with con:
+            con.execute('DELETE FROM entries')
+            meta = [('time_base', store.time_base)]
+            if store.header is not None:
+                meta.append(('header', ','.join(store.header)))
+            else:
+                con.execute("DELETE FROM meta WHERE key='header'")
+            con.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', meta)
+            names = store.activity_names
+            rows = ((date, _month(date), dur, names[act], rate)
+                    for date, dur, act, rate in zip(
+                        store.dates, store.durations, store.activities,
+                        store.rates))
+            con.executemany(backend._insert, rows)
+        con.close()
+
+        return backend
+
+    def load(self, time_base):
+        """ Return EntryStore of the saved entries. """
+
+        con = self.connect()
+        try:
+            header = con.execute("SELECT value FROM meta WHERE key='header'")
+            header = header.fetchone()
+            header = header[0].split(',') if header else None
+            rows = con.execute('SELECT date, duration, activity, rate '
+                               'FROM entries ORDER BY date, id')
+            store = EntryStore.from_values(rows, time_base, header)
+        finally:
+            con.close()
+
+        return store
+
+    def add(self, row):
+        """ Record new entry, given as list of csv strings, to be saved. """
+        self.pending.append(('+', row))
+
+    def remove(self, row):
+        """ Record removed entry, given as list of csv strings. """
+        self.pending.append(('-', row))
+
+    _insert = ('INSERT INTO entries (date, month, duration, activity, rate) '
+               'VALUES (?, ?, ?, ?, ?)')
+
+    _delete = ('DELETE FROM entries WHERE id = (SELECT id FROM entries '
+               'WHERE date=? AND month=? AND duration=? AND activity=? '
+               'AND rate=? LIMIT 1)')
+
+    def save(self, store):
+        """ Save recorded changes in a single transaction. """
+
+        if not self.pending:
+            return
+
+        con = self.connect()
+        with con:
+            # runs of additions or removals are each executed in one go
+            for op, group in itertools.groupby(self.pending, lambda p: p[0]):
+                sql = self._insert if op == '+' else self._delete
+                con.executemany(sql, (self._values(store, row)
+                                      for _, row in group))
+        con.close()
+
+        self.pending = []
+
+    def summary(self, time_base):
+        """ Return summary.Summary of the saved entries, with the totals for
+            each month found by sqlite, without reading the entries.
+        """
+
+        con = self.connect()
+        try:
+            rows = con.execute('SELECT month, COUNT(*), SUM(duration), '
+                               'SUM(duration * rate), MIN(date), MAX(date) '
+                               'FROM entries GROUP BY month')
+            summary = Summary(time_base)
+            summary.months = {row[0]: Month(*row[1:]) for row in rows}
+        finally:
+            con.close()
+
+        return summary
+
+    @staticmethod
+    def _values(store, row):
+        # values for a row of the entries table from list of csv strings
+        date, dur, act, rate = store.parse_values(row)
+        return date, _month(date), dur, act, rate
+
+
+def migrate(csvfile, time_base):
+    """ Copy the entries in `csvfile` (and its journal) into a new sqlite
+        database and return the SqliteBackend.
+
+        The csv file is left in place, but is no longer used.
+    """
+    store = CsvBackend(csvfile).load(time_base)
+    dbfile = SqliteBackend.getDbFile(csvfile)
+    return SqliteBackend.create(dbfile, store)
+
+
+def _month(date):
+    # month code of date ordinal
+    date = datetime.date.fromordinal(date)
+    return 12*date.year + date.month - 1
+
+
+if __name__ == '__main__':
+
+    from readconfig import ConfigParser
+
+    names = sys.argv[1:]
+    if not names:
+        names = [name for name in os.listdir(datapath)
+                 if os.path.isdir(os.path.join(datapath, name))
+                 and not name.startswith('.')]
+
+    for name in names:
+        base = os.path.join(datapath, name, 'ts_' + name.lower())
+        csvfile = base + '.csv'
+        if os.path.exists(SqliteBackend.getDbFile(csvfile)):
+            print('{}: already migrated'.format(name))
+            continue
+        conf_data = ConfigParser(base + '.conf').read_conf()
+        time_base = conf_data.get('timebase', 'hour')
+        backend = migrate(csvfile, time_base)
+        print('{}: migrated to {}'.format(name, backend.dbfile))
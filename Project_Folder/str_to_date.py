@@ -1,8 +1,19 @@
 import datetime
 import calendar
+import functools
 import re
 import sys
 
+# dictionary of month names and abbreviations : number
+# cast as lower case, because case isn't important when comparing
+_c_abbr = {v.lower(): k for k,v in enumerate(calendar.month_abbr)}
+_c_full = {v.lower(): k for k,v in enumerate(calendar.month_name)}
+_months = {**_c_abbr, **_c_full}
+# remove {'':0} from dictionary
+del _months['']
+
+_split = re.compile(r'[\s/.-]')
+
 def str_to_date(s):
     """ Convert string to datetime.date object.
     
@@ -14,8 +25,8 @@ def str_to_date(s):
     * If an empty/whitespace string is provided, the current date will be
       returned.
 
-    * 'Year' can be either two or four digits. If two digits, 21st century will 
-      be assumed.
+    * 'Year' can be either two or four digits. If two digits, 21st century
+      will be assumed.
     
     * The string can have no delimiters (i.e. 'DDMMYY' or 'DDMMYYYY') or can 
       use '-', '/', '.' or a space. 
@@ -43,29 +54,52 @@ def str_to_date(s):
     datetime.date(2012, 3, 2)
     """
     
-    # make dictionary of month names and abbreviations : number
-    # cast as lower case, because case isn't important when comparing
-    c_abbr = {v.lower(): k for k,v in enumerate(calendar.month_abbr)}
-    c_full = {v.lower(): k for k,v in enumerate(calendar.month_name)}
-    months = {**c_abbr, **c_full}
-    # remove {'':0} from dictionary
-    del months['']
-    
     # get current date and use as default output
     today = datetime.date.today()
-    d = [today.year, today.month, today.day]
     
     # if input is empty string, return current date
     s = s.strip()
     if not s:
         return today
     
-    try:
-        l = re.split(r'[\s/.-]', s)
-    except TypeError:
-        raise TypeError("Cannot format '{}' as date. Input should be a string."
-                        .format(s))
-        sys.exit(1)
+    return _parse(s, today)
+
+
+def str_to_dates(strings):
+    """ Convert many strings to datetime.date objects, as `str_to_date`.
+    
+        Returns a list of dates, with None for any string which could not be
+        converted, and a dictionary of {index: exception} for those strings.
+    """
+    
+    today = datetime.date.today()
+    
+    dates = []
+    errors = {}
+    
+    for idx, s in enumerate(strings):
+        try:
+            s = s.strip()
+            dates.append(_parse(s, today) if s else today)
+        except (ValueError, IndexError, AttributeError) as err:
+            dates.append(None)
+            errors[idx] = err
+            
+    return dates, errors
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse(s, today):
+    """ Convert stripped, non-empty string to datetime.date, filling in any
+        missing values from `today`.
+        
+        The result depends only on the arguments, so it is cached: timesheets
+        contain the same few dates many times.
+    """
+    
+    d = [today.year, today.month, today.day]
+    
+    l = _split.split(s)
     
     # if a single value was given as input...
     if len(l) == 1:
@@ -90,7 +124,7 @@ def str_to_date(s):
             
             # if month isn't a number, check if it's in the dictionary
             try:
-                d[-(n+1)] = months[l[n].lower()] # string as lower case
+                d[-(n+1)] = _months[l[n].lower()] # string as lower case
             except KeyError:
                 info = 'Please check given month.'
                 raise ValueError('Cannot format "{}" as date. {}'.format(s, 
@@ -0,0 +1,267 @@
+"""
+Monthly summary of a timesheet, kept in a small file beside it.
+
+Supplies Summary, which holds the number of entries, total time, exact pay
+amount and first and last dates of each month of a timesheet, so that the
+totals for months or years, and the registry's record, can be found in
+O(months) without reading the entries.
+
+Data keeps the summary up to date as entries are added, changed and removed,
+and saves it in .cache/summary.json in the timesheet's directory when the
+timesheet is saved. The file is only used while the timesheet's files have
+the modification times and sizes it was saved with.
+"""
+
+from collections import namedtuple
+import bisect
+import datetime
+import json
+import os
+import tempfile
+
+import aggregate
+from format_dur import Duration
+import money
+
+# summary of the entries in one month; `time` is in minutes or thousandths
+# of a day, `amount` is the sum of the durations multiplied by the rates (i.e.
+# pay before it is divided by the units per hour or day and rounded), and
+# `first` and `last` are the ordinals of the first and last dates
+Month = namedtuple('Month', ['count', 'time', 'amount', 'first', 'last'])
+
+
+class Summary:
+
+    version = 2
+
+    def __init__(self, time_base='hour'):
+        """ Summary of each month of a timesheet, empty to begin with.
+
+            Use `from_store` or `load` to make one for a timesheet.
+        """
+        self.time_base = time_base
+        # month code (12*year + month - 1): Month
+        self.months = {}
+        # EntryStore month versions the months were found from
+        self._versions = {}
+
+    @classmethod
+    def from_store(cls, store):
+        """ Return Summary of EntryStore `store`. """
+        summary = cls(store.time_base)
+        summary.sync(store)
+        return summary
+
+    @classmethod
+    def load(cls, filename, files, time_base):
+        """ Return Summary saved in `filename`, or None if it is missing or
+            out of date.
+
+            Parameters
+            ----------
+            filename : str
+                summary file
+            files : list of str
+                files holding the timesheet's entries (see the storage
+                backends' `files` method)
+            time_base : str
+                the timesheet's time base
+        """
+        try:
+            with open(filename) as fileobj:
+                saved = json.load(fileobj)
+            if (saved.get('version') != cls.version or
+                    saved['time_base'] != time_base or
+                    saved['stamp'] != _stamp(files)):
+                return None
+            summary = cls(time_base)
+            summary.months = {code: Month(*values)
+                              for code, *values in saved['months']}
+        except (OSError, KeyError, TypeError, ValueError):
+            return None
+        return summary
+
+    def save(self, filename, files):
+        """ Write the summary to `filename`, with the modification times and
+            sizes of `files`, the timesheet's saved entries.
+        """
+        saved = {'version': self.version,
+                 'time_base': self.time_base,
+                 'stamp': _stamp(files),
+                 'months': [[code, *month] for code, month
+                            in sorted(self.months.items())]}
+        path = os.path.dirname(filename)
+        os.makedirs(path, exist_ok=True)
+        # replace the file, so that it is never half-written
+        fd, tmp = tempfile.mkstemp(dir=path)
+        try:
+            with os.fdopen(fd, 'w') as fileobj:
+                json.dump(saved, fileobj)
+            os.replace(tmp, filename)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def adopt(self, store):
+        """ Record that this summary, which was loaded from a file, is of
+            EntryStore `store`, so that `sync` only finds the months which
+            change after this.
+        """
+        self.time_base = store.time_base
+        self._versions = dict(store.month_versions)
+
+    def sync(self, store):
+        """ Update the months of EntryStore `store` which have changed since
+            the summary was made or last synced.
+        """
+        # durations keep their number of units when the time base changes
+        self.time_base = store.time_base
+        for code, version in store.month_versions.items():
+            if self._versions.get(code) != version:
+                self._versions[code] = version
+                month = _summarise(store, code)
+                if month is None:
+                    self.months.pop(code, None)
+                else:
+                    self.months[code] = month
+        for code in set(self.months) - set(store.month_versions):
+            del self.months[code]
+
+    @property
+    def rows(self):
+        """ Number of entries. """
+        return sum(month.count for month in self.months.values())
+
+    @property
+    def first(self):
+        """ datetime.date of the first entry, or None if there are none. """
+        if not self.months:
+            return None
+        return datetime.date.fromordinal(self.months[min(self.months)].first)
+
+    @property
+    def last(self):
+        """ datetime.date of the last entry, or None if there are none. """
+        if not self.months:
+            return None
+        return datetime.date.fromordinal(self.months[max(self.months)].last)
+
+    @staticmethod
+    def can_total(period='month', policy=None):
+        """ Return True if `totals` can be used for `period` and `policy`.
+
+            Weeks don't fit into months, and if the pay for each entry is
+            rounded, the entries are needed.
+        """
+        if policy is None:
+            policy = money.default_policy
+        return period in ('month', 'year') and not policy.round_entries
+
+    def pay(self, policy=None):
+        """ Return the total pay in cents, as Policy.total_pay. """
+        if not self.can_total('month', policy):
+            raise ValueError('pay for each entry is rounded')
+        if policy is None:
+            policy = money.default_policy
+        amount = sum(month.amount for month in self.months.values())
+        return money.divide(amount, money.units_per(self.time_base),
+                            policy.rounding)
+
+    def totals(self, period='month', start=None, stop=None, policy=None):
+        """ Return list of aggregate.Total for each month or year, most
+            recent first, as aggregate.totals returns them.
+
+            If given, `start` and `stop` are datetime.date objects limiting
+            the months to those from `start` up to, but not including,
+            `stop`; they should be the first days of months.
+        """
+        if not self.can_total(period, policy):
+            raise ValueError("totals for '{}' need the entries".format(period))
+        if policy is None:
+            policy = money.default_policy
+
+        lo = None if start is None else 12*start.year + start.month - 1
+        hi = None if stop is None else 12*stop.year + stop.month - 1
+
+        groups = {}
+        for code in sorted(self.months):
+            if (lo is not None and code < lo) or (hi is not None and
+                                                  code >= hi):
+                continue
+            year, month = divmod(code, 12)
+            key = code if period == 'month' else 12*year
+            try:
+                group = groups[key]
+            except KeyError:
+                group = groups[key] = [0, 0, 0]
+            summary = self.months[code]
+            group[0] += summary.count
+            group[1] += summary.time
+            group[2] += summary.amount
+
+        per = money.units_per(self.time_base)
+        duration = Duration.type_for(self.time_base)
+        totals = []
+        for key in sorted(groups, reverse=True):
+            count, time, amount = groups[key]
+            year, month = divmod(key, 12)
+            totals.append(aggregate.Total(
+                datetime.date(year, month+1, 1), count, duration(time),
+                money.divide(amount, per, policy.rounding)))
+        return totals
+
+
+def summary_file(csvfile):
+    """ Return the summary file of the timesheet whose csv file is `csvfile`.
+    """
+    return os.path.join(os.path.dirname(csvfile), '.cache', 'summary.json')
+
+
+def read_summary(csvfile, time_base):
+    """ Return Summary of the timesheet whose csv file is `csvfile`.
+
+        It is read from the summary file if that is up to date; otherwise it
+        is made from the entries and saved for next time.
+    """
+    # storage imports this module
+    from storage import open_backend
+    
+    backend = open_backend(csvfile)
+    filename = summary_file(csvfile)
+    summary = Summary.load(filename, backend.files(), time_base)
+    if summary is None:
+        summary = backend.summary(time_base)
+        try:
+            summary.save(filename, backend.files())
+        except OSError:
+            # it can be made again next time
+            pass
+    return summary
+
+
+def _summarise(store, code):
+    # Month for month `code` of EntryStore `store`, or None if it is empty
+    year, month = divmod(code, 12)
+    start, stop = aggregate.period_range(datetime.date(year, month+1, 1))
+    first = bisect.bisect_left(store.dates, start.toordinal())
+    last = bisect.bisect_left(store.dates, stop.toordinal(), first)
+    if first == last:
+        return None
+    durations = store.durations[first:last]
+    rates = store.rates[first:last]
+    return Month(last - first, sum(durations),
+                 sum(dur * rate for dur, rate in zip(durations, rates)),
+                 store.dates[first], store.dates[last-1])
+
+
+def _stamp(files):
+    # modification times and sizes of `files`
+    stamp = []
+    for file in files:
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            stamp.append(None)
+        else:
+            stamp.append([stat.st_mtime_ns, stat.st_size])
+    return stamp
@@ -3,156 +3,59 @@
 
 import sys
 import os
+import time
 
+# for --profile-startup, the time when this module started to be imported
+_started = time.perf_counter()
+
+from PyQt5.QtCore import QEvent, QThreadPool, QTimer
 from PyQt5.QtGui import QIcon, QKeySequence
 from PyQt5.QtWidgets import (QAction, QApplication, QDesktopWidget, 
-                             QFileDialog, QMainWindow, QMessageBox, QTextEdit)
+                             QFileDialog, QMainWindow, QMessageBox, 
+                             QProgressBar, QTabBar, QTextEdit, QVBoxLayout,
+                             QWidget)
 
-from editdialogs import (AddLineDialog, EditTimesheetSettingsDialog,
-                         RemoveLineDialog, EditLineDialog)
-from filedialogs import (NewTimesheetDialog, OpenTimesheetDialog, 
-                         DeleteTimesheetDialog)
-#from configdialogs import ConfigDataDialog
-from processcsv import csv_to_html
-from readconfig import ConfigParser
-import re
+_qt_imported = time.perf_counter()
 
-datapath = os.path.join(os.path.expanduser('~'), '.timesheetproject')
-conffile = os.path.join(datapath, 'timesheetproject.conf')
+# the dialog modules are imported when they are first used, so that the 
+# window can be shown sooner
+from processcsv import RenderCache, get_close, get_preamble
+from renderworker import RenderSignals, RenderWorker, append_html
+from deleteworker import DeleteSignals, DeleteWorker
+from loadworker import LoadSignals, LoadWorker, PrefetchWorker
+from workspace import Workspace
+from readconfig import ConfigParser
+from registry import Registry
+from data import Data
+import trash
+from paths import datapath, conffile, check_path
 
-# make sure the .timesheetproject directory and config file exist
-def check_path():
-    if not os.path.exists(datapath):
-        os.mkdir(datapath)
-        with open(conffile, 'w') as fileobj:
-            fileobj.write('last=None\n')
+_imported = time.perf_counter()
 
 
-class Data:
-    # separate class to handle all the data
+class Timesheetproject(QMainWindow):
     
-    def __init__(self, project_name):
-        """ Object that controls the csv (and config) data. """
-        
-        self.modified = False
-        
-        if project_name is None:
-            self.csv_data = ''
-            self.name = 'None'
-            self.rate = ''
-            self.currency = ''
-            self.timebase = ''
-                       
-        else:            
-            self.csvfile, self.conffile = self.getCsvConfFiles(project_name)
-            
-            with open(self.csvfile) as fileobj:
-                self.csv_data = fileobj.read()
-                
-                
-            self.cfg = ConfigParser(self.conffile)
-                
-            conf_data = self.cfg.read_conf()
-            
-            # if conf_data is not empty...
-            self.name = conf_data['name']
-            self.rate = conf_data['rate']
-            # 'currency' and 'timebase' are a new features, so attempting to
-            # read them from the config will fail first time for old versions
-            # In that case, set it to defaults; user can change them, if 
-            # necessary, and add them to the config file
-            try:
-                self.currency = conf_data['currency']
-            except KeyError:
-                self.currency = '£'
-                self.cfg.update_conf('currency', self.currency)
-            try:
-                self.timebase = conf_data['timebase']
-            except KeyError:
-                self.timebase = 'hour'
-                self.cfg.update_conf('timebase', self.timebase)
-                
-                
-    @staticmethod
-    def getCsvConfFiles(project_name):
-        path = os.path.join(datapath, project_name)
-        file = 'ts_' + project_name.lower()
-        exts = ('.csv', '.conf')
-        csvfile, conffile = (os.path.join(path, file+ext) for ext in exts)
-        return csvfile, conffile
-            
-        
-    def add_new(self, new_data):
-        """ Add new line to csv. """
-        self.csv_data += new_data
-        self.modified = True
-        
-    def save(self):
-        # save csv file
-        if self.modified:
-            with open(self.csvfile, 'w') as fileobj:
-                fileobj.write(self.csv_data)
-        return True
+    # number of months rendered when the display is updated, and the number 
+    # added each time the user scrolls near the end
+    firstMonths = 3
+    pageMonths = 6
     
+    # number of recently used timesheets remembered, and the number of those
+    # which are read in advance
+    recentCount = 12
+    prefetchCount = 4
     
-    def new_name(self, value):
-        """ Set new timesheet name. """
-        
-        value = re.sub('\s', '_', str(value))
-        
-        # rename directory in .timesheetproject
-        current_path = os.path.join(datapath, self.name)
-        new_path = os.path.join(datapath, value)
-        os.rename(current_path, new_path)
-        
-        # store new name variable
-        self.name = value
-        
-        # store and update file names
-        current_files = (self.csvfile, self.conffile)
-        new_files = self.getCsvConfFiles(self.name)
-        
-        # rename the csv and conffiles
-        for n in range(len(current_files)):
-            file = current_files[n]
-            new = new_files[n]
-            _, current = os.path.split(file)
-            current = os.path.join(new_path, current)
-            os.rename(current, new)
-            
-        # store new file names
-        self.csvfile, self.conffile = new_files
+    def __init__(self, profile=None):
+        """ Main window. 
         
-        # set new path for cfg
-        self.cfg.setFilename(self.conffile)
-        # update config data
-        self.cfg.update_conf('name', self.name)
-
-            
-    def new_rate(self, value):
-        """ Set new rate of pay. """
-        # set new rate and update config file
-        self.rate = str(value)
-        self.cfg.update_conf('rate', str(value))
-        
-    def new_currency(self, value):
-        """ Set new currency. """
-        # set new currency and update config file
-        self.currency = str(value)
-        self.cfg.update_conf('currency', str(value))
-        
-    def new_timebase(self, value):
-        """ Set new timebase. """
-        # set new timebase and update config file
-        self.timebase = str(value)
-        self.cfg.update_conf('timebase', str(value))
-    
-    
-class Timesheetproject(QMainWindow):
-    
-    def __init__(self):
+            If a StartupProfile is given, the time taken to show the window, 
+            paint it and load and display the last timesheet is recorded and
+            reported.
+        """
         super().__init__()
         
+        self.profile = profile
+        
         self.initUI()
         
         
@@ -161,18 +64,98 @@ class Timesheetproject(QMainWindow):
         # make sure the TimeSheet directory and config file exist
         check_path()
 
-        # display last opened file
-        self.get_last_opened()
+        # the last opened timesheet is read in the background once the 
+        # window is shown; until then, there is no timesheet
+        previous = self.get_last_opened()
+        self.data = Data(None)
             
         # get timesheet name
         self.name = None #self.data.name
+        
+        # timesheets are read in a background thread; `loading` is the name
+        # of the timesheet being read, if any
+        self.loadPool = QThreadPool(self)
+        self.loadPool.setMaxThreadCount(1)
+        self.loadSignals = LoadSignals()
+        self.loadSignals.cached.connect(self.show_cached)
+        self.loadSignals.loaded.connect(self.show_loaded)
+        self.loadSignals.failed.connect(self.load_failed)
+        self.loadNumber = 0
+        self.loading = None
+        # html from HtmlCache shown while loading, if any
+        self.cachedHtml = None
+        
+        # each open timesheet has a tab; the workspace holds their entries
+        # and rendered html, within a memory budget
+        self.workspace = Workspace(self.memoryBudget * 1024 * 1024)
+        self.tabBar = QTabBar(tabsClosable=True, movable=True, 
+                              expanding=False, documentMode=True)
+        self.tabBar.currentChanged.connect(self.tab_changed)
+        self.tabBar.tabCloseRequested.connect(self.close_tab)
+        
+        # recently used timesheets are read in the background when the 
+        # window is idle and kept in the workspace's cache, so that they open
+        # instantly
+        self.prefetchPool = QThreadPool(self)
+        self.prefetchPool.setMaxThreadCount(1)
+        self.loadSignals.prefetched.connect(self.cache_prefetched)
+        self.loadSignals.missing.connect(self.forget_recent)
+        self.prefetchWorker = None
+        self.prefetchTimer = QTimer(self, singleShot=True, interval=1000,
+                                    timeout=self.start_prefetch)
 
         self.textEdit = QTextEdit(readOnly=True)
         
+        # rendered months of the current timesheet, so that only changed 
+        # months are re-rendered
+        self.renderCache = RenderCache()
+        
+        # html is rendered in a background thread; only one render runs at a
+        # time, so the cache is never shared between threads
+        self.renderPool = QThreadPool(self)
+        self.renderPool.setMaxThreadCount(1)
+        self.renderSignals = RenderSignals()
+        self.renderSignals.finished.connect(self.show_render)
+        self.renderWorker = None
+        self.renderNumber = 0
+        
+        # snapshot of the store being displayed, number of months shown and
+        # whether there are more to show
+        self.renderStore = None
+        self.shownMonths = 0
+        self.moreMonths = False
+        
+        # older months are rendered as the user scrolls down
+        scrollBar = self.textEdit.verticalScrollBar()
+        scrollBar.valueChanged.connect(self.check_scroll)
+        scrollBar.rangeChanged.connect(self.check_scroll)
+        
+        # requests for a render made in the same pass of the event loop are
+        # combined into one
+        self.renderTimer = QTimer(self, singleShot=True, interval=0,
+                                  timeout=self.start_render)
+        
+        # deleted timesheets are moved to the trash and the trash is emptied
+        # in the background, one deletion at a time
+        self.deletePool = QThreadPool(self)
+        self.deletePool.setMaxThreadCount(1)
+        self.deleteSignals = DeleteSignals()
+        self.deleteSignals.progress.connect(self.show_delete_progress)
+        self.deleteSignals.moved.connect(self.delete_moved)
+        self.deleteSignals.error.connect(self.delete_error)
+        self.deleteSignals.finished.connect(self.delete_finished)
+        
         # display text (as html)
         self.update_display()
 
-        self.setCentralWidget(self.textEdit)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(self.tabBar)
+        layout.addWidget(self.textEdit)
+        centralWidget = QWidget()
+        centralWidget.setLayout(layout)
+        self.setCentralWidget(centralWidget)
 
         self.createActions()
         self.createMenus()
@@ -180,13 +163,25 @@ class Timesheetproject(QMainWindow):
         
         self.statusBar()
         self.statTimeout = 1000
+        self.deleteProgress = QProgressBar(maximumWidth=100, visible=False)
+        self.statusBar().addPermanentWidget(self.deleteProgress)
         self.setStyleSheet("background-color: yellow;")
         self.setWindowIcon(QIcon(''))  
         self.resize(400, 500)
         self.centre()
         
+        if self.profile is not None:
+            # record when the text is first painted
+            self.textEdit.viewport().installEventFilter(self)
+        
         self.show()
         
+        if self.profile is not None:
+            self.profile.mark('window shown')
+        
+        if previous is not None:
+            self.load(previous)
+        
         
     def centre(self):
         """ Centre window on screen. """
@@ -209,22 +204,328 @@ class Timesheetproject(QMainWindow):
             
         except FileNotFoundError:
             previous = None
+            conf_data = {}
             self.cfg_last.make_conf()
-        
-        self.data = Data(previous)
+            
+        # names of recently used timesheets, most recent first (names can't 
+        # contain '/', as they are directory names)
+        self.recent = [name for name in conf_data.get('recent', '').split('/')
+                       if name]
+        
+        # memory for the open timesheets, in MB
+        self.memoryBudget = 256
+        memory = conf_data.get('memory_mb', str(self.memoryBudget))
+        try:
+            if int(memory) <= 0:
+                raise ValueError
+        except ValueError:
+            message = ('"memory_mb={}" in {} is not a positive whole number, '
+                       'so {} MB is used.').format(memory, conffile,
+                                                   self.memoryBudget)
+            QMessageBox.warning(self, 'Invalid setting', message)
+        else:
+            self.memoryBudget = int(memory)
+        
+        return previous
+    
+    def add_recent(self, name):
+        """ Make `name` the most recently used timesheet. """
+        if self.recent[:1] != [name]:
+            self.recent = [name] + [item for item in self.recent 
+                                    if item != name][:self.recentCount-1]
+            self.cfg_last.update_conf('recent', '/'.join(self.recent))
+        
+    def forget_recent(self, *names):
+        """ Remove timesheets from the recently used list and the cache. """
+        for name in names:
+            self.workspace.cache.remove(name)
+        recent = [item for item in self.recent if item not in names]
+        if recent != self.recent:
+            self.recent = recent
+            self.cfg_last.update_conf('recent', '/'.join(self.recent))
+            
+    def start_prefetch(self):
+        """ Read the most recently used timesheets which aren't cached in 
+            the background.
+        """
+        self.cancel_prefetch()
+        names = [name for name in self.recent[:self.prefetchCount+1] 
+                 if name not in self.workspace 
+                 and name not in self.workspace.cache]
+        if names:
+            self.prefetchWorker = PrefetchWorker(names, self.loadSignals)
+            self.prefetchPool.start(self.prefetchWorker)
+            
+    def cancel_prefetch(self):
+        self.prefetchTimer.stop()
+        if self.prefetchWorker is not None:
+            self.prefetchWorker.cancel()
+            self.prefetchWorker = None
+            
+    def cache_prefetched(self, data, stamp):
+        # open timesheets aren't cached, as they can be changed
+        if data.name not in self.workspace and data.name in self.recent:
+            self.workspace.cache.put(data, stamp)
+            self.workspace.trim(keep=self.name)
+            
+    def open_tab(self, name, data=None, render_cache=None):
+        """ Display timesheet `name`, adding a tab for it if it isn't open. 
+        
+            If `data` is given, it is used instead of reading the timesheet,
+            with RenderCache `render_cache`, if that is given.
+        """
+        self.cancel_load()
+        if name not in self.workspace:
+            self.workspace.open(name, data, render_cache)
+            # the tab is set up before the tab bar says it has changed
+            self.tabBar.blockSignals(True)
+            index = self.tabBar.addTab(name)
+            self.tabBar.setTabData(index, name)
+            self.tabBar.blockSignals(False)
+        index = self.tab_index(name)
+        self.add_recent(name)
+        if index == self.tabBar.currentIndex():
+            self.tab_changed(index)
+        else:
+            self.tabBar.setCurrentIndex(index)
+            
+    def tab_index(self, name):
+        # return index of tab for timesheet `name`, or -1
+        for index in range(self.tabBar.count()):
+            if self.tabBar.tabData(index) == name:
+                return index
+        return -1
+    
+    def tab_changed(self, index):
+        """ Display the timesheet in tab `index`. """
+        self.cancel_load()
+        # the html of the tab which was shown may be saved below (or by 
+        # Workspace.trim), so it must not be rendering into its RenderCache
+        rendering = self.renderWorker is not None
+        self.stop_render()
+        if index < 0:
+            data = Data(None)
+            self.renderCache = RenderCache()
+        else:
+            name = self.tabBar.tabData(index)
+            try:
+                # read again if it has been dropped from memory
+                data = self.workspace.data(name)
+            except (OSError, KeyError, ValueError) as err:
+                self.statusBar().showMessage('Could not open {}: {}'.format(
+                    name, err))
+                self.close_tab(index, save=False)
+                return
+            self.renderCache = self.workspace.render_cache(name)
+        if data is not self.data:
+            # keep the html of the timesheet which was shown, for next time
+            if self.name in self.workspace:
+                self.workspace.save_html(self.name)
+            self.data = data
+            self.update_display()
+        elif rendering:
+            # carry on with the render which was stopped
+            if self.shownMonths:
+                self.render_more()
+            else:
+                self.renderTimer.start()
+            
+    def close_tab(self, index, save=True):
+        """ Close the timesheet in tab `index`, saving it if `save` is True. 
+
+            As when the window is closed, unsaved changes are saved without
+            asking (and so are those of timesheets dropped from memory, see
+            Workspace.trim).
+        """
+        name = self.tabBar.tabData(index)
+        if name == self.name:
+            # its html is saved, so it must not be rendering
+            self.stop_render()
+        self.workspace.close(name, save)
+        self.tabBar.removeTab(index)
+    
+    def load(self, name):
+        """ Read timesheet `name` in the background and display it when it has
+            been read.
+        """
+        self.loadNumber += 1
+        self.loading = name
+        # nothing is rendered until the timesheet has been read
+        self.renderTimer.stop()
+        self.setWindowTitle('Employee Timesheet - ' + name)
+        self.statusBar().showMessage('Loading…')
+        self.loadPool.start(LoadWorker(self.loadNumber, name, 
+                                       self.loadSignals, 
+                                       self.workspace.html_cache))
+        
+    def finish_load(self):
+        """ Wait for the timesheet being read in the background, if any, and
+            display it, so that it can be used.
+        """
+        if self.loading is not None:
+            self.loadPool.waitForDone()
+            # deliver the `loaded` signal
+            QApplication.processEvents()
+        
+    def cancel_load(self):
+        # ignore the timesheet being read in the background, if any
+        self.loadNumber += 1
+        self.loading = None
+        
+    def show_cached(self, number, months):
+        """ Display the saved html of the timesheet being read by `load`, 
+            until it has been read.
+        """
+        if number != self.loadNumber:
+            return
+        # the html of a render which is under way is no longer wanted
+        self.cancel_render()
+        self.renderNumber += 1
+        self.moreMonths = False
+        html = [get_preamble()]
+        html += [month_html for _, month_html in months[:self.firstMonths]]
+        html.append(get_close())
+        self.cachedHtml = ''.join(html)
+        self.textEdit.setHtml(self.cachedHtml)
+        self.profile_mark('cached render')
+        
+    def show_loaded(self, number, data, render_cache):
+        """ Display the timesheet read by `load`, if it is still wanted. """
+        if number != self.loadNumber:
+            return
+        if self.profile is not None:
+            self.profile.mark('timesheet loaded')
+        data.record()
+        self.open_tab(data.name, data, render_cache)
+        
+    def load_failed(self, number, name, message):
+        if number != self.loadNumber:
+            return
+        self.loading = None
+        self.forget_recent(name)
+        self.updateName()
+        self.setWindowTitle('Employee Timesheet - ' + self.name)
+        self.statusBar().showMessage('Could not open {}: {}'.format(name, 
+                                                                   message))
+        # replace the saved html of the timesheet which couldn't be read
+        if self.cachedHtml is not None:
+            self.cachedHtml = None
+            self.renderTimer.start()
+        self.profile_mark('load failed')
+        
+    def eventFilter(self, obj, event):
+        # when profiling, record the first paint of the text, after it has 
+        # been painted
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            QTimer.singleShot(0, lambda: self.profile_mark('first paint'))
+        return False
+    
+    def profile_mark(self, stage):
+        """ Record startup stage and, once the last timesheet has been 
+            displayed, write the report.
+        """
+        if self.profile is None:
+            return
+        self.profile.mark(stage)
+        if stage in ('first render', 'load failed') or (
+                stage == 'first paint' and self.loading is None 
+                and not self.data.is_open()):
+            self.profile.report()
+            self.profile = None
             
         
     def update_display(self):
         """ Update text and window title """
         # check if name has changed
         self.updateName()
-        # update text displayed
-        self.textEdit.setHtml(csv_to_html(self.data.csv_data, 
-                                          self.data.timebase,
-                                          self.data.currency))
         self.setWindowTitle('Employee Timesheet - ' + self.name)
-        if self.data.modified:
-            self.statusBar().showMessage('Updated', self.statTimeout)
+        # update text displayed, once control returns to the event loop
+        self.renderTimer.start()
+        
+    def start_render(self):
+        """ Start rendering the most recent months in the background, 
+            cancelling any render that is already running.
+        """
+        self.cancel_render()
+        self.renderNumber += 1
+        self.renderStore = self.data.store.snapshot()
+        self.shownMonths = 0
+        self.moreMonths = False
+        self.renderWorker = RenderWorker(self.renderNumber, self.renderStore,
+                                         self.data.currency, 
+                                         self.renderCache, 
+                                         self.renderSignals, 
+                                         stop=self.firstMonths,
+                                         policy=self.data.policy)
+        self.statusBar().showMessage('Rendering…')
+        self.renderPool.start(self.renderWorker)
+        
+    def render_more(self):
+        """ Start rendering the next page of older months. """
+        start = self.shownMonths
+        self.renderWorker = RenderWorker(self.renderNumber, self.renderStore,
+                                         self.data.currency, 
+                                         self.renderCache,
+                                         self.renderSignals, start=start,
+                                         stop=start+self.pageMonths,
+                                         policy=self.data.policy)
+        self.renderPool.start(self.renderWorker)
+        
+    def cancel_render(self):
+        if self.renderWorker is not None:
+            self.renderWorker.cancel()
+            self.renderWorker = None
+            
+    def stop_render(self):
+        """ Cancel the background render and wait for it to stop, so that 
+            its RenderCache can be saved.
+        """
+        self.cancel_render()
+        self.renderPool.waitForDone()
+        
+    def show_render(self, number, start, html, more):
+        """ Display html from the background render, if it is still wanted. 
+        """
+        if number != self.renderNumber or start != self.shownMonths:
+            return
+        self.renderWorker = None
+        
+        # update the months shown first, as changing the text can call 
+        # check_scroll
+        if more:
+            self.shownMonths = start + (self.firstMonths if start == 0 
+                                        else self.pageMonths)
+        self.moreMonths = more
+        
+        if start == 0:
+            # the saved html may already be showing
+            if html != self.cachedHtml:
+                self.textEdit.setHtml(html)
+            self.cachedHtml = None
+            if self.data.is_open():
+                self.profile_mark('first render')
+                # read other timesheets once the window has been idle a while
+                self.prefetchTimer.start()
+            if self.data.modified:
+                self.statusBar().showMessage('Updated', self.statTimeout)
+            elif self.statusBar().currentMessage() == 'Rendering…':
+                # leave other messages, e.g. that a timesheet couldn't be 
+                # opened
+                self.statusBar().clearMessage()
+        else:
+            append_html(self.textEdit.document(), html)
+        
+        # the months shown may not fill the window
+        self.check_scroll()
+        
+    def check_scroll(self):
+        """ Render more months if the display is scrolled near the end. """
+        if not self.moreMonths or self.renderWorker is not None:
+            return
+        scrollBar = self.textEdit.verticalScrollBar()
+        if scrollBar.value() >= scrollBar.maximum() - scrollBar.pageStep():
+            self.render_more()
             
             
     def updateName(self):
@@ -234,50 +535,53 @@ class Timesheetproject(QMainWindow):
     def newTimesheet(self):
         """ Make a new timesheet. """
         
-        # prompt save
-        self.maybeSave()
-        
+        from filedialogs import NewTimesheetDialog
         self.ntd = NewTimesheetDialog()
         self.ntd.show()
         self.ntd.accepted.connect(self.setTimesheet)
         
     def setTimesheet(self):
-        """ Set name (internally), make new Data object and display data. """
-        self.name = self.ntd.name
-        self.data = Data(self.name)
-        self.update_display()
+        """ Open the new timesheet in a tab. """
+        self.open_tab(self.ntd.name)
         
     def addLine(self):
         """ Add line(s) to timesheet. """
+        self.finish_load()
+        from editdialogs import AddLineDialog
         self.ald = AddLineDialog(self.data)
         self.ald.show()
         self.ald.accepted.connect(self.update_display)
         
     def removeLine(self):
         """ Remove line(s) from timesheet. """
+        self.finish_load()
+        from editdialogs import RemoveLineDialog
         self.rld = RemoveLineDialog(self.data)
         self.rld.show()
         self.rld.accepted.connect(self.update_display)
             
     def editEntries(self):
+        self.finish_load()
+        from editdialogs import EditLineDialog
         self.ed = EditLineDialog(self.data)
         self.ed.show()
         self.ed.accepted.connect(self.update_display)
         
     def open(self):
         """ Open another timesheet. """
+        from filedialogs import OpenTimesheetDialog
         self.otd = OpenTimesheetDialog()
         self.otd.show()
         self.otd.accepted.connect(self.setOpenVars)
         
     def setOpenVars(self):
-        """ Set parameters for this timesheet. """
-        
-        # this is basically the same as setTimesheet, but with different object
-        # to get name from
-        self.name = self.otd.selected
-        self.data = Data(self.name)
-        self.update_display()
+        """ Show the selected timesheet, in a new tab if it isn't open. """
+        name = self.otd.selected
+        if name in self.workspace or name in self.workspace.cache:
+            self.open_tab(name)
+        else:
+            # show the saved html, if any, while the timesheet is read
+            self.load(name)
 
 
     def save(self):
@@ -285,35 +589,120 @@ class Timesheetproject(QMainWindow):
         if self.data.save():
             self.statusBar().showMessage('Saved', self.statTimeout)
             
+    def save_all(self):
+        """ Save every open timesheet with unsaved changes. """
+        names = self.workspace.save_all()
+        self.statusBar().showMessage('Saved {} timesheet{}'.format(
+            len(names), '' if len(names) == 1 else 's'), self.statTimeout)
+            
     def closeEvent(self, event):
-        # save the timesheet, save the name of this timesheet to the cache and
-        # close the window
-        self.save()
-        self.cfg_last.update_conf('last', self.name)
+        # save the timesheets, save the name of this timesheet to the cache 
+        # and close the window
+        self.workspace.save_all()
+        # if the last timesheet hasn't finished loading, it is still the last
+        self.cfg_last.update_conf('last', self.loading or self.name)
+        # don't leave a render running in the background
+        self.renderTimer.stop()
+        self.stop_render()
+        for name in self.workspace:
+            self.workspace.save_html(name)
+        self.loadPool.waitForDone()
+        self.cancel_prefetch()
+        self.prefetchPool.waitForDone()
+        self.deletePool.waitForDone()
         event.accept()
 
     def export(self):
         """ Write the csv data to a file of the user's choice. """
+        self.finish_load()
         filename, _ = QFileDialog.getSaveFileName(self, 
                      'Export timesheet as csv', os.getcwd(), 
                      'CSV Files (*.csv);;Text Files (*.txt);;All Files (*)')
         if filename:
             self.save()
             with open(filename, 'w') as fileobj:
-                fileobj.write(self.data.csv_data)
+                self.data.store.write_csv(fileobj)
+                
+    def exportHtml(self):
+        """ Write the timesheet as html to a file of the user's choice. """
+        self.finish_load()
+        filename, _ = QFileDialog.getSaveFileName(self, 
+                     'Export timesheet as html', os.getcwd(), 
+                     'HTML Files (*.html);;All Files (*)')
+        if filename:
+            from processcsv import write_store_html
+            with open(filename, 'w') as fileobj:
+                write_store_html(fileobj, self.data.store, 
+                                 self.data.currency, 
+                                 policy=self.data.policy)
+                
+    def payroll(self):
+        """ Show the total time and pay of every timesheet for a period. """
+        from reportdialogs import PayrollDialog
+        # the report is made from the files, so unsaved changes are saved
+        self.workspace.save_all()
+        self.prd = PayrollDialog()
+        self.prd.show()
+        self.prd.run()
                 
     def deleteTimesheet(self):
         """ Delete a timesheet """
+        from filedialogs import DeleteTimesheetDialog
         self.dtd = DeleteTimesheetDialog()
         self.dtd.show()
         self.dtd.accepted.connect(self.reset)
         
     def reset(self):
+        self.forget_recent(*self.dtd.selected)
+        # close the tabs of the deleted timesheets, without saving them
+        for name in self.dtd.selected:
+            index = self.tab_index(name)
+            if index >= 0:
+                self.close_tab(index, save=False)
         if self.name in self.dtd.selected:
-            self.data = Data(None)
-            self.name = self.data.name
-            self.cfg_last.update_conf('last', self.name)
-            self.update_display()
+            self.cfg_last.update_conf('last', 'None')
+        # nothing is restored while the trash is being changed
+        self.undoDeleteAct.setEnabled(False)
+        self.deletePool.start(DeleteWorker(self.dtd.selected, datapath,
+                                           self.deleteSignals))
+            
+    def show_delete_progress(self, message, done, total):
+        self.statusBar().showMessage('{}… {}/{}'.format(message, done,
+                                                        total))
+        self.deleteProgress.setMaximum(total)
+        self.deleteProgress.setValue(done)
+        self.deleteProgress.show()
+        
+    def delete_moved(self, names):
+        Registry(datapath).remove(names)
+        
+    def delete_error(self, message):
+        QMessageBox.warning(self, 'Could not delete timesheet', message)
+            
+    def delete_finished(self, purged):
+        self.deleteProgress.hide()
+        self.undoDeleteAct.setEnabled(True)
+        self.statusBar().showMessage('Deleted', self.statTimeout)
+        
+    def undoDelete(self):
+        """ Restore the timesheets deleted most recently from the trash. """
+        batches = trash.batches(datapath)
+        if not batches:
+            self.statusBar().showMessage('There are no deleted timesheets',
+                                         self.statTimeout)
+            return
+        try:
+            names = trash.restore(batches[-1], datapath)
+        except OSError as err:
+            QMessageBox.warning(self, 'Could not restore timesheet', str(err))
+            return
+        # the registry finds the restored timesheets when it is next listed
+        if names:
+            message = 'Restored ' + ', '.join(names)
+        else:
+            message = ('Could not restore: there are timesheets with the '
+                       'same names')
+        self.statusBar().showMessage(message, self.statTimeout)
 
     def about(self):
         QMessageBox.about(self, "About Employee Timesheet",
@@ -322,9 +711,23 @@ class Timesheetproject(QMainWindow):
            
     def editSettings(self):
         """ Change timesheet config data """
+        self.finish_load()
+        from editdialogs import EditTimesheetSettingsDialog
         self.nrd = EditTimesheetSettingsDialog(self.data)
         self.nrd.show()
-        self.nrd.accepted.connect(self.update_display)
+        self.nrd.accepted.connect(self.settings_changed)
+        
+    def settings_changed(self):
+        # the timesheet may have been renamed
+        if self.data.name != self.name:
+            self.recent = [self.data.name if item == self.name else item 
+                           for item in self.recent]
+            self.cfg_last.update_conf('recent', '/'.join(self.recent))
+            self.workspace.rename(self.name, self.data.name)
+            index = self.tab_index(self.name)
+            self.tabBar.setTabText(index, self.data.name)
+            self.tabBar.setTabData(index, self.data.name)
+        self.update_display()
     
     def createActions(self):
                     
@@ -340,10 +743,18 @@ class Timesheetproject(QMainWindow):
                 shortcut=QKeySequence.Save,
                 statusTip="Save the timesheet", triggered=self.save)
 
+        self.saveAllAct = QAction("Save &all", self, shortcut="Ctrl+Shift+S",
+                statusTip="Save all the open timesheets", 
+                triggered=self.save_all)
+
         self.exportAct = QAction("&Export csv", self, shortcut="Ctrl+E",
                 statusTip="Export the timesheet as csv",
                 triggered=self.export)
 
+        self.exportHtmlAct = QAction("Export &html", self, shortcut="Ctrl+H",
+                statusTip="Export the timesheet as html",
+                triggered=self.exportHtml)
+
         self.exitAct = QAction("E&xit", self, shortcut="Ctrl+Q",
                 statusTip="Exit the application", triggered=self.close)
 
@@ -371,6 +782,14 @@ class Timesheetproject(QMainWindow):
         self.deleteAct = QAction("Delete", self,
                 shortcut="Ctrl+D", statusTip="Delete timesheet",
                 triggered=self.deleteTimesheet)
+        
+        self.undoDeleteAct = QAction("&Undo delete", self,
+                statusTip="Restore the timesheets deleted most recently",
+                triggered=self.undoDelete)
+        
+        self.payrollAct = QAction("&Payroll", self, shortcut="Ctrl+R",
+                statusTip="Total time and pay of every timesheet for a period",
+                triggered=self.payroll)
 
 
     def createMenus(self):
@@ -379,8 +798,11 @@ class Timesheetproject(QMainWindow):
         self.fileMenu.addAction(self.newAct)
         self.fileMenu.addAction(self.openAct)
         self.fileMenu.addAction(self.saveAct)
+        self.fileMenu.addAction(self.saveAllAct)
         self.fileMenu.addAction(self.exportAct)
+        self.fileMenu.addAction(self.exportHtmlAct)
         self.fileMenu.addAction(self.deleteAct)
+        self.fileMenu.addAction(self.undoDeleteAct)
         self.fileMenu.addAction(self.editSettingsAct)
         self.fileMenu.addSeparator();
         self.fileMenu.addAction(self.exitAct)
@@ -390,6 +812,9 @@ class Timesheetproject(QMainWindow):
         self.editMenu.addAction(self.removeAct)
         self.editMenu.addAction(self.editAct)
         
+        self.reportsMenu = self.menuBar().addMenu("&Reports")
+        self.reportsMenu.addAction(self.payrollAct)
+        
         self.menuBar().addSeparator()
 
         self.helpMenu = self.menuBar().addMenu("&Help")
@@ -405,27 +830,20 @@ class Timesheetproject(QMainWindow):
         
         self.editToolBar = self.addToolBar("Edit")
         self.editToolBar.addAction(self.addAct)
-        
-
-
-    def maybeSave(self):
-        if self.data.modified:
-            ret = QMessageBox.warning(self, "Application",
-                    "This timesheet has been modified.\nDo you want to save "
-                    "your changes?",
-                    QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel)
-    
-            if ret == QMessageBox.Save:
-                return self.save()
-    
-            if ret == QMessageBox.Cancel:
-                return False
-
-        return True
     
 
 if __name__ == '__main__':
     
+    profile = None
+    if '--profile-startup' in sys.argv:
+        sys.argv.remove('--profile-startup')
+        from startupprofile import StartupProfile
+        profile = StartupProfile(_started)
+        profile.mark('import PyQt5', _qt_imported)
+        profile.mark('import modules', _imported)
+    
     app = QApplication(sys.argv)
-    window = Timesheetproject()
+    if profile is not None:
+        profile.mark('QApplication')
+    window = Timesheetproject(profile)
     sys.exit(app.exec_())
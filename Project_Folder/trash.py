@@ -0,0 +1,113 @@
+"""
+Trash for deleted timesheets.
+
+Deleting a timesheet moves its directory into ~/.timesheetproject/.trash with
+a single rename, which is instant and can be undone with `restore`. The trash
+is emptied later by `purge`, which can be slow, so it is best run in the
+background (see deleteworker.py).
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from paths import datapath
+
+# deleted timesheets are kept for this many days before being purged
+keep_days = 7
+
+
+def trash_dir(path=datapath):
+    return os.path.join(path, '.trash')
+
+
+def move_to_trash(names, path=datapath, progress=None):
+    """ Move the directories of the named timesheets into the trash.
+
+        All the timesheets deleted together are put in a new directory in
+        the trash, which is returned.
+
+        Parameters
+        ----------
+        names : list of str
+            names of the timesheets
+        path : str
+            directory holding the timesheets. Default is ~/.timesheetproject
+        progress : callable, optional
+            called as `progress(done, total)` after each timesheet is moved
+    """
+
+    os.makedirs(trash_dir(path), exist_ok=True)
+
+    batch = tempfile.mkdtemp(prefix=time.strftime('%Y%m%d-%H%M%S-'),
+                             dir=trash_dir(path))
+
+    try:
+        for n, name in enumerate(names, start=1):
+            os.rename(os.path.join(path, name), os.path.join(batch, name))
+            if progress is not None:
+                progress(n, len(names))
+    finally:
+        # don't leave an empty directory if nothing could be moved
+        if not os.listdir(batch):
+            os.rmdir(batch)
+
+    return batch
+
+
+def restore(batch, path=datapath):
+    """ Move the timesheets in trash directory `batch` back, unless there is
+        now another timesheet with the same name.
+
+        Returns list of names of the timesheets restored.
+    """
+    restored = []
+    for name in os.listdir(batch):
+        new = os.path.join(path, name)
+        if not os.path.exists(new):
+            os.rename(os.path.join(batch, name), new)
+            restored.append(name)
+    if not os.listdir(batch):
+        os.rmdir(batch)
+    return restored
+
+
+def batches(path=datapath):
+    """ Return list of directories in the trash, oldest first. """
+    try:
+        with os.scandir(trash_dir(path)) as entries:
+            dirs = [entry.path for entry in entries if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+    # the directory names begin with the time they were made
+    return sorted(dirs, key=os.path.basename)
+
+
+def purge(path=datapath, days=None, progress=None):
+    """ Permanently remove timesheets which have been in the trash for more
+        than `days` days (default `keep_days`).
+
+        `progress`, if given, is called as `progress(done, total)` after each
+        timesheet is removed. Returns the number of timesheets removed.
+    """
+
+    if days is None:
+        days = keep_days
+    cutoff = time.time() - days * 24 * 60 * 60
+
+    old = [batch for batch in batches(path)
+           if os.stat(batch).st_mtime < cutoff]
+
+    timesheets = [os.path.join(batch, name) for batch in old
+                  for name in os.listdir(batch)]
+
+    for n, timesheet in enumerate(timesheets, start=1):
+        shutil.rmtree(timesheet, ignore_errors=True)
+        if progress is not None:
+            progress(n, len(timesheets))
+
+    for batch in old:
+        shutil.rmtree(batch, ignore_errors=True)
+
+    return len(timesheets)
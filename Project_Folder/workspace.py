@@ -0,0 +1,165 @@
+"""
+Timesheets open in tabs.
+
+Supplies Workspace, which holds the entries and rendered html of all the open
+timesheets. To keep within a memory budget, it drops those of the tabs which 
+have not been used for longest; they are read again when they are next used.
+The html of timesheets which are closed or dropped is kept on disk by an
+HtmlCache, so that it doesn't have to be rendered again.
+"""
+
+from collections import OrderedDict
+
+from data import Data
+from datacache import DataCache
+from htmlcache import HtmlCache
+from processcsv import RenderCache
+
+
+class Workspace:
+
+    def __init__(self, max_bytes=256*1024*1024):
+        """ Open timesheets, using up to about `max_bytes` of memory. 
+        
+            The budget is shared with `cache`, a DataCache of timesheets which
+            are not open (e.g. closed or read in advance).
+        """
+        self.max_bytes = max_bytes
+        self.cache = DataCache(max_bytes=max_bytes)
+        self.html_cache = HtmlCache()
+        # name: [Data (or None if dropped), RenderCache], least recently
+        # used first
+        self._tabs = OrderedDict()
+
+    def __contains__(self, name):
+        return name in self._tabs
+
+    def __iter__(self):
+        return iter(self._tabs)
+
+    def __len__(self):
+        return len(self._tabs)
+
+    def open(self, name, data=None, render_cache=None):
+        """ Add timesheet `name`, using `data` and `render_cache` if they are
+            given, and return its Data.
+        """
+        if name not in self._tabs:
+            if render_cache is None and data is not None:
+                render_cache = self.html_cache.render_cache(
+                    name, data.store, data.currency, policy=data.policy)
+            self._tabs[name] = [data, render_cache or RenderCache()]
+        elif data is not None:
+            self._tabs[name][0] = data
+            if render_cache is not None:
+                self._tabs[name][1] = render_cache
+        return self.data(name)
+
+    def data(self, name):
+        """ Return Data for open timesheet `name`, reading it again if it has
+            been dropped, and make it the most recently used.
+        """
+        tab = self._tabs[name]
+        if tab[0] is None:
+            data = self.cache.take(name)
+            if data is None:
+                data = Data(name)
+            else:
+                # it may have been read in advance, without being recorded
+                data.record()
+            tab[0] = data
+            if not tab[1].months:
+                # use the html rendered before, if it is still valid
+                tab[1] = self.html_cache.render_cache(
+                    name, data.store, data.currency, policy=data.policy)
+        self._tabs.move_to_end(name)
+        self.trim(keep=name)
+        return tab[0]
+
+    def render_cache(self, name):
+        """ Return RenderCache for open timesheet `name`. """
+        return self._tabs[name][1]
+
+    def is_loaded(self, name):
+        """ Return True if the entries of timesheet `name` are in memory. """
+        return self._tabs[name][0] is not None
+
+    def close(self, name, save=True):
+        """ Remove timesheet `name`. If `save` is True, it is saved and kept
+            in `cache`, so that it can be opened again quickly.
+        """
+        if save and self.is_loaded(name):
+            data = self._tabs[name][0]
+            data.save()
+            self.save_html(name)
+            self.cache.put(data)
+        del self._tabs[name]
+
+    def save_html(self, name):
+        """ Save the rendered html of open timesheet `name` on disk, if it 
+            has no unsaved changes.
+        """
+        data, render_cache = self._tabs[name]
+        if data is not None and not data.modified:
+            try:
+                self.html_cache.save(name, data.store, data.currency, 
+                                     render_cache, data.policy)
+            except OSError:
+                # the html can always be rendered again
+                pass
+
+    def rename(self, old, new):
+        """ Record that open timesheet `old` is now called `new`. """
+        items = [(new if name == old else name, tab) 
+                 for name, tab in self._tabs.items()]
+        self._tabs = OrderedDict(items)
+
+    def modified(self):
+        """ Return names of open timesheets with unsaved changes. """
+        return [name for name, (data, _) in self._tabs.items()
+                if data is not None and data.modified]
+
+    def save_all(self):
+        """ Save the open timesheets which have unsaved changes and return 
+            their names.
+        """
+        names = self.modified()
+        for name in names:
+            self._tabs[name][0].save()
+        return names
+
+    def nbytes(self):
+        """ Return approximate number of bytes of memory used by the open
+            timesheets and the cache.
+        """
+        size = self.cache.nbytes
+        for data, render_cache in self._tabs.values():
+            if data is not None:
+                size += data.store.nbytes()
+            size += render_cache.nbytes()
+        return size
+
+    def trim(self, keep=None):
+        """ Drop cached timesheets, then the entries and html of the least 
+            recently used open timesheets other than `keep`, until the 
+            memory used is within the budget. 
+            
+            Timesheets with unsaved changes are saved before they are dropped.
+        """
+        size = self.nbytes()
+        while size > self.max_bytes and len(self.cache):
+            self.cache.drop_oldest()
+            size = self.nbytes()
+        for name, tab in self._tabs.items():
+            if size <= self.max_bytes:
+                break
+            data, render_cache = tab
+            if name == keep or (data is None and not render_cache.months):
+                continue
+            if data is not None:
+                data.save()
+                self.save_html(name)
+            # a render may still be using the old RenderCache, so it is 
+            # replaced rather than cleared
+            tab[:] = [None, RenderCache()]
+            size = self.nbytes()
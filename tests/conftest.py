@@ -0,0 +1,40 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# the timesheets are kept in ~/.timesheetproject (see paths.py), so HOME is
+# set to a temporary directory before any of the modules are imported
+os.environ['HOME'] = tempfile.mkdtemp()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'Project_Folder'))
+
+
+@pytest.fixture
+def datapath():
+    """ Empty .timesheetproject directory, removed after the test. """
+    from paths import datapath, check_path
+    check_path()
+    yield datapath
+    shutil.rmtree(datapath)
+
+
+@pytest.fixture
+def make_timesheet(datapath):
+    """ Function which writes the files of a timesheet and returns its name.
+    """
+    def make_timesheet(name, csv='Date,Duration,Activity,Rate\n', 
+                       timebase='hour', rate='10', currency='£'):
+        path = os.path.join(datapath, name)
+        os.makedirs(path)
+        base = os.path.join(path, 'ts_' + name.lower())
+        with open(base + '.csv', 'w') as fileobj:
+            fileobj.write(csv)
+        with open(base + '.conf', 'w') as fileobj:
+            fileobj.write('name={}\nrate={}\ncurrency={}\ntimebase={}\n'
+                          .format(name, rate, currency, timebase))
+        return name
+    return make_timesheet
@@ -0,0 +1,37 @@
+from activityindex import ActivityIndex
+from entrystore import EntryStore
+
+
+CSV = '''Date,Duration,Activity,Rate
+2024-01-02,01:30,Admin,10.00
+2024-01-03,00:45,admin work,10.00
+2024-01-04,00:45,admin work,10.00
+2024-01-05,08:00,Coding,12.50
+'''
+
+
+def test_complete_most_used_first():
+    index = EntryStore.from_csv(CSV, 'hour').activity_index
+    assert index.complete('AD') == ['admin work', 'Admin']
+    assert index.complete('ad', limit=1) == ['admin work']
+    assert index.complete('x') == []
+    assert index.ranked() == ['admin work', 'Admin', 'Coding']
+
+
+def test_unused_names_are_not_completed():
+    store = EntryStore.from_csv(CSV, 'hour')
+    index = store.activity_index
+    index.intern('Adverts')
+    store.delete_rows([store.ids[0]])
+    assert index.count('Admin') == 0
+    assert index.complete('ad') == ['admin work']
+    assert index.ranked() == ['admin work', 'Coding']
+    assert index.used() == ['admin work', 'Coding']
+    # the name is offered again when it is used again
+    store.add_line('2024-01-06,01:00,Admin,10.00')
+    assert index.complete('ad') == ['admin work', 'Admin']
+
+
+def test_empty():
+    index = ActivityIndex()
+    assert index.complete('') == [] and index.ranked() == []
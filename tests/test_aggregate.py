@@ -0,0 +1,64 @@
+import datetime
+import random
+
+import pytest
+
+import aggregate
+import money
+
+
+def columns(n, time_base, seed=0):
+    rng = random.Random(seed)
+    start = datetime.date(2023, 1, 1).toordinal()
+    dates = sorted(start + rng.randrange(730) for _ in range(n))
+    if time_base == 'hour':
+        durations = [rng.randrange(1, 600) for _ in range(n)]
+    else:
+        durations = [rng.randrange(1, 1500) for _ in range(n)]
+    rates = [rng.choice([1001, 1250, 3333, 40000]) for _ in range(n)]
+    return dates, durations, rates
+
+
+@pytest.mark.parametrize('time_base', ['hour', 'day'])
+@pytest.mark.parametrize('period', aggregate.periods)
+@pytest.mark.parametrize('policy', [
+    money.Policy(), money.Policy('half_even', True), money.Policy('down')])
+def test_numpy_matches_python(monkeypatch, time_base, period, policy):
+    np = money.numpy()
+    if np is None:
+        pytest.skip('NumPy is not installed')
+    dates, durations, rates = columns(500, time_base)
+
+    expected = aggregate.totals(dates, durations, rates, time_base, period,
+                                policy)
+    monkeypatch.setattr(money, '_np', None)
+    assert aggregate.totals(dates, durations, rates, time_base, period,
+                            policy) == expected
+    monkeypatch.setattr(money, '_np', np)
+
+
+def test_month_totals():
+    day = datetime.date(2024, 1, 31).toordinal()
+    # 1:30 and 0:45 at 10.00 and 12.50 an hour, and 8:00 at 12.50 in February
+    totals = aggregate.totals([day, day, day + 1], [90, 45, 480],
+                              [1000, 1250, 1250], 'hour')
+    assert [(t.start, t.count, str(t.time), t.pay) for t in totals] == [
+        (datetime.date(2024, 2, 1), 1, '08:00', 10000),
+        (datetime.date(2024, 1, 1), 2, '02:15', 2438)]
+
+
+def test_pay_is_rounded_once():
+    day = datetime.date(2024, 1, 1).toordinal()
+    # three minutes at 0.50 an hour is 2.5 cents
+    args = [day] * 3, [1, 1, 1], [50, 50, 50], 'hour'
+    total, = aggregate.totals(*args)
+    assert total.pay == 3
+    total, = aggregate.totals(*args, policy=money.Policy('half_even'))
+    assert total.pay == 2
+    total, = aggregate.totals(*args, policy=money.Policy(round_entries=True))
+    assert total.pay == 3
+
+
+def test_bad_period():
+    with pytest.raises(ValueError):
+        aggregate.totals([1], [1], [1], 'hour', 'fortnight')
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import cli
+
+
+CSV = '''Date,Duration,Activity,Rate
+2024-01-02,01:30,Admin,10.00
+'''
+
+
+def test_add_and_totals(make_timesheet, capsys):
+    make_timesheet('Alice', CSV)
+    assert cli.main(['add', 'Alice', '3 Jan 2024', '2:15', 'Coding']) == 0
+    assert cli.main(['totals', 'Alice', '-p', 'year']) == 0
+    out = capsys.readouterr().out
+    assert out.split() == ['2024-01-01', '2', '3:45', '£37.50']
+
+
+@pytest.mark.parametrize('argv', [
+    ['add', 'Alice', '3 Jan 2024', 'abc', 'Coding'],
+    ['add', 'Alice', 'not a date', '1:00', 'Coding'],
+    ['add', 'Alice', '3 Jan 2024', '1:00', 'Coding,Admin'],
+    ['add', 'Alice', '3 Jan 2024', '1:00', 'Coding', '-r', '10.005'],
+    ['add', 'Alice', '3 Jan 2024', '1.001', 'Coding'],
+    ['add', 'Alice', '3 Jan 2024', 'inf', 'Coding'],
+    ['add', 'Alice', '3 Jan 2024', '1e12', 'Coding'],
+    ['add', 'Nobody', '3 Jan 2024', '1:00', 'Coding'],
+    ['totals', 'Nobody'],
+])
+def test_errors(make_timesheet, capsys, argv):
+    make_timesheet('Alice', CSV)
+    assert cli.main(argv) == 1
+    err = capsys.readouterr().err
+    assert err.startswith(argv[0] + ': ')
+    assert 'Traceback' not in err
+
+
+def test_day_duration_is_not_rounded(make_timesheet, capsys):
+    make_timesheet('Bob', timebase='day')
+    assert cli.main(['add', 'Bob', '3 Jan 2024', '0.1255', 'Admin']) == 1
+    assert cli.main(['add', 'Bob', '3 Jan 2024', '0.125', 'Admin']) == 0
+    assert cli.main(['csv', 'Bob']) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == (
+        '2024-01-03,0.125,Admin,10.00')
+
+
+def test_decimal_hours(make_timesheet, capsys):
+    make_timesheet('Alice', CSV)
+    assert cli.main(['add', 'Alice', '3 Jan 2024', '1.15', 'Coding']) == 0
+    assert cli.main(['csv', 'Alice']) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == (
+        '2024-01-03,01:09,Coding,10.00')
+
+
+# three minutes at 0.50 an hour is 2.5 cents
+ROUNDING = '''Date,Duration,Activity,Rate
+2024-01-02,00:01,Admin,0.50
+2024-01-03,00:01,Admin,0.50
+2024-01-04,00:01,Admin,0.50
+'''
+
+
+@pytest.mark.parametrize('conf, options, pay', [
+    ('', [], '£0.03'),
+    ('rounding=half_even\n', [], '£0.02'),
+    ('rounding=down\nround_entries=yes\n', [], '£0.00'),
+    ('rounding=down\n', ['--rounding', 'half_up'], '£0.03'),
+    ('round_entries=yes\n', ['--no-round-entries', '--rounding', 'down'],
+     '£0.02'),
+])
+def test_rounding_policy(make_timesheet, datapath, capsys, conf, options, 
+                         pay):
+    make_timesheet('Alice', ROUNDING)
+    with open(os.path.join(datapath, 'Alice', 'ts_alice.conf'), 'a') as f:
+        f.write(conf)
+    assert cli.main(['totals', 'Alice'] + options) == 0
+    assert cli.main(['payroll', '-d', '2 Jan 2024', '-j', '1'] + options) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].split()[-1] == pay
+    assert out[2].split() == ['Alice', '3', '0:03', pay]
+
+
+def test_bad_rounding_policy(make_timesheet, datapath, capsys):
+    make_timesheet('Alice', ROUNDING)
+    with open(os.path.join(datapath, 'Alice', 'ts_alice.conf'), 'a') as f:
+        f.write('rounding=nearest\n')
+    assert cli.main(['totals', 'Alice']) == 1
+    assert 'rounding' in capsys.readouterr().err
@@ -0,0 +1,49 @@
+import pytest
+
+from data import Data
+
+
+CSV = '''Date,Duration,Activity,Rate
+2024-01-02,01:30,Admin,10.00
+2024-01-03,02:00,Coding,12.50
+'''
+
+
+def test_timebase_cannot_change_with_entries(make_timesheet):
+    make_timesheet('Alice', CSV)
+    data = Data('Alice')
+    with pytest.raises(ValueError):
+        data.new_timebase('day')
+    data.save()
+
+    data = Data('Alice')
+    assert data.timebase == 'hour'
+    assert data.store.to_csv() == CSV
+
+
+def test_timebase_change_save_reload(make_timesheet):
+    make_timesheet('Bob')
+    data = Data('Bob')
+    data.new_timebase('day')
+    data.add_new('2024-01-02,0.5,Admin,100\n')
+    data.save()
+
+    data = Data('Bob')
+    assert data.timebase == 'day'
+    assert data.store.row(0) == ['2024-01-02', '0.5', 'Admin', '100.00']
+
+
+@pytest.mark.parametrize('lines', [
+    '2024-01-04,01:00,Testing,10.00\n2024-01-05,01:00:00,Testing,10.00\n',
+    '2024-01-04,01:00,Testing,10.00\n2024-01-05,01:00,Testing,10.005\n'])
+def test_add_new_all_or_nothing(make_timesheet, lines):
+    make_timesheet('Carol', CSV)
+    data = Data('Carol')
+    with pytest.raises(ValueError):
+        data.add_new(lines)
+    assert not data.modified
+    assert data.store.to_csv() == CSV
+    assert 'Testing' not in data.store.activity_names
+    data.add_new(lines.splitlines()[0])
+    data.save()
+    assert Data('Carol').store.row(2)[2] == 'Testing'
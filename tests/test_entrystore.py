@@ -0,0 +1,69 @@
+import pytest
+
+import aggregate
+from entrystore import EntryStore
+
+
+HOURS = '''Date,Duration,Activity,Rate
+2024-01-02,01:30,Admin,10.00
+2024-01-02,00:45,Coding,12.50
+2024-02-10,08:00,Coding,12.50
+'''
+
+DAYS = '''Date,Duration,Activity,Rate
+2024-01-02,0.125,Admin,400.00
+2024-01-03,0.333,Admin,400.00
+2024-01-04,1,Coding,250.00
+'''
+
+
+@pytest.mark.parametrize('csv, time_base', [(HOURS, 'hour'), (DAYS, 'day')])
+def test_csv_round_trip(csv, time_base):
+    store = EntryStore.from_csv(csv, time_base)
+    assert store.to_csv() == csv
+    assert EntryStore.from_csv(store.to_csv(), time_base).to_csv() == csv
+
+
+def test_day_totals_are_exact():
+    store = EntryStore.from_csv(DAYS, 'day')
+    total, = aggregate.store_totals(store)
+    assert str(total.time) == '1.458'
+    # 0.458 days at 400.00 and 1 day at 250.00
+    assert total.pay == 18320 + 25000
+
+
+def test_exact_rejects_rounding():
+    store = EntryStore.from_csv(DAYS, 'day')
+    with pytest.raises(ValueError):
+        store.add_line('2024-01-05,0.1255,Admin,400', exact=True)
+    row_id = store.ids[0]
+    with pytest.raises(ValueError):
+        store.update_rows({row_id: ['2024-01-02', '0.0001', 'Admin', '400']})
+    # rates which were read before are checked too
+    with pytest.raises(ValueError):
+        store.add_line('2024-01-05,0.125,Admin,400.005', exact=True)
+    store.add_line('2024-01-05,0.125,Admin,400.005')
+    with pytest.raises(ValueError):
+        store.add_line('2024-01-05,0.125,Admin,400.005', exact=True)
+    store.delete_rows([store.ids[-1]])
+    assert store.to_csv() == DAYS
+
+
+def test_update_and_delete_keep_order():
+    store = EntryStore.from_csv(HOURS, 'hour')
+    first, second, third = store.ids
+    store.update_rows({third: ['2023-12-31', '02:00', 'Admin', '10']})
+    store.delete_rows([second])
+    assert [row[0] for row in store.iter_rows()] == ['2023-12-31', 
+                                                     '2024-01-02']
+    assert store.activity_index.count('Coding') == 0
+
+
+@pytest.mark.parametrize('dur, time_base', [
+    ('inf', 'day'), ('nan', 'day'), ('-Infinity', 'hour'), ('3e9', 'day'),
+    ('99999999999', 'hour'), ('1:2:3', 'hour'), ('1:30', 'day'), ('', 'hour')])
+def test_invalid_durations(dur, time_base):
+    store = EntryStore.from_csv('Date,Duration,Activity,Rate\n', time_base)
+    with pytest.raises(ValueError):
+        store.add_line('2024-01-05,{},Admin,400'.format(dur))
+    assert len(store) == 0
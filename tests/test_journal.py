@@ -0,0 +1,95 @@
+import os
+import shutil
+
+import pytest
+
+from storage import CsvBackend
+
+
+CSV = '''Date,Duration,Activity,Rate
+2024-01-02,01:30,Admin,10.00
+2024-01-03,02:00,Coding,12.50
+'''
+
+
+@pytest.fixture
+def csvfile(tmp_path):
+    csvfile = tmp_path / 'ts_a.csv'
+    csvfile.write_text(CSV)
+    return str(csvfile)
+
+
+def save_changes(csvfile):
+    # add an entry and remove one, save them in the journal and return the
+    # expected csv text
+    backend = CsvBackend(csvfile)
+    store = backend.load('hour')
+    line = '2024-01-04,03:00,Admin,10.00'
+    store.add_line(line)
+    backend.add(line.split(','))
+    removed = store.get_rows(store.ids[:1])
+    store.delete_rows(removed)
+    for row in removed.values():
+        backend.remove(row)
+    backend.save(store)
+    return store.to_csv()
+
+
+def read(filename):
+    with open(filename) as fileobj:
+        return fileobj.read()
+
+
+def test_replay(csvfile):
+    expected = save_changes(csvfile)
+    assert os.path.exists(CsvBackend.getJournalFile(csvfile))
+    assert read(csvfile) == CSV
+    assert CsvBackend(csvfile).load('hour').to_csv() == expected
+
+
+def test_compact(csvfile):
+    expected = save_changes(csvfile)
+    backend = CsvBackend(csvfile)
+    backend.journal.compact(backend.load('hour'), csvfile)
+    assert not os.path.exists(CsvBackend.getJournalFile(csvfile))
+    assert read(csvfile) == expected
+    assert CsvBackend(csvfile).load('hour').to_csv() == expected
+
+
+def test_replay_after_touch_and_copy(csvfile, tmp_path):
+    expected = save_changes(csvfile)
+    os.utime(csvfile, (0, 0))
+    assert CsvBackend(csvfile).load('hour').to_csv() == expected
+    
+    copy = tmp_path / 'copy'
+    copy.mkdir()
+    for file in (csvfile, CsvBackend.getJournalFile(csvfile)):
+        shutil.copy(file, str(copy))
+    copied = os.path.join(str(copy), 'ts_a.csv')
+    assert CsvBackend(copied).load('hour').to_csv() == expected
+
+
+def test_replaced_csv_fails(csvfile):
+    save_changes(csvfile)
+    with open(csvfile, 'a') as fileobj:
+        fileobj.write('2024-01-05,01:00,Other,10.00\n')
+    with pytest.raises(ValueError):
+        CsvBackend(csvfile).load('hour')
+    assert os.path.exists(CsvBackend.getJournalFile(csvfile))
+
+
+def test_interrupted_compaction(csvfile, monkeypatch):
+    expected = save_changes(csvfile)
+    backend = CsvBackend(csvfile)
+    
+    # the journal isn't removed after the csv file is replaced
+    def fail(filename):
+        raise OSError('interrupted')
+    monkeypatch.setattr(os, 'remove', fail)
+    with pytest.raises(OSError):
+        backend.journal.compact(backend.load('hour'), csvfile)
+    monkeypatch.undo()
+    
+    assert read(csvfile) == expected
+    assert CsvBackend(csvfile).load('hour').to_csv() == expected
+    assert not os.path.exists(CsvBackend.getJournalFile(csvfile))
@@ -0,0 +1,90 @@
+import pytest
+
+import money
+
+
+@pytest.mark.parametrize('numerator, rounding, expected', [
+    (25, 'half_up', 3),
+    (-25, 'half_up', -3),
+    (25, 'half_even', 2),
+    (35, 'half_even', 4),
+    (-25, 'half_even', -2),
+    (29, 'down', 2),
+    (-29, 'down', -2),
+])
+def test_divide(numerator, rounding, expected):
+    assert money.divide(numerator, 10, rounding) == expected
+
+
+def test_divide_array():
+    np = money.numpy()
+    if np is None:
+        pytest.skip('NumPy is not installed')
+    numerators = [25, -25, 35, 29, -29]
+    for rounding in money.roundings:
+        result = money.divide(np.array(numerators), 10, rounding)
+        assert result.tolist() == [money.divide(n, 10, rounding)
+                                   for n in numerators]
+
+
+def test_total_pay_rounds_once():
+    # three entries of 1 minute at 0.50 an hour are 0.8333... cents each
+    durations, rates = [1, 1, 1], [50, 50, 50]
+    assert money.Policy().total_pay(durations, rates, 'hour') == 3
+    policy = money.Policy(round_entries=True)
+    assert policy.total_pay(durations, rates, 'hour') == 3
+    policy = money.Policy('down', round_entries=True)
+    assert policy.total_pay(durations, rates, 'hour') == 0
+    assert money.Policy('down').total_pay(durations, rates, 'hour') == 2
+
+
+def test_entry_pay_days():
+    # 0.125 days at 400.00 a day
+    assert money.default_policy.entry_pay(125, 40000, 'day') == 5000
+
+
+def test_bad_policy():
+    with pytest.raises(ValueError):
+        money.Policy('nearest')
+
+
+@pytest.mark.parametrize('rate, cents', [
+    ('95.5', 9550), (' 10 ', 1000), ('0.01', 1), ('-2.50', -250),
+    ('1.000', 100)])
+def test_rate_to_cents(rate, cents):
+    assert money.rate_to_cents(rate) == cents
+    assert money.rate_to_cents(rate, exact=True) == cents
+
+
+@pytest.mark.parametrize('rate', ['10.005', '0.001', '95.555'])
+def test_rate_to_cents_exact(rate):
+    money.rate_to_cents(rate)
+    with pytest.raises(ValueError):
+        money.rate_to_cents(rate, exact=True)
+
+
+@pytest.mark.parametrize('rate', ['', 'ten', '1,5'])
+def test_rate_to_cents_invalid(rate):
+    with pytest.raises(ValueError):
+        money.rate_to_cents(rate)
+
+
+def test_policy_from_conf():
+    assert money.Policy.from_conf({}) == money.default_policy
+    conf = {'rounding': 'half_even', 'round_entries': 'yes'}
+    policy = money.Policy.from_conf(conf)
+    assert policy == money.Policy('half_even', True)
+    assert policy.to_conf() == conf
+    assert money.Policy.from_conf(conf, 'down', False) == money.Policy('down')
+
+
+@pytest.mark.parametrize('conf', [
+    {'rounding': 'nearest'}, {'round_entries': 'True'}])
+def test_policy_from_bad_conf(conf):
+    with pytest.raises(ValueError):
+        money.Policy.from_conf(conf)
+
+
+def test_rate_too_large():
+    with pytest.raises(ValueError):
+        money.rate_to_cents('1e10')
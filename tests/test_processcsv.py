@@ -0,0 +1,40 @@
+import threading
+
+from processcsv import RenderCache
+
+
+def test_render_cache_nbytes():
+    cache = RenderCache()
+    cache.store('January 2024', 1, 'x' * 10)
+    cache.store('February 2024', 1, 'x' * 5)
+    assert cache.nbytes() == 15
+    cache.store('January 2024', 2, 'x' * 3)
+    assert cache.nbytes() == 8
+    assert cache.get('January 2024', 2) == 'xxx'
+    assert cache.get('February 2024', 2) is None
+    cache.prune(keys=['January 2024'])
+    assert list(cache.months) == ['January 2024'] and cache.nbytes() == 3
+    cache.prune(keys=[])
+    assert cache.nbytes() == 0
+    cache.store('January 2024', 1, 'x')
+    cache.check_settings('hour', '£')
+    assert cache.nbytes() == 0 and not cache.months
+
+
+def test_render_cache_nbytes_while_storing():
+    cache = RenderCache()
+    done = threading.Event()
+
+    def render():
+        for n in range(20000):
+            cache.store(n, 1, 'x')
+            if n % 100 == 99:
+                cache.prune(keys=range(n - 50, n + 1))
+        done.set()
+
+    thread = threading.Thread(target=render)
+    thread.start()
+    while not done.is_set():
+        cache.nbytes()
+    thread.join()
+    assert cache.nbytes() == len(cache.months)
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+
+from data import Data
+from money import Policy
+from registry import Registry
+
+
+CSV = '''Date,Duration,Activity,Rate
+2024-01-02,01:30,Admin,10.00
+2024-02-03,02:00,Coding,12.50
+'''
+
+
+def test_record(make_timesheet):
+    make_timesheet('Alice', CSV)
+    record = Registry().get('Alice')
+    assert record is None
+    Data('Alice')
+    record = Registry().get('Alice')
+    assert (record.rows, record.first, record.last) == (2, '2024-01-02', 
+                                                        '2024-02-03')
+    # 1.5 hours at 10.00 and 2 hours at 12.50
+    assert record.pay == 1500 + 2500
+
+
+def test_concurrent_reads(make_timesheet):
+    names = [make_timesheet('T{}'.format(n), CSV) for n in range(16)]
+    threads = [threading.Thread(target=Data, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    registry = Registry()
+    with open(registry.filename) as fileobj:
+        assert sorted(json.load(fileobj)['timesheets']) == sorted(names)
+    assert [record.name for record in registry.list()] == sorted(names)
+
+
+def test_read_only(make_timesheet, datapath):
+    make_timesheet('Alice', CSV)
+    data = Data('Alice', read_only=True)
+    cache = os.path.join(datapath, 'Alice', '.cache')
+    assert not os.path.exists(cache)
+    assert Registry().get('Alice') is None
+    data.record()
+    assert os.path.exists(os.path.join(cache, 'summary.json'))
+    assert Registry().get('Alice').rows == 2
+
+
+def test_read_only_old_config(make_timesheet, datapath):
+    # timesheets made by old versions have no currency or time base
+    make_timesheet('Alice', CSV)
+    conffile = os.path.join(datapath, 'Alice', 'ts_alice.conf')
+    with open(conffile, 'w') as fileobj:
+        fileobj.write('name=Alice\nrate=10\n')
+    data = Data('Alice', read_only=True)
+    assert (data.currency, data.timebase) == ('£', 'hour')
+    with open(conffile) as fileobj:
+        assert fileobj.read() == 'name=Alice\nrate=10\n'
+    data.record()
+    with open(conffile) as fileobj:
+        conf = fileobj.read()
+    assert 'currency=£\n' in conf and 'timebase=hour\n' in conf
+
+
+def test_pay_rounded_for_each_entry(make_timesheet, datapath):
+    # three minutes at 0.50 an hour is 2.5 cents
+    make_timesheet('Alice', 'Date,Duration,Activity,Rate\n' + 
+                   '2024-01-02,00:01,Admin,0.50\n' * 3)
+    conffile = os.path.join(datapath, 'Alice', 'ts_alice.conf')
+    with open(conffile, 'a') as fileobj:
+        fileobj.write('rounding=down\nround_entries=yes\n')
+    record, = Registry().list()
+    assert record.pay == 0
+    data = Data('Alice')
+    data.new_policy(Policy('half_up'))
+    assert Registry().get('Alice').pay == 3
+    assert Data('Alice').policy == Policy('half_up')
@@ -0,0 +1,43 @@
+from entrystore import EntryStore
+from storage import CsvBackend, SqliteBackend, migrate
+
+
+CSV = '''Date,Duration,Activity,Rate
+2024-01-02,0.125,Admin,400.00
+2024-01-03,1.5,Coding,250.00
+'''
+
+
+def test_sqlite_round_trip(tmp_path):
+    csvfile = tmp_path / 'ts_a.csv'
+    csvfile.write_text(CSV)
+    backend = migrate(str(csvfile), 'day')
+    assert backend.load('day').to_csv() == CSV
+
+
+def test_summary_from_sqlite(tmp_path):
+    csvfile = tmp_path / 'ts_a.csv'
+    csvfile.write_text(CSV + '2024-02-01,0.5,Admin,400.00\n')
+    expected = CsvBackend(str(csvfile)).summary('day')
+    summary = migrate(str(csvfile), 'day').summary('day')
+    assert summary.months == expected.months
+    assert summary.totals('year') == expected.totals('year')
+
+
+def test_sqlite_without_header(tmp_path):
+    store = EntryStore.from_csv('2024-01-02,0.125,Admin,400.00\n', 'day')
+    backend = SqliteBackend.create(str(tmp_path / 'ts_a.sqlite'), store)
+    loaded = backend.load('day')
+    assert loaded.header is None
+    assert loaded.to_csv() == store.to_csv()
+
+
+def test_sqlite_save_leaves_index(tmp_path):
+    csvfile = tmp_path / 'ts_a.csv'
+    csvfile.write_text(CSV)
+    backend = migrate(str(csvfile), 'day')
+    store = backend.load('day')
+    backend.remove(['2024-01-04', '1', 'Testing', '250.00'])
+    backend.save(store)
+    assert 'Testing' not in store.activity_names
+    assert backend.load('day').to_csv() == CSV
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+import trash
+
+
+def test_move_and_restore(tmp_path):
+    path = str(tmp_path)
+    for name in ('Alice', 'Bob'):
+        os.mkdir(os.path.join(path, name))
+    batch = trash.move_to_trash(['Alice', 'Bob'], path)
+    assert sorted(os.listdir(path)) == ['.trash']
+    assert trash.batches(path) == [batch]
+    assert sorted(trash.restore(batch, path)) == ['Alice', 'Bob']
+    assert trash.batches(path) == []
+
+
+def test_failed_move(tmp_path):
+    path = str(tmp_path)
+    os.mkdir(os.path.join(path, 'Alice'))
+    moved = []
+    with pytest.raises(OSError):
+        trash.move_to_trash(['Alice', 'Missing'], path, 
+                            lambda done, total: moved.append(done))
+    assert moved == [1]
+    batch, = trash.batches(path)
+    assert os.listdir(batch) == ['Alice']
+
+    with pytest.raises(OSError):
+        trash.move_to_trash(['Missing'], path)
+    # no empty directory is left behind
+    assert trash.batches(path) == [batch]